@@ -0,0 +1,893 @@
+#!/usr/bin/env python
+#
+# micro benchmarks for the engine's hot paths
+#
+# usage: python benchmarks.py [name ...]
+#   with no names every benchmark is run
+#
+import ctypes
+import os
+import struct
+import sys
+import tempfile
+import time
+import timeit
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import numpy
+
+import libtcodpy as libtcod
+
+from src.baseClasses import GameObject, Level
+from src.camera import Camera
+from src.engine import Model
+from src.levelGenerator import LevelPregenerator
+from src.levelStore import LevelStore
+from src.roomPlacement import FreeSpace, RoomIndex
+from src.saveGame import (BackgroundSaver, pack_level, pack_model, snapshot_level, snapshot_model, save_model,
+                          load_model, restore_level)
+from src.shadowcasting import compute_fov_symmetric
+from src.streamingLevel import StreamingLevel
+from src.components.basic_components import TileComponent, WallComponent, FloorComponent
+from src.engine import View
+from src.utilityClasses import *
+from src.defaultConstants import *
+
+BENCHMARKS = []
+# the world seed benchmark levels are generated from, so every run times the same levels
+BENCHMARK_SEED = 1
+
+
+def benchmark(function):
+    BENCHMARKS.append(function)
+    return function
+
+
+def report(name, seconds, runs):
+    print('%-40s %10.3f ms/run' % (name, seconds * 1000.0 / runs))
+
+
+def expect(condition, message):
+    # the results a benchmark compares must agree, or its timings mean nothing
+    if not condition:
+        raise AssertionError(message)
+
+
+def make_level(name='benchmark'):
+    level = Level(name, seed=get_level_seed(BENCHMARK_SEED, name))
+    level.make_map()
+    return level
+
+
+class OffscreenView(View):
+    # a View without a root console, drawing into an offscreen map console
+    def __init__(self, map_buffer=View.MAP_CONSOLE_BUFFER, width=MAP_WIDTH, height=MAP_HEIGHT):
+        # libtcod fills a console's characters through the font, even offscreen
+        libtcod.console_set_custom_font(self.FONT, libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+        self.MAP_CONSOLE_BUFFER = map_buffer
+        self._camera = Camera(width, height)
+        self._con = libtcod.console_new(width, height)
+        self._mapBuffer = self.create_map_buffer()
+        self._objectLayer = self.create_object_layer()
+        self._visible = None
+        self.reset_fov_redraw()
+
+
+@benchmark
+def fov_redraw(runs=200):
+    level = make_level()
+    view = OffscreenView()
+    fov_map = create_fov_map(level.mapHeight, level.mapWidth, level.map)
+    x, y = level.levelEntrance.x, level.levelEntrance.y
+    compute_fov(fov_map, x, y, SEIGHT_RADIUS, False)
+
+    def per_cell():
+        # the original redraw: one map_is_in_fov and one console_set_char_background per tile
+        level_map = level.map
+        for y in range(level.mapHeight):
+            for x in range(level.mapWidth):
+                if not libtcod.map_is_in_fov(fov_map, x, y):
+                    if level_map[x][y].explored:
+                        libtcod.console_set_char_background(view._con, x, y, level_map[x][y].dark_color,
+                                                            libtcod.BKGND_SET)
+                else:
+                    libtcod.console_set_char_background(view._con, x, y, level_map[x][y].tile_color,
+                                                        libtcod.BKGND_SET)
+                    level_map[x][y].explored = True
+
+    def full():
+        view.reset_fov_redraw()
+        window = get_fov_window(x, y, SEIGHT_RADIUS, level.mapHeight, level.mapWidth)
+        view.fov_redraw(get_fov_mask(fov_map, level.mapHeight, level.mapWidth, window), level, x, y, SEIGHT_RADIUS)
+
+    report('fov_redraw per cell', timeit.timeit(per_cell, number=runs), runs)
+    report('fov_redraw bulk fill', timeit.timeit(full, number=runs), runs)
+
+
+@benchmark
+def camera_render(runs=200):
+    # a map layer frame while walking up and down a corridor of the level, with a screen sized
+    # camera against a console holding the whole level
+    for scale in (1, 4, 10):
+        width, height = MAP_WIDTH * scale, MAP_HEIGHT * scale
+        level = Level('benchmark', seed=get_level_seed(BENCHMARK_SEED, 'benchmark'))
+        level.make_map(width, height)
+        player = Model.make_player(level.levelEntrance.x, level.levelEntrance.y)
+        player.mobComponent.initialize_fov(level)
+        # there and back along the longest stretch of floor through the entrance
+        x1 = x2 = player.x
+        while not level.is_blocked(x1 - 1, player.y):
+            x1 -= 1
+        while not level.is_blocked(x2 + 1, player.y):
+            x2 += 1
+        steps = []
+        for x in list(range(x1, x2 + 1)) + list(range(x2 - 1, x1, -1)):
+            # the FOVs are worked out up front, so only drawing is timed
+            player.x = x
+            player.mobComponent.recompute_fov()
+            steps.append((x, player.mobComponent.fov_mask))
+
+        camera, whole_level = OffscreenView(), OffscreenView(width=width, height=height)
+        for label, view in (('camera', camera), ('whole level', whole_level)):
+            frames = []
+
+            def frame():
+                player.x, fov = steps[len(frames) % len(steps)]
+                frames.append(1)
+                view.fov_redraw(fov, level, player.x, player.y, SEIGHT_RADIUS)
+                view.render_map(level, player)
+
+            report('frame, %s, %dx%d level' % (label, width, height), timeit.timeit(frame, number=runs), runs)
+
+        # after the same frames, the camera must show just what the whole level view has under it
+        x, y = camera._camera.position
+        expect(console_cells(camera._con, 0, 0, MAP_WIDTH, MAP_HEIGHT) ==
+               console_cells(whole_level._con, x, y, x + MAP_WIDTH, y + MAP_HEIGHT),
+               'camera frame differs from the whole level view on the %dx%d level' % (width, height))
+
+        # and the mouse names what the camera shows under it, and nothing off the map console
+        mouse = libtcod.Mouse()
+        visible = numpy.ones((height, width), dtype=bool)
+        for obj in level.objects:
+            cell = camera._camera.to_screen(obj.x, obj.y)
+            if cell is not None:
+                mouse.cx, mouse.cy = cell[0] + View.SCREEN_OFFSET, cell[1] + View.SCREEN_OFFSET
+                names = ', '.join(other.name for other in level.get_objects_at(obj.x, obj.y)).capitalize()
+                expect(camera.get_names_under_mouse(level, visible, mouse) == names,
+                       'wrong names under the mouse on the %dx%d level' % (width, height))
+        mouse.cx, mouse.cy = View.SCREEN_OFFSET, camera._camera.height + View.SCREEN_OFFSET
+        expect(camera.get_names_under_mouse(level, visible, mouse) == '', 'names found under the mouse off the map')
+
+
+def console_cells(con, x1, y1, x2, y2):
+    # the character and colors of each cell of con from (x1, y1) up to, but not including, (x2, y2)
+    return [(libtcod.console_get_char(con, x, y), tuple(libtcod.console_get_char_foreground(con, x, y)),
+             tuple(libtcod.console_get_char_background(con, x, y)))
+            for y in range(y1, y2) for x in range(x1, x2)]
+
+
+@benchmark
+def object_layer(runs=200):
+    # drawing the objects on the map console one libtcod call at a time and clearing them again,
+    # against the object layer going one object at a time and in whole array passes, as the number
+    # of objects grows
+    level = make_level()
+    view = OffscreenView(map_buffer=False)
+    player = Model.make_player(level.levelEntrance.x, level.levelEntrance.y)
+    player.mobComponent.initialize_fov(level)
+    player.mobComponent.recompute_fov()
+    visible = player.mobComponent.fov_mask
+    view.fov_redraw(visible, level, player.x, player.y, SEIGHT_RADIUS)
+    # the objects all stand in view, so every one of them is drawn
+    floor = list(zip(*numpy.nonzero(visible & ~level.map.blocks)))
+    layer = view._objectLayer
+
+    for count in (3, 10, 30, 100, 1000):
+        level.objects = [GameObject(int(x), int(y), 'o', 'orc', libtcod.desaturated_green, blocks=True)
+                         for y, x in (floor[get_random_int(0, len(floor) - 1)] for i in range(count - 1))]
+        # and one under the player, who has to be drawn over it
+        level.objects.append(GameObject(player.x, player.y, 'o', 'orc', libtcod.desaturated_green))
+
+        def per_object():
+            # the old draw_object and clear_object passes, with the calls they made for each object
+            for obj in level.objects + [player]:
+                if libtcod.map_is_in_fov(level.fov.fov_map, obj.x, obj.y):
+                    libtcod.console_set_default_foreground(view._con, obj.color)
+                    libtcod.console_put_char(view._con, obj.x, obj.y, obj.char, libtcod.BKGND_NONE)
+            for obj in level.objects + [player]:
+                libtcod.console_put_char(view._con, obj.x, obj.y, ' ', libtcod.BKGND_NONE)
+
+        report('objects, per object calls, %d' % count, timeit.timeit(per_object, number=runs), runs)
+
+        # either way, the layer must show what drawing the objects one at a time onto a clear
+        # console does, with nothing left over from the objects of the last frame
+        reference = libtcod.console_new(MAP_WIDTH, MAP_HEIGHT)
+        for obj in level.objects + [player]:
+            if (libtcod.map_is_in_fov(level.fov.fov_map, obj.x, obj.y) or
+                    (obj.always_visible and level.map[obj.x][obj.y].explored)):
+                libtcod.console_set_default_foreground(reference, obj.color)
+                libtcod.console_put_char(reference, obj.x, obj.y, obj.char, libtcod.BKGND_NONE)
+        expected = console_objects(reference)
+        libtcod.console_delete(reference)
+
+        for label, bulk_objects in (('one at a time', count + 2), ('whole arrays', 0)):
+            layer.bulk_objects = bulk_objects
+            report('objects, layer %s, %d' % (label, count),
+                   timeit.timeit(lambda: view.render_map(level, player), number=runs), runs)
+            shown = console_objects(view._con)
+            expect(shown == expected and len(shown) > 1,
+                   'object layer %s differs from drawing %d objects one at a time' % (label, count))
+    layer.bulk_objects = OBJECT_LAYER_BULK_OBJECTS
+
+
+def console_objects(con):
+    # the index, character and foreground of every cell of the map console showing an object
+    return [(i, char, fore) for i, (char, fore, back) in enumerate(console_cells(con, 0, 0, MAP_WIDTH, MAP_HEIGHT))
+            if char != ord(' ')]
+
+
+@benchmark
+def fov_map_io(runs=200):
+    # filling a libtcod map from the level and reading its FOV back, a cell at a time and in bulk
+    level = make_level()
+    level_map = level.map
+    fov_map = libtcod.map_new(level.mapWidth, level.mapHeight)
+    compute_fov(fov_map, level.levelEntrance.x, level.levelEntrance.y, SEIGHT_RADIUS, False)
+
+    def set_per_cell():
+        for y in range(level.mapHeight):
+            for x in range(level.mapWidth):
+                libtcod.map_set_properties(fov_map, x, y, not level_map[x][y].block_sight, not level_map[x][y].blocks)
+
+    def set_bulk():
+        libtcod.map_set_properties_array(fov_map, ~level_map.block_sight, ~level_map.blocks)
+
+    def read_per_cell():
+        return [[libtcod.map_is_in_fov(fov_map, x, y) for x in range(level.mapWidth)] for y in range(level.mapHeight)]
+
+    def read_bulk():
+        return libtcod.map_get_fov_array(fov_map)
+
+    report('map properties, per cell', timeit.timeit(set_per_cell, number=runs), runs)
+    report('map properties, bulk', timeit.timeit(set_bulk, number=runs), runs)
+    report('fov read back, per cell', timeit.timeit(read_per_cell, number=runs), runs)
+    report('fov read back, bulk', timeit.timeit(read_bulk, number=runs), runs)
+
+    # the bulk calls must read back what the per cell ones do, and leave the map as they would
+    expect((read_bulk() == numpy.array(read_per_cell(), dtype=bool)).all(), 'bulk fov read back differs')
+    set_per_cell()
+    per_cell = [(libtcod.map_is_transparent(fov_map, x, y), libtcod.map_is_walkable(fov_map, x, y))
+                for y in range(level.mapHeight) for x in range(level.mapWidth)]
+    libtcod.map_clear(fov_map)
+    set_bulk()
+    bulk = [(libtcod.map_is_transparent(fov_map, x, y), libtcod.map_is_walkable(fov_map, x, y))
+            for y in range(level.mapHeight) for x in range(level.mapWidth)]
+    expect(bulk == per_cell, 'bulk map properties differ from per cell ones')
+    libtcod.map_delete(fov_map)
+
+
+@benchmark
+def fov_redraw_delta(runs=200):
+    # pace back and forth between two cells, repainting only what changed each step
+    level = make_level()
+    view = OffscreenView()
+    player = Model.make_player(level.levelEntrance.x, level.levelEntrance.y)
+    player.mobComponent.initialize_fov(level)
+    x = player.x
+    steps = [x, x + 1]
+    repainted = []
+
+    def step():
+        player.x = steps[len(repainted) % 2]
+        player.mobComponent.recompute_fov()
+        view.fov_redraw(player.mobComponent.fov_mask, level, player.x, player.y, SEIGHT_RADIUS)
+        repainted.append(view.cells_repainted)
+
+    report('fov_redraw delta (incl. compute_fov)', timeit.timeit(step, number=runs), runs)
+    print('%-40s %10.1f cells/step' % ('cells repainted', sum(repainted[1:]) / float(len(repainted) - 1)))
+
+
+@benchmark
+def fov_observers(runs=5, observers=50):
+    # FOV for a level full of mobs: a libtcod map per mob against the level's shared FOV service
+    level = make_level()
+    floor = zip(*numpy.nonzero(~level.map.blocks))
+    mobs = []
+    for i in range(observers):
+        y, x = floor[i * len(floor) // observers]
+        mobs.append(GameObject(x, y, 'o', 'orc', libtcod.desaturated_green, blocks=True))
+
+    def map_per_mob():
+        for mob in mobs:
+            fov_map = create_fov_map(level.mapHeight, level.mapWidth, level.map)
+            compute_fov(fov_map, mob.x, mob.y, SEIGHT_RADIUS, False)
+            libtcod.map_delete(fov_map)
+
+    def shared_service():
+        level.fov.invalidate()
+        for mob in mobs:
+            level.fov.compute_fov(mob, SEIGHT_RADIUS)
+
+    label = '%d observers' % observers
+    report('fov, map per mob ' + label, timeit.timeit(map_per_mob, number=runs), runs)
+    report('fov, shared service ' + label, timeit.timeit(shared_service, number=runs), runs)
+
+    # every mob must see from the shared map what it sees from a map of its own
+    fov_map = create_fov_map(level.mapHeight, level.mapWidth, level.map)
+    for mob in mobs:
+        compute_fov(fov_map, mob.x, mob.y, SEIGHT_RADIUS, False)
+        expect((level.fov.get_fov(mob) == get_fov_mask(fov_map, level.mapHeight, level.mapWidth)).all(),
+               'shared FOV service differs from a map per mob at %d, %d' % (mob.x, mob.y))
+    libtcod.map_delete(fov_map)
+    print('%-40s %10.1f KB' % ('fov service masks ' + label, level.fov.nbytes() / 1024.0))
+
+
+@benchmark
+def fov_cache(runs=200):
+    # pacing back and forth recomputes the same two FOVs; with the cache they are only unpacked
+    masks = {}
+    for cache_size in (0, FOV_CACHE_SIZE):
+        level = make_level()
+        level.fov.cache_size = cache_size
+        player = Model.make_player(level.levelEntrance.x, level.levelEntrance.y)
+        player.mobComponent.initialize_fov(level)
+        steps = [player.x, player.x + 1]
+        count = []
+
+        def step():
+            player.x = steps[len(count) % 2]
+            count.append(1)
+            player.mobComponent.recompute_fov()
+
+        report('fov pacing, cache size %d' % cache_size, timeit.timeit(step, number=runs), runs)
+
+        for x in steps:
+            player.x = x
+            player.mobComponent.recompute_fov()
+            masks.setdefault(x, []).append(player.mobComponent.fov_mask)
+
+    # a FOV unpacked from the cache must be the one computing it again gives
+    for x, (fresh, cached) in masks.items():
+        expect((fresh == cached).all(), 'cached FOV differs from a fresh one at %d' % x)
+
+    stats = level.fov.stats
+    print('%-40s %10.1f %%' % ('fov cache hit rate', 100.0 * stats['hit_rate']))
+    print('%-40s %10d B' % ('fov cache memory', stats['cache_bytes']))
+
+
+@benchmark
+def fov_backends(runs=200, levels=10):
+    # libtcod's FOV against the NumPy shadowcasting backend, and how far their results agree, from
+    # a spread of floor cells on freshly generated levels. FOV_BASIC is what the game uses;
+    # FOV_RESTRICTIVE is the reference the NumPy backend is held to: on floor cells it must see
+    # nothing FOV_RESTRICTIVE doesn't, since it only adds the symmetry rule on top
+    names = {libtcod.FOV_BASIC: 'FOV_BASIC', libtcod.FOV_RESTRICTIVE: 'FOV_RESTRICTIVE'}
+    algorithms = sorted(names)
+    cells = 0
+    agreeing = dict.fromkeys(algorithms, 0)
+    differing = dict.fromkeys(algorithms, 0)
+    most_differing = dict.fromkeys(algorithms, 0)
+    libtcod_seconds = numpy_seconds = 0.0
+    for i in range(levels):
+        level = make_level(i)
+        transparent = ~level.map.block_sight
+        fov_map = create_fov_map(level.mapHeight, level.mapWidth, level.map)
+        floor = zip(*numpy.nonzero(transparent))
+
+        for y, x in floor[::max(len(floor) * levels // runs, 1)]:
+            window = get_fov_window(x, y, SEIGHT_RADIUS, level.mapHeight, level.mapWidth)
+            start = timeit.default_timer()
+            symmetric = compute_fov_symmetric(transparent, x, y, SEIGHT_RADIUS, View.FOV_LIGHT_WALLS)
+            numpy_seconds += timeit.default_timer() - start
+            cells += 1
+
+            for algorithm in algorithms:
+                start = timeit.default_timer()
+                compute_fov(fov_map, x, y, SEIGHT_RADIUS, View.FOV_LIGHT_WALLS, algorithm)
+                fov = get_fov_mask(fov_map, level.mapHeight, level.mapWidth, window)
+                if algorithm == libtcod.FOV_BASIC:
+                    libtcod_seconds += timeit.default_timer() - start
+
+                if algorithm == libtcod.FOV_RESTRICTIVE:
+                    expect(not (symmetric & ~fov & transparent).any(),
+                           'numpy FOV sees floor FOV_RESTRICTIVE does not from %d, %d on level %d' % (x, y, i))
+                count = numpy.count_nonzero(fov != symmetric)
+                if not count:
+                    agreeing[algorithm] += 1
+                differing[algorithm] += count
+                most_differing[algorithm] = max(most_differing[algorithm], count)
+
+        libtcod.map_delete(fov_map)
+
+    report('fov, libtcod FOV_BASIC', libtcod_seconds, cells)
+    report('fov, numpy shadowcasting', numpy_seconds, cells)
+    for algorithm in algorithms:
+        name = names[algorithm]
+        print('%-40s %6d of %d' % ('fovs identical to ' + name, agreeing[algorithm], cells))
+        print('%-40s %10.1f cells/fov, %d at most' % (
+            'cells differing from ' + name, differing[algorithm] / float(max(cells - agreeing[algorithm], 1)),
+            most_differing[algorithm]))
+
+
+@benchmark
+def ctypes_calls(runs=100000):
+    # per call cost of hot libtcod functions without a prototype, boxing pointers by hand, against
+    # the same functions with argtypes declared; libtcodpy's wrappers only declare a prototype
+    # where it doesn't lose
+    raw = ctypes.CDLL(libtcod._lib._name)
+    typed = ctypes.CDLL(libtcod._lib._name)
+    con = libtcod.console_new(MAP_WIDTH, MAP_HEIGHT)
+    fov_map = libtcod.map_new(MAP_WIDTH, MAP_HEIGHT)
+    color = libtcod.Color(255, 255, 0)
+
+    c_int, c_void_p = ctypes.c_int, ctypes.c_void_p
+    typed.TCOD_console_put_char.argtypes = [c_void_p, c_int, c_int, c_int, c_int]
+    typed.TCOD_console_put_char_ex.argtypes = [c_void_p, c_int, c_int, c_int, libtcod.Color, libtcod.Color]
+    typed.TCOD_console_set_char_background.argtypes = [c_void_p, c_int, c_int, libtcod.Color, c_int]
+    typed.TCOD_map_is_in_fov.argtypes = [c_void_p, c_int, c_int]
+    typed.TCOD_map_is_in_fov.restype = ctypes.c_bool
+    typed.TCOD_random_get_int.argtypes = [c_void_p, c_int, c_int]
+
+    calls = [
+        ('console_put_char',
+         lambda: raw.TCOD_console_put_char(c_void_p(con), 1, 1, 64, libtcod.BKGND_NONE),
+         lambda: typed.TCOD_console_put_char(con, 1, 1, 64, libtcod.BKGND_NONE)),
+        ('console_put_char_ex',
+         lambda: raw.TCOD_console_put_char_ex(c_void_p(con), 1, 1, 64, color, color),
+         lambda: typed.TCOD_console_put_char_ex(con, 1, 1, 64, color, color)),
+        ('console_set_char_background',
+         lambda: raw.TCOD_console_set_char_background(c_void_p(con), 1, 1, color, libtcod.BKGND_SET),
+         lambda: typed.TCOD_console_set_char_background(con, 1, 1, color, libtcod.BKGND_SET)),
+        ('map_is_in_fov',
+         lambda: bool(raw.TCOD_map_is_in_fov(c_void_p(fov_map), 1, 1)),
+         lambda: typed.TCOD_map_is_in_fov(fov_map, 1, 1)),
+        ('random_get_int',
+         lambda: raw.TCOD_random_get_int(None, 0, 100),
+         lambda: typed.TCOD_random_get_int(None, 0, 100)),
+    ]
+    for name, before, after in calls:
+        for label, call in ((', no prototype', before), (', prototype', after)):
+            print('%-40s %10.3f us/call' % (name + label, timeit.timeit(call, number=runs) * 1e6 / runs))
+
+    libtcod.map_delete(fov_map)
+    libtcod.console_delete(con)
+
+
+@benchmark
+def map_render(runs=200):
+    # a frame of the map layer, fov redraw and object layer pushed to "con", while pacing (a
+    # cell or two repainted) and when every cell is repainted, as after scrolling or a level change
+    for redraw_all in (False, True):
+        consoles = []
+        for map_buffer in (False, True):
+            level = make_level()
+            view = OffscreenView(map_buffer)
+            player = Model.make_player(level.levelEntrance.x, level.levelEntrance.y)
+            player.mobComponent.initialize_fov(level)
+            steps = [player.x, player.x + 1]
+            frames = []
+
+            def frame():
+                player.x = steps[len(frames) % 2]
+                frames.append(1)
+                player.mobComponent.recompute_fov()
+                if redraw_all:
+                    view.reset_fov_redraw()
+                view.fov_redraw(player.mobComponent.fov_mask, level, player.x, player.y, SEIGHT_RADIUS)
+                view.render_map(level, player)
+
+            label = '%s, %s' % ('full redraw' if redraw_all else 'pacing',
+                                'array buffer' if map_buffer else 'console calls')
+            report('map frame, ' + label, timeit.timeit(frame, number=runs), runs)
+            consoles.append(view._con)
+
+        # both ways must leave the same map layer on "con"
+        expect(all(libtcod.console_get_char(consoles[0], x, y) == libtcod.console_get_char(consoles[1], x, y) and
+                   libtcod.console_get_char_background(consoles[0], x, y) ==
+                   libtcod.console_get_char_background(consoles[1], x, y)
+                   for y in range(MAP_HEIGHT) for x in range(MAP_WIDTH)),
+               'array buffer frame differs from console calls')
+
+
+class LegacyTile(GameObject):
+    # the Tile object every cell of the level map used to be
+    def __init__(self, x, y, char, name, color):
+        GameObject.__init__(self, x, y, char, name, color)
+        self.tileComponent = TileComponent(self, False)
+        self.tile_color = color
+        self.dark_color = color * 0.5
+        self.explored = False
+
+
+def build_legacy_map(level):
+    # the 2D list of Tiles the old Level._build_map made for the same layout: walls everywhere,
+    # then a new floor Tile for every carved cell
+    level_map = level.map
+    wall_color, floor_color = level.getWallColor(), level.getFloorColor()
+    tiles = []
+    for x in range(level.mapWidth):
+        column = []
+        for y in range(level.mapHeight):
+            tile = LegacyTile(x, y, level.getWallChar(), 'Wall', wall_color)
+            tile.wallComponent = WallComponent(tile)
+            column.append(tile)
+        tiles.append(column)
+
+    for y, x in zip(*numpy.nonzero(~level_map.blocks)):
+        tile = LegacyTile(x, y, level.getFloorChar(), 'Floor', floor_color)
+        tile.floorComponent = FloorComponent(tile)
+        tiles[x][y] = tile
+
+    return tiles
+
+
+def deep_sizeof(obj, seen=None):
+    # rough size in bytes of obj and everything it references, counting shared objects once
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, numpy.ndarray):
+        return max(sys.getsizeof(obj), obj.nbytes)
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+
+@benchmark
+def level_storage(runs=5):
+    # memory and generation time of the array backed map against the old list of Tile objects
+    for scale in (1, 10):
+        width, height = MAP_WIDTH * scale, MAP_HEIGHT * scale
+        level = Level('benchmark', seed=get_level_seed(BENCHMARK_SEED, 'benchmark'))
+        level.make_map(width, height)
+
+        label = '%dx%d' % (width, height)
+        tiles = build_legacy_map(level)
+        print('%-40s %10.1f KB' % ('level map arrays ' + label, deep_sizeof(level.map) / 1024.0))
+        print('%-40s %10.1f KB' % ('level map Tiles ' + label, deep_sizeof(tiles) / 1024.0))
+
+        # every cell must block and show as its Tile did
+        level_map = level.map
+        for attribute, array in (('blocks', level_map.blocks), ('block_sight', level_map.block_sight)):
+            expect((numpy.array([[getattr(tile, attribute) for tile in column] for column in tiles]).T == array).all(),
+                   '%s differs from the Tiles on the %s level' % (attribute, label))
+        expect((numpy.rollaxis(numpy.array([[tuple(tile.tile_color) for tile in column] for column in tiles]), 2, 0)
+                == level.lightColors.transpose(0, 2, 1)).all(), 'colors differ from the Tiles on the %s level' % label)
+
+        report('generate arrays ' + label, timeit.timeit(lambda: Level('benchmark', seed=level.seed).make_map(width, height),
+                                                        number=runs), runs)
+        report('build Tiles ' + label, timeit.timeit(lambda: build_legacy_map(level), number=runs), runs)
+
+
+@benchmark
+def room_placement(runs=3):
+    # the collision test of the room generator, against every placed room or through the grid
+    # index, and how many of the attempts become rooms with each placement mode
+    for scale, attempts in ((1, MAX_ROOMS), (20, 5000)):
+        width, height = MAP_WIDTH * scale, MAP_HEIGHT * scale
+        label = '%dx%d/%d' % (width, height, attempts)
+        candidates = []
+        for i in range(attempts):
+            w = get_random_int(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+            h = get_random_int(ROOM_MIN_SIZE, ROOM_MAX_SIZE)
+            candidates.append(Level.Room(get_random_int(0, width - w - 1), get_random_int(0, height - h - 1), w, h))
+
+        def linear():
+            placed = []
+            for room in candidates:
+                if not any(room.intersect(other) for other in placed):
+                    placed.append(room)
+            return placed
+
+        def grid():
+            index = RoomIndex(ROOM_INDEX_BUCKET_SIZE)
+            placed = []
+            for room in candidates:
+                if not index.intersects(room):
+                    index.add(room)
+                    placed.append(room)
+            return placed
+
+        report('collide, linear scan ' + label, timeit.timeit(linear, number=runs), runs)
+        report('collide, grid index ' + label, timeit.timeit(grid, number=runs), runs)
+        expect(grid() == linear(), 'grid index places other rooms than the linear scan on ' + label)
+
+        layouts = []
+        for placement, name in ((ROOM_PLACEMENT_RANDOM, 'random'), (ROOM_PLACEMENT_FREE_SPACE, 'free space')):
+            level = Level('benchmark', max_rooms=attempts, room_placement=placement,
+                          seed=get_level_seed(BENCHMARK_SEED, 'benchmark'))
+            seconds = timeit.timeit(lambda: level.make_map(width, height), number=1)
+            print('%-40s %10d rooms' % ('rooms, %s %s' % (name, label), len(level._rooms)))
+            report('generate, %s %s' % (name, label), seconds, 1)
+            layouts.append(level._rooms)
+
+        # the spots FreeSpace offers must be exactly those a brute force search finds, after adding
+        # rooms to sizes it already tracks; too slow to search on the big map
+        sizes = [(ROOM_MIN_SIZE, ROOM_MIN_SIZE), (ROOM_MAX_SIZE, ROOM_MIN_SIZE), (ROOM_MAX_SIZE, ROOM_MAX_SIZE)]
+        for rooms in layouts if scale == 1 else ():
+            free_space = FreeSpace(width, height)
+            for w, h in sizes:
+                free_spots(free_space, w, h)
+            for room in rooms:
+                free_space.add(room)
+            for w, h in sizes:
+                brute_force = set((x, y) for x in range(width - w) for y in range(height - h)
+                                  if not any(Level.Room(x, y, w, h).intersect(room) for room in rooms))
+                expect(free_spots(free_space, w, h) == brute_force,
+                       'free space spots for %dx%d rooms differ from a brute force search' % (w, h))
+
+
+def free_spots(free_space, w, h):
+    # every spot free_space.pick_position can give for a w by h room
+    count = []
+    free_space.pick_position(w, h, lambda a, b: count.append(b + 1) or 0)
+    return set(free_space.pick_position(w, h, lambda a, b: i) for i in range(count[0] if count else 0))
+
+
+class PerCellLevel(Level):
+    # a Level that carves rooms and tunnels one set_tile call per cell, as the generator used to
+    def _create_room(self, room):
+        for x, y in room.floor_spaces:
+            self._make_floor(x, y)
+
+    def _create_h_tunnel(self, x1, x2, y):
+        for x in range(min(x1, x2), max(x1, x2) + 1):
+            self._make_floor(x, y)
+
+    def _create_v_tunnel(self, y1, y2, x):
+        for y in range(min(y1, y2), max(y1, y2) + 1):
+            self._make_floor(x, y)
+
+
+@benchmark
+def level_generation(runs=20):
+    # whole levels generated per second, carving cell by cell against carving slices
+    for scale, max_rooms, runs in ((1, MAX_ROOMS, runs), (20, 5000, 1)):
+        width, height = MAP_WIDTH * scale, MAP_HEIGHT * scale
+        label = '%dx%d/%d' % (width, height, max_rooms)
+        tiles = []
+        for level_class, name in ((PerCellLevel, 'per cell'), (Level, 'slices')):
+            def generate():
+                level = level_class('benchmark', max_rooms=max_rooms, seed=get_level_seed(BENCHMARK_SEED, 'benchmark'))
+                level.make_map(width, height)
+                return level
+            seconds = timeit.timeit(generate, number=runs)
+            print('%-40s %10.1f levels/s' % ('generate, %s %s' % (name, label), runs / seconds))
+            tiles.append(generate().map.tile_type)
+
+        expect((tiles[0] == tiles[1]).all(), 'carving slices gives another map than carving cells on ' + label)
+
+    # a seeded level comes out the same whatever drew random numbers before it, and levels with
+    # other names come out different
+    layouts = []
+    for name in ('benchmark', 'benchmark', 'other'):
+        for i in range(get_random_int(1, 100)):
+            get_random_int(0, 100)
+        level = make_level(name)
+        layouts.append((level.map.tile_type, [(obj.x, obj.y, obj.name) for obj in level.objects]))
+    expect((layouts[0][0] == layouts[1][0]).all() and layouts[0][1] == layouts[1][1],
+           'the same seed gave two different levels')
+    expect(not (layouts[0][0] == layouts[2][0]).all(), 'two level names gave the same level')
+
+
+@benchmark
+def level_change(runs=20):
+    # what going down to a level it hasn't seen costs the game loop: generating the level there
+    # and then, or unpacking one a worker process generated ahead of time
+    names = range(2, runs + 2)
+    pregenerator = LevelPregenerator()
+    try:
+        for name in names:
+            pregenerator.request(name, get_level_seed(BENCHMARK_SEED, name))
+        while not all(pregenerator.is_ready(name) for name in names):
+            time.sleep(0.01)
+
+        generated, pregenerated = [], []
+
+        def generate():
+            for name in names:
+                level = Level(name, seed=get_level_seed(BENCHMARK_SEED, name))
+                level.make_map()
+                generated.append(level)
+
+        def take_pregenerated():
+            for name in names:
+                pregenerated.append(restore_level(pregenerator.take(name), BENCHMARK_SEED))
+
+        report('change level, generate', timeit.timeit(generate, number=1), runs)
+        report('change level, pregenerated', timeit.timeit(take_pregenerated, number=1), runs)
+
+        # a worker must make the very level the game would have made itself
+        for level, other in zip(generated, pregenerated):
+            expect((level.map.tile_type == other.map.tile_type).all() and
+                   [(obj.x, obj.y, obj.name) for obj in level.objects] ==
+                   [(obj.x, obj.y, obj.name) for obj in other.objects],
+                   'pregenerated level %s differs from one generated in place' % level.name)
+    finally:
+        pregenerator.close()
+
+
+@benchmark
+def level_store(runs=200, levels=40):
+    # revisiting random levels of a world that doesn't fit the store's budget
+    level_bytes = make_level().nbytes()
+    for live in (levels, 8, 1):
+        store = LevelStore(BENCHMARK_SEED, memory_budget=live * level_bytes)
+        packed = []
+        for name in range(1, levels + 1):
+            level = Level(name, seed=get_level_seed(BENCHMARK_SEED, name))
+            level.make_map()
+            packed.append(pack_level(snapshot_level(level)))
+            store.append(level)
+
+        visits = [get_random_int(0, levels - 1) for i in range(runs)]
+        seconds = timeit.timeit(lambda: [store[index] for index in visits], number=1)
+        stats = store.stats
+        label = '%d levels, %d fit' % (levels, live)
+        report('revisit, ' + label, seconds, runs)
+        print('%-40s %9.1f%% hits, %d evictions, %d spills, %.2fms max rehydrate' % (
+            'level store, ' + label, 100.0 * stats['hit_rate'], stats['evictions'], stats['spills'],
+            stats['max_rehydrate_seconds'] * 1000.0))
+        print('%-40s %10.1f KB' % ('level store memory, ' + label, store.nbytes() / 1024.0))
+        # levels that didn't change go back to the packed level or the slot they came from
+        expect(stats['spill_file_bytes'] <= sum(len(data) for data in packed),
+               'unchanged levels were spilled again, %s' % label)
+
+        # change every level visited, so each eviction packs it again and frees its slot
+        changed = [False] * levels
+        for index in visits * 5 + list(range(levels)):
+            explored = store[index].map.explored
+            explored[0, 0] = not explored[0, 0]
+            changed[index] = not changed[index]
+        for index in range(levels):
+            if changed[index]:
+                explored = store[index].map.explored
+                explored[0, 0] = not explored[0, 0]
+        stats = store.stats
+        print('%-40s %10.1f KB, %d spills, %d compactions' % (
+            'level store spill file, ' + label, stats['spill_file_bytes'] / 1024.0, stats['spills'],
+            stats['spill_compactions']))
+        expect(stats['spill_file_bytes'] <= 2 * sum(len(data) for data in packed),
+               'the spill file holds more dead levels than live ones, %s' % label)
+
+        # whether kept, packed or spilled to disk, a level must come back as it went in
+        for index in range(levels):
+            expect(pack_level(snapshot_level(store[index])) == packed[index],
+                   'level %d changed in the level store, %s' % (index + 1, label))
+        store.close()
+
+
+@benchmark
+def streaming_world(runs=2000):
+    # walking across a station sized level, streaming its chunks in and out as the player goes
+    level = StreamingLevel('benchmark', seed=BENCHMARK_SEED)
+    level.make_map()
+    player = GameObject(level.levelEntrance.x, level.levelEntrance.y, '@', 'player', libtcod.white)
+    view = OffscreenView()
+    first_chunk = player.x // level.map.chunk_size, player.y // level.map.chunk_size
+    # the chunk's [tile type ids, explored], which stay as they were when it is dropped
+    first_tiles, first_explored = level.map.get_chunk(*first_chunk)
+    resident = []
+
+    def walk():
+        # east along the station, cutting through walls, which stream_around doesn't care about
+        player.x += 1
+        level.stream_around(player.x, player.y)
+        level.is_blocked(player.x + 1, player.y)
+        fov = level.fov.compute_fov(player, SEIGHT_RADIUS, False)
+        view.fov_redraw(fov, level, player.x, player.y, SEIGHT_RADIUS)
+        resident.append(level.map.stats['resident'])
+
+    report('step, %dx%d chunk station' % (level.map.width_chunks, level.map.height_chunks),
+           timeit.timeit(walk, number=runs), runs)
+    stats = level.map.stats
+    print('%-40s %10d generated, %d evicted, %d resident' % (
+        'chunks', stats['generated'], stats['evicted'], stats['resident']))
+    print('%-40s %10.1f KB' % ('streaming level memory', level.nbytes() / 1024.0))
+    print('%-40s %10.1f KB' % ('same level as one LevelMap would need',
+                               level.map.width * level.map.height * 2 / 1024.0))
+
+    # memory stays bounded by the chunk cache, and a dropped chunk comes back as it was left
+    expect(max(resident) <= level.map.max_chunks, 'more chunks resident than the cache holds')
+    expect(not level.map.is_resident(*first_chunk), 'the chunk the walk started in was never dropped')
+    tiles, explored = level.map.get_chunk(*first_chunk)
+    expect((tiles == first_tiles).all() and (explored == first_explored).all() and first_explored.any(),
+           'a dropped chunk came back different')
+
+
+@benchmark
+def possible_moves(runs=100000):
+    # the neighbour lookup safe_move makes several times per step
+    level = make_level()
+    x, y = level.levelEntrance.x, level.levelEntrance.y
+
+    def is_blocked_scan():
+        return set(offset for offset in SURROUNDING_OFFSETS
+                   if not level.is_blocked(x + offset[0], y + offset[1]))
+
+    def neighbour_mask():
+        return MOVES_CLASS_BY_MASK[level.get_neighbour_mask(x, y)]
+
+    report('possible moves, 8 x is_blocked', timeit.timeit(is_blocked_scan, number=runs), runs)
+    report('possible moves, neighbour mask', timeit.timeit(neighbour_mask, number=runs), runs)
+
+
+@benchmark
+def save_game(runs=50):
+    # the packed save format against pickling the whole Model, and the list of Tiles the old
+    # shelve save pickled
+    model = Model(BENCHMARK_SEED, pregenerate_levels=0)
+    model.create_world()
+    filename = os.path.join(tempfile.mkdtemp(), 'savegame.dat')
+
+    # the generator's rooms are nested classes, which pickle can't find; they aren't saved anyway
+    for level in model.levels:
+        del level._rooms
+
+    def pickle_save():
+        with open(filename + '.pickle', 'wb') as f:
+            pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+
+    def pickle_load():
+        with open(filename + '.pickle', 'rb') as f:
+            return pickle.load(f)
+
+    save_model(model, filename)
+    pickle_save()
+    tiles = pickle.dumps(build_legacy_map(model.current_level), pickle.HIGHEST_PROTOCOL)
+    print('%-40s %10.1f KB' % ('save size, packed', os.path.getsize(filename) / 1024.0))
+    print('%-40s %10.1f KB' % ('save size, pickled Model', os.path.getsize(filename + '.pickle') / 1024.0))
+    print('%-40s %10.1f KB' % ('save size, pickled Tiles', len(tiles) / 1024.0))
+
+    report('save, packed', timeit.timeit(lambda: save_model(model, filename), number=runs), runs)
+    report('load, packed', timeit.timeit(lambda: load_model(Model(pregenerate_levels=0), filename), number=runs), runs)
+    report('save, pickled Model', timeit.timeit(pickle_save, number=runs), runs)
+    report('load, pickled Model', timeit.timeit(pickle_load, number=runs), runs)
+
+    # a load must give back the game that was saved, and so must a save written in the background
+    packed = pack_model(snapshot_model(model))
+    loaded = Model(pregenerate_levels=0)
+    load_model(loaded, filename)
+    expect(pack_model(snapshot_model(loaded)) == packed, 'loaded game differs from the saved one')
+
+    saver = BackgroundSaver(filename)
+    for i in range(runs):
+        saver.save(model)
+        saver.wait()
+    with open(filename, 'rb') as f:
+        expect(f.read() == packed, 'background save differs from a direct save')
+    stats = saver.stats
+    report('autosave, main thread blocked', stats['total_block_seconds'], stats['saves'])
+
+    # and a save that can't be written or packed must say so
+    failing = BackgroundSaver(os.path.join(filename, 'missing', 'savegame.dat'))
+    failing.save(model)
+    expect(isinstance(failing.wait(), (IOError, OSError)), 'a background save that failed to write went unreported')
+    combat = model.player.combatComponent
+    xp, combat.xp = combat.xp, 1 << 40
+    saver.save(model)
+    combat.xp = xp
+    expect(isinstance(saver.wait(), struct.error), 'a background save that failed to pack went unreported')
+
+
+def main(names):
+    for function in BENCHMARKS:
+        if not names or function.__name__ in names:
+            function()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -597,8 +597,6 @@ class ConsoleBuffer:
             console_get_height(dest) != self.height):
             raise ValueError('ConsoleBuffer.blit: Destination console has an incorrect size.')
 
-        s = struct.Struct('%di' % len(self.back_r))
-
         if fill_back:
             _lib.TCOD_console_fill_background(c_void_p(dest), (c_int * len(self.back_r))(*self.back_r), (c_int * len(self.back_g))(*self.back_g), (c_int * len(self.back_b))(*self.back_b))
 
@@ -606,6 +604,86 @@ class ConsoleBuffer:
             _lib.TCOD_console_fill_foreground(c_void_p(dest), (c_int * len(self.fore_r))(*self.fore_r), (c_int * len(self.fore_g))(*self.fore_g), (c_int * len(self.fore_b))(*self.fore_b))
             _lib.TCOD_console_fill_char(c_void_p(dest), (c_int * len(self.char))(*self.char))
 
+class ArrayConsoleBuffer(ConsoleBuffer):
+    # ConsoleBuffer stored in contiguous int32 NumPy arrays, which blit hands to the "fill"
+    # functions as they are, without copying. back and fore are (3, height, width) arrays of
+    # r, g, b and char is a (height, width) array of character codes, so they are indexed
+    # [y, x]; back_r etc. are views of single channels. Whole rectangles can be set at once
+    # with set_back_rect and set_fore_rect, or by writing to the arrays directly.
+    def __init__(self, width, height, back_r=0, back_g=0, back_b=0, fore_r=0, fore_g=0, fore_b=0, char=' '):
+        if not numpy_available:
+            raise ImportError('ArrayConsoleBuffer needs NumPy')
+        ConsoleBuffer.__init__(self, width, height, back_r, back_g, back_b, fore_r, fore_g, fore_b, char)
+
+    def clear(self, back_r=0, back_g=0, back_b=0, fore_r=0, fore_g=0, fore_b=0, char=' '):
+        # clears the console. values to fill it with are optional, defaults
+        # to black with no characters.
+        shape = (self.height, self.width)
+        self.back = numpy.empty((3,) + shape, dtype=numpy.int32)
+        self.fore = numpy.empty((3,) + shape, dtype=numpy.int32)
+        self.char = numpy.empty(shape, dtype=numpy.int32)
+        self.back_r, self.back_g, self.back_b = self.back
+        self.fore_r, self.fore_g, self.fore_b = self.fore
+        self.back[:] = numpy.array((back_r, back_g, back_b), dtype=numpy.int32).reshape(3, 1, 1)
+        self.fore[:] = numpy.array((fore_r, fore_g, fore_b), dtype=numpy.int32).reshape(3, 1, 1)
+        self.char[:] = ord(char)
+
+    def copy(self):
+        # returns a copy of this ArrayConsoleBuffer.
+        other = ArrayConsoleBuffer(self.width, self.height)
+        other.back[:] = self.back
+        other.fore[:] = self.fore
+        other.char[:] = self.char
+        return other
+
+    def set_fore(self, x, y, r, g, b, char):
+        # set the character and foreground color of one cell.
+        self.fore[:, y, x] = (r, g, b)
+        self.char[y, x] = ord(char)
+
+    def set_back(self, x, y, r, g, b):
+        # set the background color of one cell.
+        self.back[:, y, x] = (r, g, b)
+
+    def set(self, x, y, back_r, back_g, back_b, fore_r, fore_g, fore_b, char):
+        # set the background color, foreground color and character of one cell.
+        self.back[:, y, x] = (back_r, back_g, back_b)
+        self.fore[:, y, x] = (fore_r, fore_g, fore_b)
+        self.char[y, x] = ord(char)
+
+    def set_back_rect(self, x, y, w, h, r, g, b):
+        # set the background color of the w x h rectangle at x, y. r, g and b can each be a
+        # single value or a (h, w) array.
+        self.back_r[y:y + h, x:x + w] = r
+        self.back_g[y:y + h, x:x + w] = g
+        self.back_b[y:y + h, x:x + w] = b
+
+    def set_fore_rect(self, x, y, w, h, r, g, b, char):
+        # set the characters and foreground color of the w x h rectangle at x, y. r, g, b and
+        # char can each be a single value or a (h, w) array; char can also be a one character string.
+        if type(char) == str or type(char) == bytes:
+            char = ord(char)
+        self.fore_r[y:y + h, x:x + w] = r
+        self.fore_g[y:y + h, x:x + w] = g
+        self.fore_b[y:y + h, x:x + w] = b
+        self.char[y:y + h, x:x + w] = char
+
+    def blit(self, dest, fill_fore=True, fill_back=True):
+        # use libtcod's "fill" functions to write the buffer to a console, straight from the arrays.
+        if (console_get_width(dest) != self.width or
+            console_get_height(dest) != self.height):
+            raise ValueError('ArrayConsoleBuffer.blit: Destination console has an incorrect size.')
+
+        int_p = POINTER(c_int)
+        if fill_back:
+            _lib.TCOD_console_fill_background(dest, self.back_r.ctypes.data_as(int_p),
+                                              self.back_g.ctypes.data_as(int_p), self.back_b.ctypes.data_as(int_p))
+
+        if fill_fore:
+            _lib.TCOD_console_fill_foreground(dest, self.fore_r.ctypes.data_as(int_p),
+                                              self.fore_g.ctypes.data_as(int_p), self.fore_b.ctypes.data_as(int_p))
+            _lib.TCOD_console_fill_char(dest, self.char.ctypes.data_as(int_p))
+
 _lib.TCOD_console_is_fullscreen.restype = c_bool
 _lib.TCOD_console_is_window_closed.restype = c_bool
 _lib.TCOD_console_has_mouse_focus.restype = c_bool
@@ -936,6 +1014,7 @@ _lib.TCOD_console_clear.argtypes=[c_void_p ]
 def console_clear(con):
     return _lib.TCOD_console_clear(con)
 
+# no prototype: boxing the console by hand is cheaper than argtypes conversion on every call
 #_lib.TCOD_console_put_char.restype=c_void
 #_lib.TCOD_console_put_char.argtypes=[c_void_p ,c_int, c_int, c_int, c_int ]
 def console_put_char(con, x, y, c, flag=BKGND_DEFAULT):
@@ -1139,7 +1218,7 @@ def console_get_height(con):
 
 _lib.TCOD_console_blit.argtypes=[c_void_p ,c_int, c_int, c_int, c_int, c_void_p , c_int, c_int, c_float, c_float]
 def console_blit(src, x, y, w, h, dst, xdst, ydst, ffade=1.0,bfade=1.0):
-    _lib.TCOD_console_blit(src, x, y, w, h, dst, xdst, ydst, c_float(ffade), c_float(bfade))
+    _lib.TCOD_console_blit(src, x, y, w, h, dst, xdst, ydst, ffade, bfade)
 
 _lib.TCOD_console_set_key_color.argtypes=[c_void_p ,Color ]
 def console_set_key_color(con, col):
@@ -1983,7 +2062,7 @@ def map_clear(m,walkable=False,transparent=False):
 #_lib.TCOD_map_compute_fov.restype=c_void
 _lib.TCOD_map_compute_fov.argtypes=[c_void_p , c_int, c_int, c_int, c_bool, c_int ]
 def map_compute_fov(m, x, y, radius=0, light_walls=True, algo=FOV_RESTRICTIVE ):
-    _lib.TCOD_map_compute_fov(m, x, y, c_int(radius), c_bool(light_walls), c_int(algo))
+    _lib.TCOD_map_compute_fov(m, x, y, radius, light_walls, algo)
 
 #_lib.TCOD_map_set_in_fov.restype=c_void
 _lib.TCOD_map_set_in_fov.argtypes=[c_void_p , c_int, c_int, c_bool ]
@@ -2025,6 +2104,49 @@ _lib.TCOD_map_get_nb_cells.argtypes=[c_void_p ]
 def map_get_nb_cells(map):
     return TCOD_map_get_nb_cells(map)
 
+# bulk access to a map's cells. TCOD_map_t is {int width, height, nbcells; cell_t *cells},
+# where each cell is one byte of bit fields: transparent, walkable, fov.
+class _CMap(Structure):
+    _fields_=[('width', c_int),
+              ('height', c_int),
+              ('nbcells', c_int),
+              ('cells', POINTER(c_uint8)),
+              ]
+
+_MAP_CELL_TRANSPARENT = 1
+_MAP_CELL_WALKABLE = 2
+_MAP_CELL_FOV = 4
+
+def _map_cells(m):
+    cmap = cast(m, POINTER(_CMap)).contents
+    return cmap.width, cmap.height, cmap.cells
+
+def map_set_properties_array(m, transparent, walkable):
+    # set every cell of the map at once, from two [y, x] (height, width) arrays or sequences of rows
+    w, h, cells = _map_cells(m)
+    if numpy_available:
+        transparent = numpy.asarray(transparent, dtype=bool).reshape(h, w)
+        walkable = numpy.asarray(walkable, dtype=bool).reshape(h, w)
+        buf = numpy.ctypeslib.as_array(cells, shape=(h, w))
+        # keep the fov bits, replace the rest
+        buf &= _MAP_CELL_FOV
+        buf |= transparent * numpy.uint8(_MAP_CELL_TRANSPARENT)
+        buf |= walkable * numpy.uint8(_MAP_CELL_WALKABLE)
+    else:
+        for y in range(h):
+            for x in range(w):
+                cells[x + y * w] = ((cells[x + y * w] & _MAP_CELL_FOV) |
+                                    (_MAP_CELL_TRANSPARENT if transparent[y][x] else 0) |
+                                    (_MAP_CELL_WALKABLE if walkable[y][x] else 0))
+
+def map_get_fov_array(m):
+    # the cells in fov after map_compute_fov, as a boolean [y, x] array (a list of rows without numpy)
+    w, h, cells = _map_cells(m)
+    if numpy_available:
+        buf = numpy.ctypeslib.as_array(cells, shape=(h, w))
+        return (buf & _MAP_CELL_FOV).astype(bool)
+    return [[bool(cells[x + y * w] & _MAP_CELL_FOV) for x in range(w)] for y in range(h)]
+
 ############################
 # pathfinding module
 ############################
@@ -1,304 +1,473 @@
-import math
-import random
-
-from components.basic_components import *
-from utilityClasses import *
-from defaultConstants import *
-
-class GameObject:
-   """Base class for all game objects"""
-   def __init__(self, x, y, char, name, color, blocks=False, always_visible=False, block_sight = None):
-      self.x = x
-      self.y = y
-      self.char = char
-      self.name = name
-      self.color = color
-      self.blocks = blocks
-      self.always_visible = always_visible
-
-   def distance_to_object(self, other):
-      #return the distance to another object
-      dx = other.x - self.x
-      dy = other.y - self.y
-      return math.sqrt(dx ** 2 + dy ** 2)
-
-   def distance_to_position(self, x, y):
-      #return the distance to some coordinates
-      return math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
-
-
-class Tile(GameObject):
-   """GameObject with a tile component, makes up the spaces on the map"""
-   def __init__(self, x, y, char, name, color, blocks=False, always_visible=False, block_sight = None):
-      GameObject.__init__(self, x, y, char, name, color, blocks, always_visible, block_sight)
-      self.tileComponent = TileComponent(self, blocks)
-      self.tile_color = color
-      self.dark_color = color * 0.5
-      self.explored = False
-
-
-class Level:
-   """class contains map data and monster/item data"""
-   def __init__(self, name, max_rooms=MAX_ROOMS, min_room_size=ROOM_MIN_SIZE, max_room_size=ROOM_MAX_SIZE, max_room_objects=MAX_ROOM_OBJECTS):
-      self.objects = []
-      self._wallChar = None
-      self._floorChar = None
-      self._wallColor = COLOR_LIGHT_WALL
-      self._floorColor = COLOR_LIGHT_GROUND
-      self._entranceChar = ENTRANCE_CHAR
-      self._exitChar = EXIT_CHAR
-      self._name = name
-      self.mapHeight = MAP_HEIGHT
-      self.mapWidth = MAP_WIDTH
-      self._maxRoomObjects = max_room_objects
-      self._maxRooms = max_rooms
-      self._roomMinSize = min_room_size
-      self._roomMaxSize = max_room_size
-
-   @property
-   def map(self):
-       return self._map
-   @map.setter
-   def map(self, value):
-       self._map = value
-
-   @property
-   def name(self):
-       return self._name
-   @name.setter
-   def name(self, value):
-       self._name = value
-
-   @property
-   def levelEntrance(self):
-       return self._levelEntrance
-   @levelEntrance.setter
-   def levelEntrance(self, value):
-       self._levelEntrance = value
-
-   @property
-   def levelExit(self):
-       return self._levelExit
-   @levelExit.setter
-   def levelExit(self, value):
-       self._levelExit = value
-
-   @property
-   def objects(self):
-       return self._objects
-   @objects.setter
-   def objects(self, value):
-       self._objects = value
-
-   class Room:
-
-      class Rect:
-         #a rectangle on the map. used to characterize a room.
-         def __init__(self, x, y, w, h):
-            self.x1 = x
-            self.y1 = y
-            self.x2 = x + w
-            self.y2 = y + h
-
-         def center(self):
-            center_x = (self.x1 + self.x2) / 2
-            center_y = (self.y1 + self.y2) / 2
-            return (center_x, center_y)
-
-         def intersect(self, other):
-            #returns true if this rectangle intersects with another one
-            return (self.x1 <= other.x2 and self.x2 >= other.x1 and
-                  self.y1 <= other.y2 and self.y2 >= other.y1)
-
-      def __init__(self, x, y, w, h, roomEffect=None):
-         self.room_effect = roomEffect
-         self.wall_rect = self.Rect(x - 1, y - 1, w + 2 , h + 2)
-         self._floor_rect = self.Rect(x, y, w - 1, h - 1)
-         self.floor_spaces = [ (floor_x, floor_y) for floor_x in range(x, x + w) for floor_y in range(y, y + h) ]
-
-      @property
-      def center(self):
-          return self.wall_rect.center()
-
-      def intersect(self, other):
-         return self.wall_rect.intersect(other.wall_rect)
-
-      def get_random_floor_space(self):
-         return random.choice(self.floor_spaces)
-
-      def get_random_floor_space_not_touching_wall(self):
-         x1, x2, y1, y2 = self._floor_rect.x1, self._floor_rect.x2, self._floor_rect.y1, self._floor_rect.y2
-         if x2 - x1 <= 1 or y2 - y1 <= 1:
-            return False #no floor spaces not touching a wall
-
-         while True:
-            x, y = self.get_random_floor_space()
-            if x != x1 and x != x2 and y != y1 and y != y2:
-               return (x, y)
-
-   def send_to_back(self, obj):
-      #make this object be drawn first, so all others appear above it if they're in the same tile.
-      if obj in self.objects:
-         self.objects.remove(obj)
-
-      self.objects.insert(0, obj)
-
-   def is_blocked(self, x, y):
-      #first test the map tile
-      if self._map[x][y].blocks:
-         return True
-
-      #now check for any blocking objects
-      for obj in self.objects:
-         if obj.blocks and obj.x == x and obj.y == y:
-            return True
-
-      return False
-
-   def make_map(self, mapWidth = None, mapHeight = None, maxRooms = None, roomMinSize = None, roomMaxSize = None):
-      self._build_map(mapWidth, mapHeight, maxRooms, roomMinSize, roomMaxSize)
-      #create entrance and exit
-      self._make_level_entrance()
-      self._make_level_exit()
-
-   def _build_map(self, mapWidth = None, mapHeight = None, maxRooms = None, roomMinSize = None, roomMaxSize = None):
-      if mapWidth is not None:
-         self.mapWidth = mapWidth
-      if mapHeight is not None:
-         self.mapHeight = mapHeight
-      if maxRooms is not None:
-         self._maxRooms = maxRooms
-      if roomMinSize is not None:
-         self._roomMinSize = roomMinSize
-      if roomMaxSize is not None:
-         self.roomMaxSize = roomMaxSize
-
-      #fill map with "blocked" tiles
-      self._map = [[ self._make_wall(x, y)
-             for y in range(self.mapHeight) ]
-           for x in range(self.mapWidth) ]
-
-      self._rooms = []
-      num_rooms = 0
-
-      for r in range(self._maxRooms):
-         #random width and height
-         w = get_random_int(self._roomMinSize, self._roomMaxSize)
-         h = get_random_int(self._roomMinSize, self._roomMaxSize)
-         #random position without _going out of the boundaries of the map
-         x = get_random_int(0, self.mapWidth - w - 1)
-         y = get_random_int(0, self.mapHeight - h - 1)
-
-         #"Rect" class makes rectangles easier to work with
-         new_room = self.Room(x, y, w, h)
-
-         #run through the other rooms and see if they intersect with this one
-         failed = False
-         for other_room in self._rooms:
-            if new_room.intersect(other_room):
-                failed = True
-                break
-
-         if not failed:
-            #this means there are no intersections, so this room is valid
-
-            #"paint" it to the map's tiles
-            self._create_room(new_room)
-
-            #add some contents to this room, such as monsters
-            #self.place_objects(new_room)
-
-            #center coordinates of new room, will be useful later
-            new_x, new_y = new_room.center
-
-            if num_rooms > 0:
-               #all rooms after the first:
-               #connect it to the previous room with a tunnel
-
-               #center coordinates of previous room
-               prev_x, prev_y = self._rooms[num_rooms - 1].center
-
-               #draw a coin (random number that is either 0 or 1)
-               if get_random_int(0, 1) == 1:
-                  #first move horizontally, then vertically
-                  self._create_h_tunnel(prev_x, new_x, prev_y)
-                  self._create_v_tunnel(prev_y, new_y, new_x)
-               else:
-                  #first move vertically, then horizontally
-                  self._create_v_tunnel(prev_y, new_y, prev_x)
-                  self._create_h_tunnel(prev_x, new_x, new_y)
-
-            #finally, append the new room to the list
-            self._rooms.append(new_room)
-            num_rooms += 1
-
-   def _create_room(self, room):
-      #go through the tiles in the rectangle and make them passable
-      for x, y in room.floor_spaces:
-         self._map[x][y] = self._make_floor(x, y)
-
-   def _create_h_tunnel(self, x1, x2, y):
-      #horizontal tunnel. min() and max() are used in case x1>x2
-      for x in range(min(x1, x2), max(x1, x2) + 1):
-         self._map[x][y] = self._make_floor(x, y)
-
-   def _create_v_tunnel(self, y1, y2, x):
-      #vertical tunnel
-      for y in range(min(y1, y2), max(y1, y2) + 1):
-         self._map[x][y] = self._make_floor(x, y)
-
-   def _make_wall(self, x, y):
-      wall = Tile(x, y, self.getWallChar(), "Wall", self.getWallColor())
-      wall.wallComponent = WallComponent(wall)
-      return wall
-
-   def _make_floor(self, x, y):
-      floor = Tile(x, y, self.getFloorChar(), "Floor", self.getFloorColor())
-      floor.floorComponent = FloorComponent(floor)
-      return floor
-
-   def _make_level_entrance(self):
-      x, y = self._get_exit_space()
-      entrance = self._map[x][y]
-      entrance.entranceComponent = LevelExitComponent(entrance, 'Entrance', self._entranceChar)
-      self.send_to_back(entrance)  #so it's drawn below the monsters
-      self._levelEntrance = entrance
-
-   def _make_level_exit(self):
-      x, y = self._get_exit_space()
-      exit = self._map[x][y]
-      exit.exitComponent = LevelExitComponent(exit, 'Exit', self._exitChar)
-      self.send_to_back(exit)  #so it's drawn below the monsters
-      self._levelExit = exit
-
-   def _get_exit_space(self):
-      goodRoom = False
-      while not goodRoom:
-         room = self._rooms[get_random_int(0, len(self._rooms) - 1)]
-         goodRoom = True
-         for x, y in room.floor_spaces:
-            if hasattr(self._map[x][y], 'entranceComponent') or hasattr(self._map[x][y], 'exitComponent'):
-               goodRoom = False
-
-      space = room.get_random_floor_space_not_touching_wall()
-      if space is False:
-         space = room.get_random_floor_space()
-      return space
-
-   def _place_objects(self, room):
-      numItems = get_random_int(0, self._maxRoomObjects)
-      goodSpace = False
-      while not goodSpace:
-         space = room.get_random_floor_space
-
-   def getWallColor(self):
-      return self._wallColor
-
-   def getFloorColor(self):
-      return self._floorColor
-
-   def getWallChar(self):
-      return self._wallChar
-
-   def getFloorChar(self):
-      return self._floorChar
+import math
+from collections import OrderedDict
+
+from components.basic_components import *
+from fovService import FovService
+from levelMap import LevelMap
+from roomPlacement import RoomIndex, FreeSpace
+from tileTypes import TILE_TYPES
+from utilityClasses import *
+from defaultConstants import *
+
+class GameObject:
+   """Base class for all game objects"""
+   def __init__(self, x, y, char, name, color, blocks=False, always_visible=False, block_sight = None):
+      self.x = x
+      self.y = y
+      self.char = char
+      self.name = name
+      self.color = color
+      self.blocks = blocks
+      self.always_visible = always_visible
+      self.level = None
+      self.components = []
+
+   def distance_to_object(self, other):
+      #return the distance to another object
+      dx = other.x - self.x
+      dy = other.y - self.y
+      return math.sqrt(dx ** 2 + dy ** 2)
+
+   def distance_to_position(self, x, y):
+      #return the distance to some coordinates
+      return math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
+
+
+class Level:
+   """class contains map data and monster/item data"""
+   #whether the map is streamed in chunks rather than held whole, see streamingLevel.StreamingLevel
+   STREAMING = False
+
+   def __init__(self, name, max_rooms=MAX_ROOMS, min_room_size=ROOM_MIN_SIZE, max_room_size=ROOM_MAX_SIZE, max_room_objects=MAX_ROOM_OBJECTS, room_placement=ROOM_PLACEMENT, seed=None):
+      self.objects = []
+      self._objectsAt = {}
+      self._objectsWith = {}
+      self._fov = None
+      self._entranceChar = ENTRANCE_CHAR
+      self._exitChar = EXIT_CHAR
+      self._name = name
+      self.mapHeight = MAP_HEIGHT
+      self.mapWidth = MAP_WIDTH
+      self._maxRoomObjects = max_room_objects
+      self._maxRooms = max_rooms
+      self._roomMinSize = min_room_size
+      self._roomMaxSize = max_room_size
+      self._roomPlacement = room_placement
+      self._seed = seed
+      #random stream the map is generated from, 0 (libtcod's default stream) when there is no seed
+      self._rng = 0
+
+   @property
+   def map(self):
+       return self._map
+   @map.setter
+   def map(self, value):
+       self._map = value
+
+   @property
+   def fov(self):
+       return self._fov
+
+   @property
+   def lightColors(self):
+       self._update_color_arrays()
+       return self._lightColors
+
+   @property
+   def darkColors(self):
+       self._update_color_arrays()
+       return self._darkColors
+
+   @property
+   def exploredMask(self):
+       return self._map.explored
+
+   @property
+   def name(self):
+       return self._name
+   @name.setter
+   def name(self, value):
+       self._name = value
+
+   @property
+   def seed(self):
+       return self._seed
+
+   @property
+   def levelEntrance(self):
+       return self._levelEntrance
+   @levelEntrance.setter
+   def levelEntrance(self, value):
+       self._levelEntrance = value
+
+   @property
+   def levelExit(self):
+       return self._levelExit
+   @levelExit.setter
+   def levelExit(self, value):
+       self._levelExit = value
+
+   @property
+   def objects(self):
+       return self._objects
+   @objects.setter
+   def objects(self, value):
+       self._objects = value
+
+   class Room:
+
+      class Rect:
+         #a rectangle on the map. used to characterize a room.
+         def __init__(self, x, y, w, h):
+            self.x1 = x
+            self.y1 = y
+            self.x2 = x + w
+            self.y2 = y + h
+
+         def center(self):
+            center_x = (self.x1 + self.x2) / 2
+            center_y = (self.y1 + self.y2) / 2
+            return (center_x, center_y)
+
+         def intersect(self, other):
+            #returns true if this rectangle intersects with another one
+            return (self.x1 <= other.x2 and self.x2 >= other.x1 and
+                  self.y1 <= other.y2 and self.y2 >= other.y1)
+
+      def __init__(self, x, y, w, h, roomEffect=None):
+         self.room_effect = roomEffect
+         self.wall_rect = self.Rect(x - 1, y - 1, w + 2 , h + 2)
+         self._floor_rect = self.Rect(x, y, w - 1, h - 1)
+         self.floor_spaces = [ (floor_x, floor_y) for floor_x in range(x, x + w) for floor_y in range(y, y + h) ]
+
+      @property
+      def center(self):
+          return self.wall_rect.center()
+
+      @property
+      def floor_rect(self):
+          #the floor of the room; x2 and y2 are the last floor column and row
+          return self._floor_rect
+
+      def intersect(self, other):
+         return self.wall_rect.intersect(other.wall_rect)
+
+      def get_random_floor_space(self, stream=0):
+         return self.floor_spaces[get_random_int(0, len(self.floor_spaces) - 1, stream)]
+
+      def get_random_floor_space_not_touching_wall(self, stream=0):
+         x1, x2, y1, y2 = self._floor_rect.x1, self._floor_rect.x2, self._floor_rect.y1, self._floor_rect.y2
+         if x2 - x1 <= 1 or y2 - y1 <= 1:
+            return False #no floor spaces not touching a wall
+
+         while True:
+            x, y = self.get_random_floor_space(stream)
+            if x != x1 and x != x2 and y != y1 and y != y2:
+               return (x, y)
+
+   def add_object(self, obj):
+      self.objects.append(obj)
+      self._index_object(obj)
+
+   def remove_object(self, obj):
+      self.objects.remove(obj)
+      self._unindex_object(obj)
+
+   def send_to_back(self, obj):
+      #make this object be drawn first, so all others appear above it if they're in the same tile.
+      if obj in self.objects:
+         self.objects.remove(obj)
+      else:
+         self._index_object(obj)
+
+      self.objects.insert(0, obj)
+
+   def move_object(self, obj, old_x, old_y):
+      #keep the occupancy index up to date after obj moved away from (old_x, old_y)
+      self._unplace_object(obj, old_x, old_y)
+      self._place_object(obj, obj.x, obj.y)
+
+   def get_objects_at(self, x, y):
+      #all objects on this level at (x, y)
+      return self._objectsAt.get((x, y), ())
+
+   def get_objects_with(self, component_type):
+      #all objects on this level that have a component of this type, or of a subclass of it
+      owners = self._objectsWith.get(component_type)
+      return owners.keys() if owners is not None else ()
+
+   def register_component(self, component):
+      #index the owner under every component class the component is an instance of; an owner is
+      #counted rather than listed twice when two of its components share a base class
+      for component_type in component_types(component):
+         owners = self._objectsWith.setdefault(component_type, OrderedDict())
+         owners[component.owner] = owners.get(component.owner, 0) + 1
+
+   def unregister_component(self, component):
+      for component_type in component_types(component):
+         owners = self._objectsWith[component_type]
+         owners[component.owner] -= 1
+         if not owners[component.owner]:
+            del owners[component.owner]
+         if not owners:
+            del self._objectsWith[component_type]
+
+   def _index_object(self, obj):
+      obj.level = self
+      self._place_object(obj, obj.x, obj.y)
+      for component in obj.components:
+         self.register_component(component)
+
+   def _unindex_object(self, obj):
+      self._unplace_object(obj, obj.x, obj.y)
+      for component in obj.components:
+         self.unregister_component(component)
+      if self._fov is not None:
+         self._fov.release(obj)
+      obj.level = None
+
+   def _place_object(self, obj, x, y):
+      self._objectsAt.setdefault((x, y), []).append(obj)
+
+   def _unplace_object(self, obj, x, y):
+      occupants = self._objectsAt[(x, y)]
+      occupants.remove(obj)
+      if not occupants:
+         del self._objectsAt[(x, y)]
+
+   def is_blocked(self, x, y):
+      #first test the map tile
+      if self._map.is_blocked(x, y):
+         return True
+
+      #now check for any blocking objects
+      for obj in self.get_objects_at(x, y):
+         if obj.blocks:
+            return True
+
+      return False
+
+   def get_neighbour_mask(self, x, y):
+      #bit mask of the passable cells around (x, y), see NEIGHBOUR_BITS
+      mask = self._map.get_neighbour_mask(x, y)
+
+      #take out the cells held by blocking objects
+      for (dx, dy), bit in NEIGHBOUR_BITS.items():
+         if mask & bit:
+            for obj in self._objectsAt.get((x + dx, y + dy), ()):
+               if obj.blocks:
+                  mask &= ~bit
+                  break
+
+      return mask
+
+   def stream_around(self, x, y):
+      #the whole map is always in memory, so there is nothing to load around (x, y)
+      pass
+
+   def make_map(self, mapWidth = None, mapHeight = None, maxRooms = None, roomMinSize = None, roomMaxSize = None):
+      #a seeded level draws from its own random stream, so it comes out the same whatever else used randomness
+      if self._seed is not None:
+         self._rng = create_random_stream(self._seed)
+      try:
+         self._build_map(mapWidth, mapHeight, maxRooms, roomMinSize, roomMaxSize)
+         self._map.build_neighbours()
+         #create entrance and exit
+         self._make_level_entrance()
+         self._make_level_exit()
+      finally:
+         if self._rng:
+            delete_random_stream(self._rng)
+            self._rng = 0
+      self._build_color_arrays()
+      self._fov = FovService(self._map)
+
+   def load_map(self, tile_type, explored):
+      #rebuild the map from saved tile type ids and explored flags instead of generating it
+      self.mapHeight, self.mapWidth = tile_type.shape
+      self._map = LevelMap(self.mapWidth, self.mapHeight, self.get_tile_types())
+      self._map.set_tiles(tile_type)
+      self._map.explored[:] = explored
+      self._map.build_neighbours()
+      self._build_color_arrays()
+      self._fov = FovService(self._map)
+
+   def _build_map(self, mapWidth = None, mapHeight = None, maxRooms = None, roomMinSize = None, roomMaxSize = None):
+      if mapWidth is not None:
+         self.mapWidth = mapWidth
+      if mapHeight is not None:
+         self.mapHeight = mapHeight
+      if maxRooms is not None:
+         self._maxRooms = maxRooms
+      if roomMinSize is not None:
+         self._roomMinSize = roomMinSize
+      if roomMaxSize is not None:
+         self._roomMaxSize = roomMaxSize
+
+      #fill map with "blocked" tiles
+      self._map = LevelMap(self.mapWidth, self.mapHeight, self.get_tile_types(), TILE_WALL)
+
+      self._rooms = []
+      num_rooms = 0
+      #placed rooms, indexed so a new room is only checked against the rooms near it
+      room_index = RoomIndex(ROOM_INDEX_BUCKET_SIZE)
+      free_space = None
+      if self._roomPlacement == ROOM_PLACEMENT_FREE_SPACE:
+         free_space = FreeSpace(self.mapWidth, self.mapHeight)
+
+      for r in range(self._maxRooms):
+         #random width and height
+         w = get_random_int(self._roomMinSize, self._roomMaxSize, self._rng)
+         h = get_random_int(self._roomMinSize, self._roomMaxSize, self._rng)
+
+         if free_space is not None:
+            #pick one of the positions where a room this size still fits
+            position = free_space.pick_position(w, h, lambda a, b: get_random_int(a, b, self._rng))
+            if position is None:
+               continue
+            x, y = position
+         else:
+            #random position without _going out of the boundaries of the map
+            x = get_random_int(0, self.mapWidth - w - 1, self._rng)
+            y = get_random_int(0, self.mapHeight - h - 1, self._rng)
+
+         #"Rect" class makes rectangles easier to work with
+         new_room = self.Room(x, y, w, h)
+
+         #check the rooms around this one to see if they intersect with it
+         failed = free_space is None and room_index.intersects(new_room)
+
+         if not failed:
+            #this means there are no intersections, so this room is valid
+
+            #"paint" it to the map's tiles
+            self._create_room(new_room)
+
+            #add some contents to this room, such as monsters
+            #self.place_objects(new_room)
+
+            #center coordinates of new room, will be useful later
+            new_x, new_y = new_room.center
+
+            if num_rooms > 0:
+               #all rooms after the first:
+               #connect it to the previous room with a tunnel
+
+               #center coordinates of previous room
+               prev_x, prev_y = self._rooms[num_rooms - 1].center
+
+               #draw a coin (random number that is either 0 or 1)
+               if get_random_int(0, 1, self._rng) == 1:
+                  #first move horizontally, then vertically
+                  self._create_h_tunnel(prev_x, new_x, prev_y)
+                  self._create_v_tunnel(prev_y, new_y, new_x)
+               else:
+                  #first move vertically, then horizontally
+                  self._create_v_tunnel(prev_y, new_y, prev_x)
+                  self._create_h_tunnel(prev_x, new_x, new_y)
+
+            #finally, append the new room to the list
+            self._rooms.append(new_room)
+            if free_space is not None:
+               free_space.add(new_room)
+            else:
+               room_index.add(new_room)
+            num_rooms += 1
+
+   def nbytes(self):
+      #memory held by the level's map, color arrays and FOVs
+      size = self._map.nbytes() + self._lightColors.nbytes + self._darkColors.nbytes
+      if self._fov is not None:
+         size += self._fov.nbytes()
+      return size
+
+   def _build_color_arrays(self):
+      #cache the lit and unlit background color of every tile as [channel, y, x] arrays,
+      #so the view can push the whole background layer with a single console fill
+      self._lightColors, self._darkColors = self._map.get_color_arrays()
+      self._colorsVersion = self._map.version
+
+   def _update_color_arrays(self):
+      #a tile changed since the arrays were built, so they no longer match the map
+      if self._colorsVersion != self._map.version:
+         self._build_color_arrays()
+
+   def _create_room(self, room):
+      #make the tiles in the rectangle passable, all in one go
+      floor = room.floor_rect
+      self._map.fill_rect(floor.x1, floor.y1, floor.x2 + 1, floor.y2 + 1, TILE_FLOOR)
+
+   def _create_h_tunnel(self, x1, x2, y):
+      #horizontal tunnel. min() and max() are used in case x1>x2
+      self._map.fill_rect(min(x1, x2), y, max(x1, x2) + 1, y + 1, TILE_FLOOR)
+
+   def _create_v_tunnel(self, y1, y2, x):
+      #vertical tunnel
+      self._map.fill_rect(x, min(y1, y2), x + 1, max(y1, y2) + 1, TILE_FLOOR)
+
+   def _make_wall(self, x, y):
+      self._map.set_tile(x, y, TILE_WALL)
+
+   def _make_floor(self, x, y):
+      self._map.set_tile(x, y, TILE_FLOOR)
+
+   def _make_level_entrance(self):
+      x, y = self._get_exit_space()
+      self._map.set_tile(x, y, TILE_ENTRANCE)
+      self.send_to_back(self.create_level_entrance(x, y))  #so it's drawn below the monsters
+
+   def _make_level_exit(self):
+      x, y = self._get_exit_space()
+      self._map.set_tile(x, y, TILE_EXIT)
+      self.send_to_back(self.create_level_exit(x, y))  #so it's drawn below the monsters
+
+   def create_level_entrance(self, x, y):
+      #the entrance object at (x, y); it still has to be added to the level's objects
+      entrance = GameObject(x, y, self._entranceChar, 'Entrance', COLOR_EXIT)
+      entrance.entranceComponent = LevelExitComponent(entrance, 'Entrance', self._entranceChar)
+      self._levelEntrance = entrance
+      return entrance
+
+   def create_level_exit(self, x, y):
+      #the exit object at (x, y); it still has to be added to the level's objects
+      exit = GameObject(x, y, self._exitChar, 'Exit', COLOR_EXIT)
+      exit.exitComponent = LevelExitComponent(exit, 'Exit', self._exitChar)
+      self._levelExit = exit
+      return exit
+
+   def _get_exit_space(self):
+      exit_spaces = set((obj.x, obj.y) for obj in self.get_objects_with(LevelExitComponent))
+      goodRoom = False
+      while not goodRoom:
+         room = self._rooms[get_random_int(0, len(self._rooms) - 1, self._rng)]
+         goodRoom = True
+         for space in room.floor_spaces:
+            if space in exit_spaces:
+               goodRoom = False
+
+      space = room.get_random_floor_space_not_touching_wall(self._rng)
+      if space is False:
+         space = room.get_random_floor_space(self._rng)
+      return space
+
+   def _place_objects(self, room):
+      numItems = get_random_int(0, self._maxRoomObjects, self._rng)
+      goodSpace = False
+      while not goodSpace:
+         space = room.get_random_floor_space
+
+   def get_tile_types(self):
+      #the registry of tile types this level's map is built from
+      return TILE_TYPES
+
+   def getWallColor(self):
+      return self.get_tile_types()[TILE_WALL].color
+
+   def getFloorColor(self):
+      return self.get_tile_types()[TILE_FLOOR].color
+
+   def getWallChar(self):
+      return self.get_tile_types()[TILE_WALL].char
+
+   def getFloorChar(self):
+      return self.get_tile_types()[TILE_FLOOR].char
@@ -0,0 +1,56 @@
+from defaultConstants import *
+
+
+class Camera:
+    """The part of a level shown on the map console, following the player around"""
+    def __init__(self, width, height, margin=CAMERA_MARGIN):
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.x = 0
+        self.y = 0
+
+    @property
+    def position(self):
+        return self.x, self.y
+
+    def center_on(self, x, y, map_width, map_height):
+        self.x = self._clamp(x - self.width // 2, self.width, map_width)
+        self.y = self._clamp(y - self.height // 2, self.height, map_height)
+
+    def follow(self, x, y, map_width, map_height):
+        # keep (x, y) at least margin cells inside the edges of the screen, centering on it when it
+        # isn't, so the map only scrolls now and then; returns whether the camera moved
+        old = self.position
+        if not (self._is_inside(x - self.x, self.width) and self._is_inside(y - self.y, self.height)):
+            self.center_on(x, y, map_width, map_height)
+        # the map may have changed size under a camera that didn't need to move
+        self.x = self._clamp(self.x, self.width, map_width)
+        self.y = self._clamp(self.y, self.height, map_height)
+        return self.position != old
+
+    def get_window(self, map_width, map_height):
+        # the (x1, y1, x2, y2) rectangle, end exclusive, of the map cells on screen
+        return (self.x, self.y, min(self.x + self.width, map_width), min(self.y + self.height, map_height))
+
+    def to_screen(self, x, y):
+        # the console cell map cell (x, y) is shown in, or None if it is off screen
+        x -= self.x
+        y -= self.y
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return x, y
+        return None
+
+    def to_map(self, x, y):
+        # the map cell shown in console cell (x, y), or None if (x, y) is off the console
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return x + self.x, y + self.y
+        return None
+
+    def _is_inside(self, offset, size):
+        margin = min(self.margin, (size - 1) // 2)
+        return margin <= offset < size - margin
+
+    @staticmethod
+    def _clamp(start, size, map_size):
+        return min(max(start, 0), max(map_size - size, 0))
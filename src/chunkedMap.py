@@ -0,0 +1,261 @@
+import zlib
+from collections import OrderedDict
+
+import numpy
+
+from defaultConstants import *
+from levelMap import LevelMap
+from roomPlacement import FreeSpace
+from tileTypes import TILE_TYPES
+from utilityClasses import *
+
+
+def generate_chunk(seed, cx, cy, size, doors, max_rooms=CHUNK_ROOMS, min_room_size=ROOM_MIN_SIZE,
+                   max_room_size=ROOM_MAX_SIZE):
+    """The tile type ids of chunk (cx, cy) of a chunked map, as a [y, x] array"""
+    # doors gives, for each edge, the cell where a tunnel crosses into the neighbouring chunk, or
+    # None; the neighbour's tunnel arrives at the same cell on its side, which joins the chunks up
+    chunk = LevelMap(size, size, fill_type=TILE_WALL)
+    free_space = FreeSpace(size, size)
+    stream = create_random_stream(get_level_seed(seed, 'chunk %d,%d' % (cx, cy)))
+    try:
+        centers = []
+        for r in range(max_rooms):
+            w = get_random_int(min_room_size, max_room_size, stream)
+            h = get_random_int(min_room_size, max_room_size, stream)
+            position = free_space.pick_position(w, h, lambda a, b: get_random_int(a, b, stream))
+            if position is None:
+                continue
+            x, y = position
+            room = _ChunkRoom(x, y, w, h)
+            free_space.add(room)
+            chunk.fill_rect(x, y, x + w, y + h, TILE_FLOOR)
+
+            center = (x + w // 2, y + h // 2)
+            if centers:
+                _carve_tunnel(chunk, centers[-1], center, get_random_int(0, 1, stream) == 1)
+            centers.append(center)
+
+        if not centers:
+            centers.append((size // 2, size // 2))
+            chunk.set_tile(size // 2, size // 2, TILE_FLOOR)
+
+        # run a tunnel from the first room out to each door
+        north, east, south, west = doors
+        for door in ((north, 0) if north is not None else None,
+                     (size - 1, east) if east is not None else None,
+                     (south, size - 1) if south is not None else None,
+                     (0, west) if west is not None else None):
+            if door is not None:
+                _carve_tunnel(chunk, centers[0], door, door[1] in (0, size - 1))
+    finally:
+        delete_random_stream(stream)
+
+    return chunk.tile_type
+
+
+def _carve_tunnel(chunk, start, end, horizontal_first):
+    (x1, y1), (x2, y2) = start, end
+    if horizontal_first:
+        chunk.fill_rect(min(x1, x2), y1, max(x1, x2) + 1, y1 + 1, TILE_FLOOR)
+        chunk.fill_rect(x2, min(y1, y2), x2 + 1, max(y1, y2) + 1, TILE_FLOOR)
+    else:
+        chunk.fill_rect(x1, min(y1, y2), x1 + 1, max(y1, y2) + 1, TILE_FLOOR)
+        chunk.fill_rect(min(x1, x2), y2, max(x1, x2) + 1, y2 + 1, TILE_FLOOR)
+
+
+class _ChunkRoom:
+    # just enough of a Level.Room for FreeSpace: the rectangle of its walls, as Level.Room has it
+    def __init__(self, x, y, w, h):
+        self.wall_rect = _Rect(x - 1, y - 1, x + w + 1, y + h + 1)
+
+
+class _Rect:
+    def __init__(self, x1, y1, x2, y2):
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+
+
+class ChunkedMap:
+    """The tiles of a level too big to keep in memory, in chunks generated from its seed as needed"""
+    def __init__(self, seed, width_chunks, height_chunks, chunk_size=CHUNK_SIZE, max_chunks=CHUNK_CACHE_SIZE,
+                 tile_types=TILE_TYPES):
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.width_chunks = width_chunks
+        self.height_chunks = height_chunks
+        self.width = width_chunks * chunk_size
+        self.height = height_chunks * chunk_size
+        self.tile_types = tile_types
+        self.max_chunks = max_chunks
+        # bumped whenever a tile changes, as with LevelMap
+        self.version = 0
+
+        # (cx, cy) -> [tile type ids, explored], least recently used first
+        self._chunks = OrderedDict()
+        # (cx, cy) -> compressed, bit packed explored flags of a dropped chunk
+        self._explored = {}
+        # (x, y) -> tile type set on top of what the generator makes
+        self._changes = {}
+        self._stats = {'generated': 0, 'evicted': 0}
+
+    @property
+    def stats(self):
+        stats = dict(self._stats)
+        stats['resident'] = len(self._chunks)
+        return stats
+
+    @property
+    def changes(self):
+        return self._changes
+
+    def get_chunk(self, cx, cy):
+        # the [tile type ids, explored] of a chunk, generating it if it isn't in memory
+        key = (cx, cy)
+        chunk = self._chunks.pop(key, None)
+        if chunk is None:
+            chunk = self._generate(cx, cy)
+        self._chunks[key] = chunk
+        while len(self._chunks) > self.max_chunks:
+            self._evict(*next(iter(self._chunks)))
+        return chunk
+
+    def is_resident(self, cx, cy):
+        return (cx, cy) in self._chunks
+
+    def stream_around(self, x, y, load_distance=CHUNK_LOAD_DISTANCE, keep_distance=CHUNK_KEEP_DISTANCE):
+        # generate the chunks within load_distance cells of (x, y) before they are needed, and drop
+        # the ones more than keep_distance cells away
+        size = self.chunk_size
+        for cx in range(max((x - load_distance) // size, 0),
+                        min((x + load_distance) // size, self.width_chunks - 1) + 1):
+            for cy in range(max((y - load_distance) // size, 0),
+                            min((y + load_distance) // size, self.height_chunks - 1) + 1):
+                if (cx, cy) not in self._chunks:
+                    self.get_chunk(cx, cy)
+
+        for cx, cy in list(self._chunks.keys()):
+            dx = max(cx * size - x, x - (cx + 1) * size + 1, 0)
+            dy = max(cy * size - y, y - (cy + 1) * size + 1, 0)
+            if max(dx, dy) > keep_distance:
+                self._evict(cx, cy)
+
+    def is_blocked(self, x, y):
+        return bool(self.tile_types.blocks[self.get_tile(x, y)])
+
+    def is_sight_blocked(self, x, y):
+        return bool(self.tile_types.block_sight[self.get_tile(x, y)])
+
+    def is_explored(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        size = self.chunk_size
+        return bool(self.get_chunk(x // size, y // size)[1][y % size, x % size])
+
+    def get_tile(self, x, y):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return TILE_WALL
+        size = self.chunk_size
+        return self.get_chunk(x // size, y // size)[0][y % size, x % size]
+
+    def set_tile(self, x, y, tile_type):
+        size = self.chunk_size
+        self.get_chunk(x // size, y // size)[0][y % size, x % size] = tile_type
+        self._changes[(x, y)] = tile_type
+        self.version += 1
+
+    def get_tiles(self, x1, y1, x2, y2):
+        # the tile type ids from (x1, y1) up to, but not including, (x2, y2), as a [y, x] array
+        tiles = numpy.empty((y2 - y1, x2 - x1), dtype=numpy.uint8)
+        tiles[:] = TILE_WALL
+        for window, cells, chunk in self._get_overlaps(x1, y1, x2, y2):
+            tiles[window] = chunk[0][cells]
+        return tiles
+
+    def get_explored(self, x1, y1, x2, y2):
+        explored = numpy.zeros((y2 - y1, x2 - x1), dtype=bool)
+        for window, cells, chunk in self._get_overlaps(x1, y1, x2, y2):
+            explored[window] = chunk[1][cells]
+        return explored
+
+    def mark_explored(self, x1, y1, mask):
+        # mark the cells set in mask, whose top left cell is (x1, y1), as explored
+        height, width = mask.shape
+        for window, cells, chunk in self._get_overlaps(x1, y1, x1 + width, y1 + height):
+            chunk[1][cells] |= mask[window]
+
+    def get_neighbour_mask(self, x, y):
+        # bit mask of the passable cells around (x, y), see NEIGHBOUR_BITS
+        passable = ~self.tile_types.blocks[self.get_tiles(x - 1, y - 1, x + 2, y + 2)]
+        mask = 0
+        for (dx, dy), bit in NEIGHBOUR_BITS.items():
+            if passable[1 + dy, 1 + dx]:
+                mask |= bit
+        return mask
+
+    def get_explored_chunks(self):
+        # (cx, cy) -> bit packed explored flags of every chunk with something explored in it
+        explored = dict((key, numpy.unpackbits(numpy.frombuffer(zlib.decompress(data), dtype=numpy.uint8)))
+                        for key, data in self._explored.items())
+        for key, chunk in self._chunks.items():
+            if chunk[1].any():
+                explored[key] = chunk[1].ravel()
+        return dict((key, numpy.packbits(bits).tobytes()) for key, bits in explored.items())
+
+    def load(self, explored_chunks, changes):
+        # restore what can't be generated again, as saved from get_explored_chunks and changes
+        self._chunks.clear()
+        self._explored = dict((key, zlib.compress(data)) for key, data in explored_chunks.items())
+        self._changes = dict(changes)
+        self.version += 1
+
+    def nbytes(self):
+        # memory held by the chunks in memory and what is kept of the dropped ones
+        return (sum(tiles.nbytes + explored.nbytes for tiles, explored in self._chunks.values()) +
+                sum(len(data) for data in self._explored.values()))
+
+    def _get_overlaps(self, x1, y1, x2, y2):
+        # (slices of the window, slices of the chunk, chunk) for each chunk the window overlaps
+        size = self.chunk_size
+        for cy in range(max(y1, 0) // size, (min(y2, self.height) - 1) // size + 1):
+            for cx in range(max(x1, 0) // size, (min(x2, self.width) - 1) // size + 1):
+                left, top = cx * size, cy * size
+                ax1, ay1 = max(x1, left), max(y1, top)
+                ax2, ay2 = min(x2, left + size), min(y2, top + size)
+                if ax1 >= ax2 or ay1 >= ay2:
+                    continue
+                yield ((slice(ay1 - y1, ay2 - y1), slice(ax1 - x1, ax2 - x1)),
+                       (slice(ay1 - top, ay2 - top), slice(ax1 - left, ax2 - left)),
+                       self.get_chunk(cx, cy))
+
+    def _generate(self, cx, cy):
+        size = self.chunk_size
+        doors = (self._get_door('h', cx, cy) if cy > 0 else None,
+                 self._get_door('v', cx + 1, cy) if cx < self.width_chunks - 1 else None,
+                 self._get_door('h', cx, cy + 1) if cy < self.height_chunks - 1 else None,
+                 self._get_door('v', cx, cy) if cx > 0 else None)
+        tiles = generate_chunk(self.seed, cx, cy, size, doors)
+
+        for (x, y), tile_type in self._changes.items():
+            if x // size == cx and y // size == cy:
+                tiles[y % size, x % size] = tile_type
+
+        explored = numpy.zeros((size, size), dtype=bool)
+        data = self._explored.pop((cx, cy), None)
+        if data is not None:
+            bits = numpy.unpackbits(numpy.frombuffer(zlib.decompress(data), dtype=numpy.uint8))
+            explored[:] = bits[:size * size].reshape(size, size)
+
+        self._stats['generated'] += 1
+        return [tiles, explored]
+
+    def _get_door(self, orientation, cx, cy):
+        # where the tunnel crosses the edge on the top ('h') or left ('v') of chunk (cx, cy); both
+        # chunks sharing the edge work out the same cell
+        key = '%s %d,%d' % (orientation, cx, cy)
+        return 1 + get_level_seed(self.seed, key) % (self.chunk_size - 2)
+
+    def _evict(self, cx, cy):
+        tiles, explored = self._chunks.pop((cx, cy))
+        if explored.any():
+            self._explored[(cx, cy)] = zlib.compress(numpy.packbits(explored.ravel()).tobytes())
+        self._stats['evicted'] += 1
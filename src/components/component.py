@@ -1,3 +1,13 @@
-class Component:
-   def __init__(self, owner):
-      self.owner = owner
+class Component(object):
+   def __init__(self, owner):
+      self.owner = owner
+      owner.components.append(self)
+
+      #let the owner's level index it by component type
+      if owner.level is not None:
+         owner.level.register_component(self)
+
+
+def component_types(component):
+   #the component's class and the Component classes it derives from, most derived first
+   return [cls for cls in type(component).__mro__ if issubclass(cls, Component)]
@@ -1,129 +1,196 @@
-import libtcodpy as libtcod
-
-# actual size of the window
-SCREEN_WIDTH = 100
-SCREEN_HEIGHT = 80
-# SCREEN_WIDTH = 80
-# SCREEN_HEIGHT = 50
-
-# size of the map
-MAP_WIDTH = 80
-MAP_HEIGHT = 43
-
-# sizes and coordinates relevant for the GUI
-BAR_WIDTH = 20
-PANEL_HEIGHT = 7
-PANEL_Y = SCREEN_HEIGHT - PANEL_HEIGHT
-MSG_X = BAR_WIDTH + 2
-MSG_WIDTH = SCREEN_WIDTH - BAR_WIDTH - 2
-MSG_HEIGHT = PANEL_HEIGHT - 1
-INVENTORY_WIDTH = 50
-CHARACTER_SCREEN_WIDTH = 30
-LEVEL_SCREEN_WIDTH = 40
-
-# parameters for dungeon generator
-ROOM_MAX_SIZE = 10
-ROOM_MIN_SIZE = 6
-MAX_ROOMS = 30
-MAX_ROOM_OBJECTS = 7
-
-# spell values
-HEAL_AMOUNT = 40
-LIGHTNING_DAMAGE = 40
-LIGHTNING_RANGE = 5
-CONFUSE_RANGE = 8
-CONFUSE_NUM_TURNS = 10
-FIREBALL_RADIUS = 3
-FIREBALL_DAMAGE = 25
-
-# experience and level-ups
-LEVEL_UP_BASE = 200
-LEVEL_UP_FACTOR = 150
-
-
-SEIGHT_RADIUS = 10
-
-COLOR_DARK_WALL = libtcod.dark_gray
-COLOR_LIGHT_WALL = libtcod.white
-COLOR_DARK_GROUND = libtcod.dark_gray
-COLOR_LIGHT_GROUND = libtcod.Color(0, 0, 100)
-COLOR_BACKGROUND = libtcod.black
-COLOR_EXIT = libtcod.gray
-
-ENTRANCE_CHAR = '<'
-EXIT_CHAR = '>'
-
-AVERAGE_STAT = 10
-
-SAFE_MOVE_WAIT_TIME = 50
-
-# movement constants
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
-UP_LEFT = (-1, -1)
-UP_RIGHT = (1, -1)
-DOWN_LEFT = (-1, 1)
-DOWN_RIGHT = (1, 1)
-HERE = (0, 0)
-
-SURROUNDING_OFFSETS = frozenset([UP, DOWN, LEFT, RIGHT, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT])
-############# ############# ############# #############
-# ...........# #...........# #...........# #...........#
-# ..#######..# #..#.#......# #..#######..# #......#.#..#
-# ..#@.......# #..#.#......# #.......@#..# #......#.#..#
-# ..#.#####..# #..#.#####..# #..#####.#..# #..#####.#..#
-# ..#.#......# #..#@.......# #......#.#..# #.......@#..#
-# ..#.#......# #..#######..# #......#.#..# #..#######..#
-# ...........# #...........# #...........# #...........#
-############# ############# ############# #############
-LEFT_TOP_ELBOW = frozenset([DOWN, RIGHT])
-LEFT_BOTTOM_ELBOW = frozenset([UP, RIGHT])
-RIGHT_TOP_ELBOW = frozenset([DOWN, LEFT])
-RIGHT_BOTTOM_ELBOW = frozenset([UP, LEFT])
-############# ############# ############# #############
-# ...........# #...........# #...........# #...........#
-# ..#######..# #....#.#....# #......#.#..# #..#.#......#
-# .....@.....# #....#.#....# #..#####.#..# #..#.#####..#
-# ..###.###..# #..###.###..# #.......@#..# #..#@.......#
-# ....#.#....# #.....@.....# #..#####.#..# #..#.#####..#
-# ....#.#....# #..#######..# #......#.#..# #..#.#......#
-# ...........# #...........# #...........# #...........#
-############# ############# ############# #############
-TOP_TEE = frozenset([DOWN, LEFT, RIGHT])
-BOTTOM_TEE = frozenset([UP, LEFT, RIGHT])
-LEFT_TEE = frozenset([UP, DOWN, LEFT])
-RIGHT_TEE = frozenset([UP, DOWN, RIGHT])
-############# ############# #############
-# ...........# #...........# #...........#
-# ....#.#....# #....#.#....# #...........#
-# .####.###..# #....#.#....# #..#######..#
-# .....@.....# #....#@#....# #.....@.....#
-# .####.###..# #....#.#....# #..#######..#
-# ....#.#....# #....#.#....# #...........#
-# ...........# #...........# #...........#
-############# ############# #############
-FOURWAY_INTERSECTION = frozenset([UP, DOWN, LEFT, RIGHT])
-VERTICAL_HALLWAY = frozenset([UP, DOWN])
-HORIZONTAL_HALLWAY = frozenset([LEFT, RIGHT])
-############# ############# ############# #############
-# ...........# #...........# #...........# #...........#
-# ..#######..# #...........# #..#........# #........#..#
-# .....@.....# #...........# #..#........# #........#..#
-# ...........# #...........# #..#@.......# #.......@#..#
-# ...........# #.....@.....# #..#........# #........#..#
-# ...........# #..#######..# #..#........# #........#..#
-# ...........# #...........# #...........# #...........#
-############# ############# ############# #############
-WALL_ABOVE = frozenset([DOWN, LEFT, RIGHT, DOWN_LEFT, DOWN_RIGHT])
-WALL_BELOW = frozenset([UP, LEFT, RIGHT, UP_LEFT, UP_RIGHT])
-WALL_LEFT = frozenset([UP, DOWN, RIGHT, UP_RIGHT, DOWN_RIGHT])
-WALL_RIGHT = frozenset([UP, DOWN, LEFT, UP_LEFT, DOWN_LEFT])
-
-INTERSECTIONS = frozenset([TOP_TEE, BOTTOM_TEE, LEFT_TEE, RIGHT_TEE, FOURWAY_INTERSECTION])
-HALLWAYS = frozenset([VERTICAL_HALLWAY, HORIZONTAL_HALLWAY])
-WALLS = frozenset([WALL_ABOVE, WALL_BELOW, WALL_LEFT, WALL_RIGHT])
-
-# hostility
-HOSITLE_TO_PLAYER = 1
+import libtcodpy as libtcod
+
+# actual size of the window
+SCREEN_WIDTH = 100
+SCREEN_HEIGHT = 80
+# SCREEN_WIDTH = 80
+# SCREEN_HEIGHT = 50
+
+# size of the map
+MAP_WIDTH = 80
+MAP_HEIGHT = 43
+# the map scrolls once the player comes within this many cells of the edge of the screen
+CAMERA_MARGIN = 8
+# with at least this many objects on a level, they are drawn in whole array passes instead of one
+# at a time
+OBJECT_LAYER_BULK_OBJECTS = 32
+
+# sizes and coordinates relevant for the GUI
+BAR_WIDTH = 20
+PANEL_HEIGHT = 7
+PANEL_Y = SCREEN_HEIGHT - PANEL_HEIGHT
+MSG_X = BAR_WIDTH + 2
+MSG_WIDTH = SCREEN_WIDTH - BAR_WIDTH - 2
+MSG_HEIGHT = PANEL_HEIGHT - 1
+INVENTORY_WIDTH = 50
+CHARACTER_SCREEN_WIDTH = 30
+LEVEL_SCREEN_WIDTH = 40
+
+# parameters for dungeon generator
+ROOM_MAX_SIZE = 10
+ROOM_MIN_SIZE = 6
+MAX_ROOMS = 30
+MAX_ROOM_OBJECTS = 7
+# how rooms are placed: at random positions, dropping the ones that collide with earlier rooms,
+# or only at positions that are still free, so no attempt is wasted
+ROOM_PLACEMENT_RANDOM = 0
+ROOM_PLACEMENT_FREE_SPACE = 1
+ROOM_PLACEMENT = ROOM_PLACEMENT_RANDOM
+# size in cells of the grid buckets placed rooms are indexed by
+ROOM_INDEX_BUCKET_SIZE = 16
+# every level is generated from a seed derived from the world seed and its name;
+# None picks a new world seed for each game
+WORLD_SEED = None
+# how many levels below the current one are generated ahead of time in a worker process;
+# 0 generates each level when the player first goes down to it
+PREGENERATE_LEVELS = 1
+# bytes the visited levels may take in memory before the least recently visited are compacted
+LEVEL_STORE_BUDGET = 8 * 1024 * 1024
+
+# streaming levels: station sized maps split into chunks that are generated as the player nears them
+STREAMING_LEVELS = False
+STATION_WIDTH_CHUNKS = 256
+STATION_HEIGHT_CHUNKS = 256
+# width and height of a chunk in cells, and the rooms tried in each
+CHUNK_SIZE = 64
+CHUNK_ROOMS = 12
+# most chunks kept in memory at once
+CHUNK_CACHE_SIZE = 36
+# chunks within this many cells of the player are generated ahead of time, and ones further than
+# CHUNK_KEEP_DISTANCE are dropped
+CHUNK_LOAD_DISTANCE = 48
+CHUNK_KEEP_DISTANCE = 128
+
+# spell values
+HEAL_AMOUNT = 40
+LIGHTNING_DAMAGE = 40
+LIGHTNING_RANGE = 5
+CONFUSE_RANGE = 8
+CONFUSE_NUM_TURNS = 10
+FIREBALL_RADIUS = 3
+FIREBALL_DAMAGE = 25
+
+# experience and level-ups
+LEVEL_UP_BASE = 200
+LEVEL_UP_FACTOR = 150
+
+
+SEIGHT_RADIUS = 10
+from fovConstants import *
+
+SAVE_FILE = 'savegame.dat'
+AUTOSAVE_SECONDS = 60
+# how often an idle turn-driven game checks for input while an autosave is pending
+IDLE_POLL_MILLISECONDS = 100
+
+COLOR_DARK_WALL = libtcod.dark_gray
+COLOR_LIGHT_WALL = libtcod.white
+COLOR_DARK_GROUND = libtcod.dark_gray
+COLOR_LIGHT_GROUND = libtcod.Color(0, 0, 100)
+COLOR_BACKGROUND = libtcod.black
+COLOR_EXIT = libtcod.gray
+
+# tile type ids
+TILE_WALL = 0
+TILE_FLOOR = 1
+TILE_ENTRANCE = 2
+TILE_EXIT = 3
+
+ENTRANCE_CHAR = '<'
+EXIT_CHAR = '>'
+
+AVERAGE_STAT = 10
+
+SAFE_MOVE_WAIT_TIME = 50
+
+# movement constants
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+UP_LEFT = (-1, -1)
+UP_RIGHT = (1, -1)
+DOWN_LEFT = (-1, 1)
+DOWN_RIGHT = (1, 1)
+HERE = (0, 0)
+
+SURROUNDING_OFFSETS = frozenset([UP, DOWN, LEFT, RIGHT, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT])
+############# ############# ############# #############
+# ...........# #...........# #...........# #...........#
+# ..#######..# #..#.#......# #..#######..# #......#.#..#
+# ..#@.......# #..#.#......# #.......@#..# #......#.#..#
+# ..#.#####..# #..#.#####..# #..#####.#..# #..#####.#..#
+# ..#.#......# #..#@.......# #......#.#..# #.......@#..#
+# ..#.#......# #..#######..# #......#.#..# #..#######..#
+# ...........# #...........# #...........# #...........#
+############# ############# ############# #############
+LEFT_TOP_ELBOW = frozenset([DOWN, RIGHT])
+LEFT_BOTTOM_ELBOW = frozenset([UP, RIGHT])
+RIGHT_TOP_ELBOW = frozenset([DOWN, LEFT])
+RIGHT_BOTTOM_ELBOW = frozenset([UP, LEFT])
+############# ############# ############# #############
+# ...........# #...........# #...........# #...........#
+# ..#######..# #....#.#....# #......#.#..# #..#.#......#
+# .....@.....# #....#.#....# #..#####.#..# #..#.#####..#
+# ..###.###..# #..###.###..# #.......@#..# #..#@.......#
+# ....#.#....# #.....@.....# #..#####.#..# #..#.#####..#
+# ....#.#....# #..#######..# #......#.#..# #..#.#......#
+# ...........# #...........# #...........# #...........#
+############# ############# ############# #############
+TOP_TEE = frozenset([DOWN, LEFT, RIGHT])
+BOTTOM_TEE = frozenset([UP, LEFT, RIGHT])
+LEFT_TEE = frozenset([UP, DOWN, LEFT])
+RIGHT_TEE = frozenset([UP, DOWN, RIGHT])
+############# ############# #############
+# ...........# #...........# #...........#
+# ....#.#....# #....#.#....# #...........#
+# .####.###..# #....#.#....# #..#######..#
+# .....@.....# #....#@#....# #.....@.....#
+# .####.###..# #....#.#....# #..#######..#
+# ....#.#....# #....#.#....# #...........#
+# ...........# #...........# #...........#
+############# ############# #############
+FOURWAY_INTERSECTION = frozenset([UP, DOWN, LEFT, RIGHT])
+VERTICAL_HALLWAY = frozenset([UP, DOWN])
+HORIZONTAL_HALLWAY = frozenset([LEFT, RIGHT])
+############# ############# ############# #############
+# ...........# #...........# #...........# #...........#
+# ..#######..# #...........# #..#........# #........#..#
+# .....@.....# #...........# #..#........# #........#..#
+# ...........# #...........# #..#@.......# #.......@#..#
+# ...........# #.....@.....# #..#........# #........#..#
+# ...........# #..#######..# #..#........# #........#..#
+# ...........# #...........# #...........# #...........#
+############# ############# ############# #############
+WALL_ABOVE = frozenset([DOWN, LEFT, RIGHT, DOWN_LEFT, DOWN_RIGHT])
+WALL_BELOW = frozenset([UP, LEFT, RIGHT, UP_LEFT, UP_RIGHT])
+WALL_LEFT = frozenset([UP, DOWN, RIGHT, UP_RIGHT, DOWN_RIGHT])
+WALL_RIGHT = frozenset([UP, DOWN, LEFT, UP_LEFT, DOWN_LEFT])
+
+INTERSECTIONS = frozenset([TOP_TEE, BOTTOM_TEE, LEFT_TEE, RIGHT_TEE, FOURWAY_INTERSECTION])
+HALLWAYS = frozenset([VERTICAL_HALLWAY, HORIZONTAL_HALLWAY])
+WALLS = frozenset([WALL_ABOVE, WALL_BELOW, WALL_LEFT, WALL_RIGHT])
+ELBOWS = frozenset([LEFT_TOP_ELBOW, LEFT_BOTTOM_ELBOW, RIGHT_TOP_ELBOW, RIGHT_BOTTOM_ELBOW])
+
+# neighbour masks: one bit per surrounding offset, set if that neighbour is passable
+NEIGHBOUR_OFFSETS = (UP, UP_RIGHT, RIGHT, DOWN_RIGHT, DOWN, DOWN_LEFT, LEFT, UP_LEFT)
+NEIGHBOUR_BITS = dict((offset, 1 << bit) for bit, offset in enumerate(NEIGHBOUR_OFFSETS))
+
+# the possible moves and the kind of location for each of the 256 neighbour masks
+MOVES_OPEN = 0
+MOVES_INTERSECTION = 1
+MOVES_HALLWAY = 2
+MOVES_WALL = 3
+MOVES_ELBOW = 4
+
+MOVES_BY_MASK = tuple(frozenset(offset for offset in NEIGHBOUR_OFFSETS if mask & NEIGHBOUR_BITS[offset])
+                      for mask in range(256))
+MOVES_CLASS_BY_MASK = tuple(MOVES_INTERSECTION if moves in INTERSECTIONS else
+                            MOVES_HALLWAY if moves in HALLWAYS else
+                            MOVES_WALL if moves in WALLS else
+                            MOVES_ELBOW if moves in ELBOWS else
+                            MOVES_OPEN
+                            for moves in MOVES_BY_MASK)
+
+# hostility
+HOSITLE_TO_PLAYER = 1
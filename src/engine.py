@@ -1,707 +1,1073 @@
-import math
-import textwrap
-import shelve
-
-from utilityClasses import *
-from baseClasses import *
-from defaultConstants import *
-
-
-class View:
-    FOV_ALGO = 0
-    FOV_LIGHT_WALLS = False
-    LIMIT_FPS = 60
-
-    FULLSCREEN = True
-
-    FONT = 'fonts/dejavu16x16_gs_tc.png'
-    FONT_WIDTH = 16
-    FONT_HEIGHT = 16
-
-    SCREEN_OFFSET = 1
-
-    def __init__(self):
-        screen_width_px, screen_height_px = libtcod.sys_get_current_resolution()
-
-        libtcod.console_set_custom_font(self.FONT, libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
-        # font_size_width, font_size_height = libtcod.sys_get_char_size()
-
-        self.screen_width = (screen_width_px / self.FONT_WIDTH) - self.SCREEN_OFFSET - 1
-        self.screen_height = (screen_height_px / self.FONT_HEIGHT) - self.SCREEN_OFFSET
-
-        libtcod.console_init_root(self.screen_width + self.SCREEN_OFFSET, self.screen_height + self.SCREEN_OFFSET,
-                                  'Dunhold Station',
-                                  self.FULLSCREEN)
-
-        libtcod.sys_set_fps(self.LIMIT_FPS)
-
-        # self.debug_print_centering_marks(step=2,
-        #                                  min_x=self.SCREEN_OFFSET, min_y=self.SCREEN_OFFSET,
-        #                                  max_x=self.screen_width, max_y=self.screen_height)
-
-        self._con = libtcod.console_new(MAP_WIDTH, MAP_HEIGHT)
-        self._bottomPanel = libtcod.console_new(self.screen_width, PANEL_HEIGHT)
-
-        self._fovLightWalls = self.FOV_LIGHT_WALLS
-        self._fovAlgorithm = self.FOV_ALGO
-
-        libtcod.console_clear(self._con)  # unexplored areas start black (which is the default background color)
-
-        self.msgX = MSG_X
-
-        self._fov_map = None
-
-    @property
-    def fov_map(self):
-        return self._fov_map
-
-    @fov_map.setter
-    def fov_map(self, value):
-        self._fov_map = value
-
-    @property
-    def screen_width(self):
-        return self._screen_width
-
-    @screen_width.setter
-    def screen_width(self, width):
-        self._screen_width = width
-
-    @property
-    def screen_height(self):
-        return self._screen_height
-
-    @screen_height.setter
-    def screen_height(self, height):
-        self._screen_height = height
-
-    @staticmethod
-    def debug_print_centering_marks(console=0, mark='*', step=1, min_x=0, min_y=0, max_x=0, max_y=0):
-        for x in range(0, max_x, step):
-
-            libtcod.console_print(console,
-                                  min_x + x, min_y + x,
-                                  mark)
-            libtcod.console_print(console,
-                                  max_x - x, min_y + x,
-                                  mark)
-
-            libtcod.console_print(console,
-                                  max_x - x, max_y - x,
-                                  mark)
-            libtcod.console_print(console,
-                                  min_x + x, max_y - x,
-                                  mark)
-
-        libtcod.console_flush()
-
-    def main_menu(self):
-        main_menu_width = SCREEN_WIDTH
-        main_menu_height = self.screen_height
-
-        mm_center_x = main_menu_width / 2
-        mm_center_y = main_menu_height / 2
-
-        main_menu_x = (self.screen_width / 2) - mm_center_x
-        main_menu_y = (self.screen_height / 2) - mm_center_y
-
-        background_img = libtcod.image_load('spacestation3.png')
-        bg_img_size = libtcod.image_get_size(background_img)
-
-        bg_img_width = bg_img_size[0] / self.FONT_WIDTH
-        bg_img_height = bg_img_size[1] / self.FONT_HEIGHT
-
-        bg_image_center_x = bg_img_width / 2
-        bg_image_center_y = bg_img_height / 2
-
-        bg_image_x = bg_image_center_x
-        bg_image_y = bg_image_center_y
-
-        main_menu = libtcod.console_new(main_menu_width, main_menu_height)
-
-        while not is_window_closed():
-            # show the background image, at twice the regular console resolution
-            libtcod.image_blit_2x(background_img, main_menu, bg_image_x, bg_image_y)
-
-            # show the game's title, and some credits!
-            libtcod.console_set_default_foreground(main_menu, libtcod.light_yellow)
-
-            libtcod.console_print_ex(main_menu,
-                                     mm_center_x, mm_center_y - 8,
-                                     libtcod.BKGND_NONE, libtcod.CENTER, 'DUNHOLD STATION')
-
-            libtcod.console_print_ex(main_menu,
-                                     mm_center_x, mm_center_y + 10,
-                                     libtcod.BKGND_NONE, libtcod.CENTER, 'By Andrew Wheeler')
-
-            # self.debug_print_centering_marks(main_menu,
-            #                                  step=1,
-            #                                  min_x=0, min_y=0,
-            #                                  max_x=main_menu_width, max_y=main_menu_height)
-
-            libtcod.console_blit(main_menu,
-                                 0, 0,
-                                 0, 0,
-                                 0,
-                                 main_menu_x, main_menu_y,
-                                 1.0, 1.0)
-
-            # show options and wait for the player's choice
-            options = [('n', 'Play a new game'), ('c', 'Continue last game'), ('q', 'Quit')]
-            selection = self.menu('', options, 24)
-            if selection == 'n' or selection == 'c' or selection == 'q':
-                libtcod.console_clear(0)
-                return selection
-
-    def menu(self, header, options, width):
-        """display a menu.
-           @param header: string to display as the menu header
-           @param options: list of menu options to display containing the index and option pairs as tuples
-           @param width: integer width of the menu"""
-
-        if len(options) > 26:
-            raise ValueError('Cannot have a menu with more than 26 options.')
-
-        indexes = []
-
-        # calculate total height for the header (after auto-wrap) and one line per option
-        header_height = libtcod.console_get_height_rect(self._con, 0, 0, width, self.screen_height, header)
-        if header == '':
-            header_height = 0
-        height = len(options) + header_height
-
-        # create an off-screen console that represents the menu's window
-        window = libtcod.console_new(width, height)
-
-        # print the header, with auto-wrap
-        libtcod.console_set_default_foreground(window, libtcod.white)
-        libtcod.console_print_rect_ex(window,
-                                      0, 0,
-                                      width, height,
-                                      libtcod.BKGND_NONE, libtcod.LEFT,
-                                      header)
-
-        # print all the options
-        y = header_height
-        for index, option in options:
-            indexes.append(index)
-            text = '(' + index + ') ' + option
-            libtcod.console_print_ex(window, 0, y, libtcod.BKGND_NONE, libtcod.LEFT, text)
-            y += 1
-
-        # blit the contents of "window" to the root console
-        x = (self.screen_width / 2) - (width / 2)
-        y = (self.screen_height / 2) - (height / 2)
-        libtcod.console_blit(window,
-                             0, 0,
-                             0, 0,
-                             0,
-                             x, y,
-                             1.0, 0.7)
-
-        # present the root console to the player and wait for a key-press
-        libtcod.console_flush()
-        key = libtcod.console_wait_for_keypress(True)
-
-        if key.vk == libtcod.KEY_ENTER and key.lalt:  # (special case) Alt+Enter: toggle fullscreen
-            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen)
-
-        # convert the ASCII code to an index; if it corresponds to an option, return it
-        index = chr(key.c)
-        if index in indexes:
-            return index
-        return None
-
-    def msgbox(self, text, width=50):
-        self.menu(text, [], width)  # use menu() as a sort of "message box"
-
-    def render_all(self, current_level, player, mouse):
-        objects = current_level.objects
-        level_map = current_level.map
-        # draw all objects in the list, except the player. we want it to
-        # always appear over all other objects! so it's drawn later.
-        for obj in objects:
-            self.draw_object(obj, self._fov_map, level_map)
-
-        self.draw_object(player, self._fov_map, level_map)
-
-        # blit the contents of "con" to the root console
-        libtcod.console_blit(self._con,
-                             0, 0,
-                             MAP_WIDTH, MAP_HEIGHT,
-                             0,
-                             10, 10,
-                             0.5)
-
-        # prepare to render the GUI panel
-        libtcod.console_set_default_background(self._bottomPanel, libtcod.black)
-        libtcod.console_clear(self._bottomPanel)
-        '''
-        # print the game messages, one line at a time
-        y = 1
-        for (line, color) in game_msgs:
-           libtcod.console_set_default_foreground(self._bottomPanel, color)
-           libtcod.console_print_ex(self._bottomPanel, self.msgX, y, libtcod.BKGND_NONE, libtcod.LEFT,line)
-           y += 1
-        '''
-        # show the player's stats
-        self.render_bar(self._bottomPanel, 1, 1, BAR_WIDTH, 'HP', player.combatComponent.hp,
-                        player.combatComponent.max_hp,
-                        libtcod.light_red, libtcod.darker_red)
-        libtcod.console_print_ex(self._bottomPanel, 1, 3, libtcod.BKGND_NONE, libtcod.LEFT, str(current_level.name))
-        '''
-        # display names of objects under the mouse
-        libtcod.console_set_default_foreground(self._bottomPanel, libtcod.light_gray)
-        libtcod.console_print_ex(self._bottomPanel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT, get_names_under_mouse(objects, self._fov_map, mouse))
-        '''
-        # blit the contents of "bottomPanel" to the root console
-        libtcod.console_blit(self._bottomPanel, 0, 0, SCREEN_WIDTH, PANEL_HEIGHT, 0, 0, PANEL_Y)
-
-        libtcod.console_flush()
-
-    @staticmethod
-    def render_bar(panel, x, y, total_width, name, value, maximum, bar_color, back_color):
-        # render a bar (HP, experience, etc). first calculate the width of the bar
-        bar_width = int(float(value) / maximum * total_width)
-
-        # render the background first
-        libtcod.console_set_default_background(panel, back_color)
-        libtcod.console_rect(panel, x, y, total_width, 1, False, libtcod.BKGND_SCREEN)
-
-        # now render the bar on top
-        libtcod.console_set_default_background(panel, bar_color)
-        if bar_width > 0:
-            libtcod.console_rect(panel, x, y, bar_width, 1, False, libtcod.BKGND_SCREEN)
-
-        # finally, some centered text with the values
-        libtcod.console_set_default_foreground(panel, libtcod.white)
-        libtcod.console_print_ex(panel, x + total_width / 2, y, libtcod.BKGND_NONE, libtcod.CENTER,
-                                 name + ': ' + str(value) + '/' + str(maximum))
-
-    def fov_redraw(self, fov_map, map_height, map_width, level_map):
-        # go through all tiles, and set their background color according to the FOV
-        for y in range(map_height):
-            for x in range(map_width):
-                visible = libtcod.map_is_in_fov(fov_map, x, y)
-                if not visible:
-                    # if it's not visible right now, the player can only see it if it's explored
-                    if level_map[x][y].explored:
-                        libtcod.console_set_char_background(self._con, x, y, level_map[x][y].dark_color,
-                                                            libtcod.BKGND_SET)
-                else:
-                    # it's visible
-                    libtcod.console_set_char_background(self._con, x, y, level_map[x][y].tile_color, libtcod.BKGND_SET)
-                    # since it's visible, explore it
-                    level_map[x][y].explored = True
-
-    def draw_object(self, obj, fov_map, level_map):
-        # only show if it's visible to the player; or it's set to "always visible" and on an explored tile
-
-        # fov = libtcod.map_is_in_fov(fov_map, obj.x, obj.y)
-        # always_visible = obj.always_visible
-        # explored = level_map[obj.x][obj.y].explored
-
-        if (libtcod.map_is_in_fov(fov_map, obj.x, obj.y) or
-                (obj.always_visible and level_map[obj.x][obj.y].explored)):
-            # set the color and then draw the character that represents this object at its position
-            libtcod.console_set_default_foreground(self._con, obj.color)
-            libtcod.console_put_char(self._con, obj.x, obj.y, obj.char, libtcod.BKGND_NONE)
-
-    def clear_object(self, obj):
-        # erase the character that represents this object
-        libtcod.console_put_char(self._con, obj.x, obj.y, ' ', libtcod.BKGND_NONE)
-
-    @staticmethod
-    def get_names_under_mouse(objects, fov_map, mouse):
-        # return a string with the names of all objects under the mouse
-
-        (x, y) = (mouse.cx, mouse.cy)
-
-        # create a list with the names of all objects at the mouse's coordinates and in FOV
-        names = [obj.name for obj in objects
-                 if obj.x == x and obj.y == y and libtcod.map_is_in_fov(fov_map, obj.x, obj.y)]
-
-        names = ', '.join(names)  # join the names, separated by commas
-        return names.capitalize()
-
-
-class Controller:
-    def __init__(self):
-        self.initialize_game()
-
-    def initialize_game(self):
-        self._game_state = {'initialize': True, 'playing': False}
-
-        self._view = View()
-        self._model = Model()
-
-        self._fov_recompute = True
-
-        self.display_main_menu()
-
-    def display_main_menu(self):
-        menu_selection = self._view.main_menu()
-        print " Menu Selection: " + str(menu_selection)
-        if menu_selection is 'n':
-            self.new_game()
-
-        elif menu_selection is 'c':
-            # load game
-            try:
-                pass
-            except:
-                self._view.msgbox('\n No saved game to load.\n', 24)
-
-        elif menu_selection is 'q':
-            # quit
-            self.quit()
-
-    def new_game(self):
-        self._model.create_world()
-        # self._master_object_list = self.generate_object_list()
-        self._game_state['initialize'] = False
-        self._game_state['playing'] = True
-        self.play_game()
-
-    @staticmethod
-    def quit():
-        raise QuitException
-
-    def play_game(self):
-        # print " I'm alive!\n"
-
-        # main game loop
-        player_action = None
-        initialize_safe_move = False
-        # safe_move = False
-
-        mouse = libtcod.Mouse()
-        key = libtcod.Key()
-
-        # main loop
-        while not libtcod.console_is_window_closed():
-            libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
-
-            # render the screen
-            current_level = self._model.current_level
-            player = self._model.player
-
-            if player.mobComponent.fov_recompute:
-                player.mobComponent.recompute_fov(current_level.mapHeight, current_level.mapWidth)
-                self._view.fov_redraw(player.mobComponent.fov_map, current_level.mapHeight, current_level.mapWidth,
-                                      current_level.map)
-
-            current_level = self._model.current_level
-            self._view.render_all(current_level, player, mouse)
-
-            # level up if needed
-            # check_level_up()
-
-            # erase all objects at their old locations, before they move
-            for obj in current_level.objects:
-                if not hasattr(obj, 'is_terrain'):
-                    self._view.clear_object(obj)
-            self._view.clear_object(player)
-
-            # handle keys and exit game if needed
-            if initialize_safe_move:
-                direction = self.get_movement_keys(key)
-                if direction is not False:
-                    dx, dy = direction
-                    player.mobComponent.safe_move_dx = dx
-                    player.mobComponent.safe_move_dy = dy
-                    player_action = self._model.move_or_attack(player, dx, dy)
-                    if not self._model.is_hostile_mob_in_fov(player):
-                        player.mobComponent.possible_moves = self._model.get_possible_moves(player)
-                        player.mobComponent.safe_move = True
-                    initialize_safe_move = False
-            elif player.mobComponent.safe_move == True:
-                player_action = self.safe_move(player)
-            else:
-                player_action = self.handle_keypress(key)
-                if player_action == 'safe_move':
-                    initialize_safe_move = True
-                if player_action == 'exit':
-                    self.save_game()
-                    break
-
-            if player_action == 'didnt-take-turn' or player_action == 'blocked' or player_action == 'cancel-safe-move':
-                player.mobComponent.safe_move = False
-            '''
-            #let monsters take their turn
-            if game_state == 'playing' and player_action != 'didnt-take-turn':
-               for object in objects:
-                  if object.ai:
-                     object.ai.take_turn()
-            '''
-
-    def handle_keypress(self, key):
-
-        if key.vk == libtcod.KEY_ENTER and key.lalt:
-            # Alt+Enter: toggle fullscreen
-            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())
-
-        elif key.vk == libtcod.KEY_ESCAPE:
-            # self._game_state['playing']
-            self.quit()  # exit game
-
-        player = self._model.player
-
-        if self._game_state['playing']:
-            direction = self.get_movement_keys(key)
-            if direction is not False:
-                dx, dy = direction
-                return self._model.move_or_attack(player, dx, dy)
-            else:
-                # test for other keys
-                key_char = chr(key.c)
-
-                if key_char == 'w':
-                    return 'safe_move'
-                '''
-                if key_char == 'g':
-                   #pick up an item
-                   for object in objects:  #look for an item in the player's tile
-                      if object.x == player.x and object.y == player.y and object.item:
-                         object.item.pick_up()
-                         break
-
-                if key_char == 'i':
-                   #show the inventory; if an item is selected, use it
-                   selected_item = inventory_menu('Press the key next to an item to use it, or any other to cancel.\n')
-                   if selected_item is not None:
-                      selected_item.use()
-
-                if key_char == 'd':
-                   #show the inventory; if an item is selected, drop it
-                   selected_item = inventory_menu('Press the key next to an item to drop it, or any other to cancel.\n')
-                   if selected_item is not None:
-                      selected_item.drop()
-
-                if key_char == 'c':
-                   #show character information
-                   level_up_xp = LEVEL_UP_BASE + player.level * LEVEL_UP_FACTOR
-                   msgbox('Character Information\n\nLevel: ' + str(player.level) + '\nExperience: ' + str(player.fighter.xp) +
-                         '\nExperience to level up: ' + str(level_up_xp) + '\n\nMaximum HP: ' + str(player.fighter.max_hp) +
-                         '\nAttack: ' + str(player.fighter.power) + '\nDefense: ' + str(player.fighter.defense), CHARACTER_SCREEN_WIDTH)
-
-                if key_char == '<':
-                   #go down stairs, if the player is on them
-                   if stairs.x == player.x and stairs.y == player.y:
-                      next_level()
-                '''
-                return 'didnt-take-turn'
-
-    @staticmethod
-    def get_movement_keys(key):
-
-        # movement keys
-        if key.vk == libtcod.KEY_UP or key.vk == libtcod.KEY_KP8:
-            return UP
-        elif key.vk == libtcod.KEY_DOWN or key.vk == libtcod.KEY_KP2:
-            return DOWN
-        elif key.vk == libtcod.KEY_LEFT or key.vk == libtcod.KEY_KP4:
-            return LEFT
-        elif key.vk == libtcod.KEY_RIGHT or key.vk == libtcod.KEY_KP6:
-            return RIGHT
-        elif key.vk == libtcod.KEY_HOME or key.vk == libtcod.KEY_KP7:
-            return UP_LEFT
-        elif key.vk == libtcod.KEY_PAGEUP or key.vk == libtcod.KEY_KP9:
-            return UP_RIGHT
-        elif key.vk == libtcod.KEY_END or key.vk == libtcod.KEY_KP1:
-            return DOWN_LEFT
-        elif key.vk == libtcod.KEY_PAGEDOWN or key.vk == libtcod.KEY_KP3:
-            return DOWN_RIGHT
-        elif key.vk == libtcod.KEY_KP5 or key.c == '.':
-            return HERE
-        else:
-            return False
-
-    def safe_move(self, mob):
-        # if the path is blocked or hostile mobs are visible:
-        # make a normal move in the direction of travel
-
-        # otherwise:
-        # determine how many possible moves the mob has
-
-        # if the direction of travel is clear, and no hostile mobs are visible,
-        # and the number of possible moves remains the same:
-        # move in the direction of travel
-
-        dx = mob.mobComponent.safe_move_dx
-        dy = mob.mobComponent.safe_move_dy
-
-        x = mob.x + dx
-        y = mob.y + dy
-
-        if self._model.is_blocked(x, y):
-            return 'didnt-take-turn'
-
-        if self._model.is_hostile_mob_in_fov(mob):
-            return 'didnt-take-turn'
-
-        if self._model.is_item_at_location(x, y):
-            self._model.move_or_attack(mob, dx, dy)
-            return 'cancel-safe-move'
-
-        possible_moves = self._model.get_possible_moves(mob)
-        if possible_moves in INTERSECTIONS:
-            return 'cancel-safe-move'
-        player_action = self._model.move_or_attack(mob, dx, dy)
-        new_moves = self._model.get_possible_moves(mob)
-        elbow_moves = self._model.is_elbow(mob)
-        if elbow_moves is not False:
-            assert (len(elbow_moves) == 2), ""
-            back_dx = dx * -1
-            back_dy = dy * -1
-            move1, move2 = elbow_moves
-            x1, y1 = move1
-            x2, y2 = move2
-            if x1 == back_dx and y1 == back_dy:
-                mob.mobComponent.safe_move_dx = x2
-                mob.mobComponent.safe_move_dy = y2
-            elif x2 == back_dx and y2 == back_dy:
-                mob.mobComponent.safe_move_dx = x1
-                mob.mobComponent.safe_move_dy = y1
-            mob.mobComponent.possible_moves = new_moves
-            return ''
-        if possible_moves != mob.mobComponent.possible_moves:
-            if new_moves in HALLWAYS or new_moves in WALLS:
-                mob.mobComponent.possible_moves = new_moves
-            else:
-                return 'cancel-safe-move'
-
-        return player_action
-
-    def save_game(self):
-        pass
-
-
-class Model:
-    def __init__(self):
-        self.initialize()
-
-    def initialize(self):
-        self._levels = []
-
-    @property
-    def current_level(self):
-        return self._currentLevel
-
-    @property
-    def player(self):
-        return self._player
-
-    @player.setter
-    def player(self, value):
-        self._player = value
-
-    def create_world(self):
-        level_name = len(self._levels) + 1
-
-        new_level = self.make_new_level(level_name)
-        self._levels.append(new_level)
-        self._currentLevel = new_level
-
-        self._player = GameObject(new_level.levelEntrance.x, new_level.levelEntrance.y, '@', 'player', libtcod.yellow,
-                                  blocks=True)
-        self._player.playerComponent = PlayerComponent(self._player, 100, 0, 2, 0, death_function=None)
-
-        # <PLACEHOLDER>
-        self._player.seightRadius = SEIGHT_RADIUS
-        # </PLACEHOLDER>
-
-        self._player.mobComponent.initialize_fov(new_level.mapHeight, new_level.mapWidth, new_level.map)
-
-    @staticmethod
-    def make_new_level(name):
-        new_level = Level(name)
-        new_level.make_map()
-        return new_level
-
-    def initialize_fov(self):
-
-        # create the FOV map, according to the generated map
-        map_height = self._currentLevel.mapHeight
-        map_width = self._currentLevel.mapWidth
-        fov_map = libtcod.map_new(map_width, map_height)
-        level_map = self._currentLevel.map
-        for y in range(map_height):
-            for x in range(map_width):
-                libtcod.map_set_properties(fov_map, x, y, not level_map[x][y].block_sight, not level_map[x][y].blocks)
-
-        return fov_map
-
-    def move_or_attack(self, mob, dx, dy):
-        objects = self.current_level.objects
-
-        # the coordinates the mob is moving to/attacking
-        x = mob.x + dx
-        y = mob.y + dy
-
-        # try to find an attackable object there
-        target = None
-        for obj in objects:
-            if obj.x == x and obj.y == y:
-                if hasattr(obj, 'combatComponent'):
-                    target = obj
-                    break
-
-        # attack if target found, move otherwise
-        if target is not None:
-            mob.combatComponent.attack(target)
-        else:
-            if self.is_blocked(x, y):
-                return 'blocked'
-            mob.mobilityComponent.move(dx, dy)
-            if dx != 0 or dy != 0:
-                mob.mobComponent.fov_recompute = True
-
-    def is_blocked(self, x, y):
-        return self.current_level.is_blocked(x, y)
-
-    def is_item_at_location(self, x, y):
-        return False
-
-    def is_hostile_mob_in_fov(self, mob):
-        for obj in self._currentLevel.objects:
-            if hasattr(obj, "mobComponent"):
-                if mob.is_hostile(obj):
-                    return True
-        return False
-
-    def get_num_possible_moves(self, mob):
-        return len(self.get_possible_moves(mob))
-
-    def get_possible_moves(self, mob):
-        moves = []
-        for offset in SURROUNDING_OFFSETS:
-            dx, dy = offset
-            x = mob.x + dx
-            y = mob.y + dy
-            if not self.is_blocked(x, y):
-                moves.append((dx, dy))
-        return set(moves)
-
-    def is_elbow(self, mob):
-        # determine if location is part of an elbow turn
-        ############# ############# ############# #############
-        # ...........# #...........# #...........# #...........#
-        # ..#######..# #..#.#......# #..#######..# #......#.#..#
-        # ..#@.......# #..#.#......# #.......@#..# #......#.#..#
-        # ..#.#####..# #..#.#####..# #..#####.#..# #..#####.#..#
-        # ..#.#......# #..#@.......# #......#.#..# #.......@#..#
-        # ..#.#......# #..#######..# #......#.#..# #..#######..#
-        # ...........# #...........# #...........# #...........#
-        ############# ############# ############# #############
-
-        possible_moves = self.get_possible_moves(mob)
-        if possible_moves == LEFT_TOP_ELBOW:
-            return LEFT_TOP_ELBOW
-        if possible_moves == LEFT_BOTTOM_ELBOW:
-            return LEFT_BOTTOM_ELBOW
-        if possible_moves == RIGHT_TOP_ELBOW:
-            return RIGHT_TOP_ELBOW
-        if possible_moves == RIGHT_BOTTOM_ELBOW:
-            return RIGHT_BOTTOM_ELBOW
-        return False
+import math
+import os
+import random
+import textwrap
+import shelve
+import time
+
+import numpy
+
+from utilityClasses import *
+from baseClasses import *
+from defaultConstants import *
+from saveGame import SaveGameError, BackgroundSaver, save_model, load_model, restore_level
+from levelGenerator import LevelPregenerator
+from levelStore import LevelStore
+from streamingLevel import StreamingLevel
+from camera import Camera
+from objectLayer import ObjectLayer
+
+
+class View:
+    FOV_ALGO = 0
+    FOV_BACKEND = FOV_BACKEND_LIBTCOD
+    FOV_LIGHT_WALLS = False
+    LIMIT_FPS = 60
+
+    SHOW_REDRAW_STATS = False
+    # draw the map layer into an array backed console buffer and push it in a few bulk fills,
+    # instead of a libtcod call per changed cell and object. Off by default: pushing the whole
+    # buffer costs more than the few cells a step repaints, and only evens out on full redraws
+    MAP_CONSOLE_BUFFER = False
+
+    FULLSCREEN = True
+
+    FONT = 'fonts/dejavu16x16_gs_tc.png'
+    FONT_WIDTH = 16
+    FONT_HEIGHT = 16
+
+    SCREEN_OFFSET = 1
+
+    def __init__(self):
+        screen_width_px, screen_height_px = libtcod.sys_get_current_resolution()
+
+        libtcod.console_set_custom_font(self.FONT, libtcod.FONT_TYPE_GREYSCALE | libtcod.FONT_LAYOUT_TCOD)
+        # font_size_width, font_size_height = libtcod.sys_get_char_size()
+
+        self.screen_width = (screen_width_px / self.FONT_WIDTH) - self.SCREEN_OFFSET - 1
+        self.screen_height = (screen_height_px / self.FONT_HEIGHT) - self.SCREEN_OFFSET
+
+        libtcod.console_init_root(self.screen_width + self.SCREEN_OFFSET, self.screen_height + self.SCREEN_OFFSET,
+                                  'Dunhold Station',
+                                  self.FULLSCREEN)
+
+        libtcod.sys_set_fps(self.LIMIT_FPS)
+
+        # self.debug_print_centering_marks(step=2,
+        #                                  min_x=self.SCREEN_OFFSET, min_y=self.SCREEN_OFFSET,
+        #                                  max_x=self.screen_width, max_y=self.screen_height)
+
+        # the map fills the screen down to the bottom panel, whatever the size of the level
+        self._panelY = self.screen_height + self.SCREEN_OFFSET - PANEL_HEIGHT
+        self._camera = Camera(self.screen_width, self._panelY - self.SCREEN_OFFSET)
+
+        self._con = libtcod.console_new(self._camera.width, self._camera.height)
+        self._mapBuffer = self.create_map_buffer()
+        self._objectLayer = self.create_object_layer()
+        self._bottomPanel = libtcod.console_new(self.screen_width, PANEL_HEIGHT)
+
+        self._fovLightWalls = self.FOV_LIGHT_WALLS
+        self._fovAlgorithm = self.FOV_ALGO
+        self._fovBackend = self.FOV_BACKEND
+
+        libtcod.console_clear(self._con)  # unexplored areas start black (which is the default background color)
+
+        self.msgX = MSG_X
+
+        self._visible = None
+
+        self.reset_fov_redraw()
+
+    @property
+    def fov_algorithm(self):
+        return self._fovAlgorithm
+
+    @property
+    def fov_backend(self):
+        return self._fovBackend
+
+    @property
+    def visible(self):
+        # the [y, x] mask of cells in the player's FOV, as of the last fov_redraw
+        return self._visible
+
+    @property
+    def camera(self):
+        return self._camera
+
+    @property
+    def cells_repainted(self):
+        # number of map cells whose background was repainted by the last fov_redraw
+        return self._cellsRepainted
+
+    @property
+    def screen_width(self):
+        return self._screen_width
+
+    @screen_width.setter
+    def screen_width(self, width):
+        self._screen_width = width
+
+    @property
+    def screen_height(self):
+        return self._screen_height
+
+    @screen_height.setter
+    def screen_height(self, height):
+        self._screen_height = height
+
+    @staticmethod
+    def debug_print_centering_marks(console=0, mark='*', step=1, min_x=0, min_y=0, max_x=0, max_y=0):
+        for x in range(0, max_x, step):
+
+            libtcod.console_print(console,
+                                  min_x + x, min_y + x,
+                                  mark)
+            libtcod.console_print(console,
+                                  max_x - x, min_y + x,
+                                  mark)
+
+            libtcod.console_print(console,
+                                  max_x - x, max_y - x,
+                                  mark)
+            libtcod.console_print(console,
+                                  min_x + x, max_y - x,
+                                  mark)
+
+        libtcod.console_flush()
+
+    def main_menu(self):
+        main_menu_width = SCREEN_WIDTH
+        main_menu_height = self.screen_height
+
+        mm_center_x = main_menu_width / 2
+        mm_center_y = main_menu_height / 2
+
+        main_menu_x = (self.screen_width / 2) - mm_center_x
+        main_menu_y = (self.screen_height / 2) - mm_center_y
+
+        background_img = libtcod.image_load('spacestation3.png')
+        bg_img_size = libtcod.image_get_size(background_img)
+
+        bg_img_width = bg_img_size[0] / self.FONT_WIDTH
+        bg_img_height = bg_img_size[1] / self.FONT_HEIGHT
+
+        bg_image_center_x = bg_img_width / 2
+        bg_image_center_y = bg_img_height / 2
+
+        bg_image_x = bg_image_center_x
+        bg_image_y = bg_image_center_y
+
+        main_menu = libtcod.console_new(main_menu_width, main_menu_height)
+
+        while not is_window_closed():
+            # show the background image, at twice the regular console resolution
+            libtcod.image_blit_2x(background_img, main_menu, bg_image_x, bg_image_y)
+
+            # show the game's title, and some credits!
+            libtcod.console_set_default_foreground(main_menu, libtcod.light_yellow)
+
+            libtcod.console_print_ex(main_menu,
+                                     mm_center_x, mm_center_y - 8,
+                                     libtcod.BKGND_NONE, libtcod.CENTER, 'DUNHOLD STATION')
+
+            libtcod.console_print_ex(main_menu,
+                                     mm_center_x, mm_center_y + 10,
+                                     libtcod.BKGND_NONE, libtcod.CENTER, 'By Andrew Wheeler')
+
+            # self.debug_print_centering_marks(main_menu,
+            #                                  step=1,
+            #                                  min_x=0, min_y=0,
+            #                                  max_x=main_menu_width, max_y=main_menu_height)
+
+            libtcod.console_blit(main_menu,
+                                 0, 0,
+                                 0, 0,
+                                 0,
+                                 main_menu_x, main_menu_y,
+                                 1.0, 1.0)
+
+            # show options and wait for the player's choice
+            options = [('n', 'Play a new game'), ('c', 'Continue last game'), ('q', 'Quit')]
+            selection = self.menu('', options, 24)
+            if selection == 'n' or selection == 'c' or selection == 'q':
+                libtcod.console_clear(0)
+                return selection
+
+    def menu(self, header, options, width):
+        """display a menu.
+           @param header: string to display as the menu header
+           @param options: list of menu options to display containing the index and option pairs as tuples
+           @param width: integer width of the menu"""
+
+        if len(options) > 26:
+            raise ValueError('Cannot have a menu with more than 26 options.')
+
+        indexes = []
+
+        # calculate total height for the header (after auto-wrap) and one line per option
+        header_height = libtcod.console_get_height_rect(self._con, 0, 0, width, self.screen_height, header)
+        if header == '':
+            header_height = 0
+        height = len(options) + header_height
+
+        # create an off-screen console that represents the menu's window
+        window = libtcod.console_new(width, height)
+
+        # print the header, with auto-wrap
+        libtcod.console_set_default_foreground(window, libtcod.white)
+        libtcod.console_print_rect_ex(window,
+                                      0, 0,
+                                      width, height,
+                                      libtcod.BKGND_NONE, libtcod.LEFT,
+                                      header)
+
+        # print all the options
+        y = header_height
+        for index, option in options:
+            indexes.append(index)
+            text = '(' + index + ') ' + option
+            libtcod.console_print_ex(window, 0, y, libtcod.BKGND_NONE, libtcod.LEFT, text)
+            y += 1
+
+        # blit the contents of "window" to the root console
+        x = (self.screen_width / 2) - (width / 2)
+        y = (self.screen_height / 2) - (height / 2)
+        libtcod.console_blit(window,
+                             0, 0,
+                             0, 0,
+                             0,
+                             x, y,
+                             1.0, 0.7)
+
+        # present the root console to the player and wait for a key-press
+        libtcod.console_flush()
+        key = libtcod.console_wait_for_keypress(True)
+
+        if key.vk == libtcod.KEY_ENTER and key.lalt:  # (special case) Alt+Enter: toggle fullscreen
+            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen)
+
+        # convert the ASCII code to an index; if it corresponds to an option, return it
+        index = chr(key.c)
+        if index in indexes:
+            return index
+        return None
+
+    def msgbox(self, text, width=50):
+        self.menu(text, [], width)  # use menu() as a sort of "message box"
+
+    def create_map_buffer(self):
+        if not self.MAP_CONSOLE_BUFFER:
+            return None
+        return libtcod.ArrayConsoleBuffer(self._camera.width, self._camera.height, *COLOR_BACKGROUND)
+
+    def create_object_layer(self):
+        # with a map buffer, the objects are drawn straight into its characters and foreground
+        if self._mapBuffer is not None:
+            return ObjectLayer(self._camera.width, self._camera.height, self._mapBuffer.char, self._mapBuffer.fore)
+        return ObjectLayer(self._camera.width, self._camera.height)
+
+    def render_all(self, current_level, player, mouse):
+        self.render_map(current_level, player)
+
+        # blit the contents of "con" to the root console
+        libtcod.console_blit(self._con,
+                             0, 0,
+                             self._camera.width, self._camera.height,
+                             0,
+                             self.SCREEN_OFFSET, self.SCREEN_OFFSET,
+                             0.5)
+
+        # prepare to render the GUI panel
+        libtcod.console_set_default_background(self._bottomPanel, libtcod.black)
+        libtcod.console_clear(self._bottomPanel)
+        '''
+        # print the game messages, one line at a time
+        y = 1
+        for (line, color) in game_msgs:
+           libtcod.console_set_default_foreground(self._bottomPanel, color)
+           libtcod.console_print_ex(self._bottomPanel, self.msgX, y, libtcod.BKGND_NONE, libtcod.LEFT,line)
+           y += 1
+        '''
+        # show the player's stats
+        self.render_bar(self._bottomPanel, 1, 1, BAR_WIDTH, 'HP', player.combatComponent.hp,
+                        player.combatComponent.max_hp,
+                        libtcod.light_red, libtcod.darker_red)
+        libtcod.console_print_ex(self._bottomPanel, 1, 3, libtcod.BKGND_NONE, libtcod.LEFT, str(current_level.name))
+        if self.SHOW_REDRAW_STATS:
+            libtcod.console_print_ex(self._bottomPanel, 1, 4, libtcod.BKGND_NONE, libtcod.LEFT,
+                                     'Repainted: ' + str(self._cellsRepainted))
+        '''
+        # display names of objects under the mouse
+        libtcod.console_set_default_foreground(self._bottomPanel, libtcod.light_gray)
+        libtcod.console_print_ex(self._bottomPanel, 1, 0, libtcod.BKGND_NONE, libtcod.LEFT, self.get_names_under_mouse(current_level, self._visible, mouse))
+        '''
+        # blit the contents of "bottomPanel" to the root console
+        libtcod.console_blit(self._bottomPanel, 0, 0, self.screen_width, PANEL_HEIGHT, 0, 0, self._panelY)
+
+        libtcod.console_flush()
+
+    def render_map(self, current_level, player):
+        # draw all objects in the list, and the player last, so it
+        # always appears over all other objects
+        if self._screenVisible is not None:
+            self._objectLayer.draw(current_level.objects + [player], self._camera, self._screenVisible,
+                                   self._screenExplored)
+
+        if self._mapBuffer is not None:
+            # push the whole map layer to "con"
+            self._mapBuffer.blit(self._con)
+        else:
+            self._objectLayer.blit(self._con)
+
+    @staticmethod
+    def render_bar(panel, x, y, total_width, name, value, maximum, bar_color, back_color):
+        # render a bar (HP, experience, etc). first calculate the width of the bar
+        bar_width = int(float(value) / maximum * total_width)
+
+        # render the background first
+        libtcod.console_set_default_background(panel, back_color)
+        libtcod.console_rect(panel, x, y, total_width, 1, False, libtcod.BKGND_SCREEN)
+
+        # now render the bar on top
+        libtcod.console_set_default_background(panel, bar_color)
+        if bar_width > 0:
+            libtcod.console_rect(panel, x, y, bar_width, 1, False, libtcod.BKGND_SCREEN)
+
+        # finally, some centered text with the values
+        libtcod.console_set_default_foreground(panel, libtcod.white)
+        libtcod.console_print_ex(panel, x + total_width / 2, y, libtcod.BKGND_NONE, libtcod.CENTER,
+                                 name + ': ' + str(value) + '/' + str(maximum))
+
+    def reset_fov_redraw(self):
+        # forget what is on the map console, so the next fov_redraw repaints every cell
+        self._redrawLevel = None
+        self._redrawVersion = None
+        self._redrawWindow = None
+        self._shownVisible = None
+        self._shownExplored = None
+        self._cellsRepainted = 0
+        # the [y, x] masks of the cells on screen that are in FOV and explored, for the object layer
+        self._screenVisible = None
+        self._screenExplored = None
+
+    def fov_redraw(self, visible, level, x, y, seight_radius):
+        self._visible = visible
+        if level is not self._redrawLevel:
+            self._camera.center_on(x, y, level.mapWidth, level.mapHeight)
+            scrolled = True
+        else:
+            scrolled = self._camera.follow(x, y, level.mapWidth, level.mapHeight)
+
+        if level.STREAMING:
+            self._fov_redraw_streaming(visible, level)
+            self._redrawLevel = level
+            return
+
+        # only the cells around the observer can be in FOV, so that is all that can have changed
+        window = get_fov_window(x, y, seight_radius, level.mapHeight, level.mapWidth)
+
+        # a changed tile may lie outside the window, so repaint everything
+        if scrolled or level.map.version != self._redrawVersion:
+            self._fov_redraw_all(visible, level)
+        else:
+            self._fov_redraw_changed(visible, level, window)
+
+        x1, y1, x2, y2 = self._camera.get_window(level.mapWidth, level.mapHeight)
+        self._screenVisible = visible[y1:y2, x1:x2]
+        self._screenExplored = level.exploredMask[y1:y2, x1:x2]
+        self._redrawLevel = level
+        self._redrawVersion = level.map.version
+        self._redrawWindow = window
+
+    def _fov_redraw_all(self, visible, level):
+        # work out the background color of every tile according to the FOV, then push the whole
+        # layer to the console with one bulk fill instead of one call per tile
+        # since they're visible, explore them
+        explored = level.exploredMask
+        explored |= visible
+
+        # only the cells on screen are painted
+        x1, y1, x2, y2 = self._camera.get_window(level.mapWidth, level.mapHeight)
+        shown = (slice(y1, y2), slice(x1, x2))
+        colors = (slice(None),) + shown
+
+        # lit if visible, dark if only explored, background color otherwise
+        background = numpy.array(tuple(COLOR_BACKGROUND), dtype=numpy.int32).reshape(3, 1, 1)
+        background = numpy.where(explored[shown], level.darkColors[colors], background)
+        background = numpy.where(visible[shown], level.lightColors[colors], background)
+        self._paint_map(background)
+
+        self._shownVisible = visible.copy()
+        self._shownExplored = explored.copy()
+        self._cellsRepainted = background[0].size
+
+    def _fov_redraw_streaming(self, visible, level):
+        # a streaming level is far bigger than the screen, so gather the tiles on screen across
+        # chunks, and repaint all of them every time
+        level_map = level.map
+        window = self._camera.get_window(level.mapWidth, level.mapHeight)
+
+        tiles = level_map.get_tiles(*window)
+        now_visible = visible.get_window(*window)
+        level_map.mark_explored(window[0], window[1], now_visible)
+        explored = level_map.get_explored(*window)
+
+        tile_types = level_map.tile_types
+        background = numpy.array(tuple(COLOR_BACKGROUND), dtype=numpy.int32).reshape(3, 1, 1)
+        background = numpy.where(explored, numpy.rollaxis(tile_types.dark_colors[tiles], 2), background)
+        background = numpy.where(now_visible, numpy.rollaxis(tile_types.colors[tiles], 2), background)
+        self._paint_map(background)
+        self._screenVisible = now_visible
+        self._screenExplored = explored
+        self._cellsRepainted = now_visible.size
+
+    def _paint_map(self, background):
+        # show background, the [3, y, x] colors of the map cells on screen, from the top left of
+        # the map console; anything past the edge of a map smaller than the screen is background.
+        # the object layer is drawn from scratch, so the characters can be left as they are
+        height, width = background.shape[1:]
+        if self._mapBuffer is not None:
+            if (height, width) != (self._camera.height, self._camera.width):
+                self._mapBuffer.back[:] = numpy.array(tuple(COLOR_BACKGROUND), dtype=numpy.int32).reshape(3, 1, 1)
+            self._mapBuffer.back[:, :height, :width] = background
+        else:
+            screen = numpy.empty((3, self._camera.height, self._camera.width), dtype=numpy.int32)
+            screen[:] = numpy.array(tuple(COLOR_BACKGROUND), dtype=numpy.int32).reshape(3, 1, 1)
+            screen[:, :height, :width] = background
+            libtcod.console_fill_background(self._con, screen[0].ravel(), screen[1].ravel(), screen[2].ravel())
+
+    def _fov_redraw_changed(self, visible, level, window):
+        # only the cells in FOV last time or this time can have changed; repaint the ones that did
+        x1, y1, x2, y2 = window
+        old_x1, old_y1, old_x2, old_y2 = self._redrawWindow
+        region = (slice(min(y1, old_y1), max(y2, old_y2)), slice(min(x1, old_x1), max(x2, old_x2)))
+        top, left = region[0].start, region[1].start
+        cam_x1, cam_y1, cam_x2, cam_y2 = self._camera.get_window(level.mapWidth, level.mapHeight)
+        cam_x, cam_y = self._camera.position
+
+        level_map = level.map
+        explored = level.exploredMask
+
+        now_visible = visible[region]
+        now_explored = explored[region] | now_visible
+        changed = ((now_visible != self._shownVisible[region]) |
+                   (now_explored != self._shownExplored[region]))
+        # the whole region is explored, but only the changed cells on screen get repainted
+        changed[:max(cam_y1 - top, 0)] = False
+        changed[max(cam_y2 - top, 0):] = False
+        changed[:, :max(cam_x1 - left, 0)] = False
+        changed[:, max(cam_x2 - left, 0):] = False
+
+        if self._mapBuffer is not None:
+            # work out the region's colors as in _fov_redraw_all, and copy over the changed cells
+            background = numpy.array(tuple(COLOR_BACKGROUND), dtype=numpy.int32).reshape(3, 1, 1)
+            background = numpy.where(now_explored, level.darkColors[(slice(None),) + region], background)
+            background = numpy.where(now_visible, level.lightColors[(slice(None),) + region], background)
+            ys, xs = numpy.nonzero(changed)
+            self._mapBuffer.back[:, ys + top - cam_y, xs + left - cam_x] = background[:, ys, xs]
+        else:
+            for y, x in zip(*numpy.nonzero(changed)):
+                x += left
+                y += top
+                if visible[y, x]:
+                    # it's visible, so it gets explored below
+                    color = level_map[x][y].tile_color
+                elif now_explored[y - top, x - left]:
+                    color = level_map[x][y].dark_color
+                else:
+                    color = COLOR_BACKGROUND
+                libtcod.console_set_char_background(self._con, x - cam_x, y - cam_y, color, libtcod.BKGND_SET)
+
+        explored[region] = now_explored
+        self._shownVisible[region] = now_visible
+        self._shownExplored[region] = now_explored
+        self._cellsRepainted = int(numpy.count_nonzero(changed))
+
+    def get_names_under_mouse(self, level, visible, mouse):
+        # return a string with the names of all objects under the mouse
+
+        # the map cell the camera shows under the mouse, if it is over the map console
+        cell = self._camera.to_map(mouse.cx - self.SCREEN_OFFSET, mouse.cy - self.SCREEN_OFFSET)
+
+        # create a list with the names of all objects at the mouse's coordinates and in FOV
+        names = []
+        if cell is not None:
+            x, y = cell
+            if 0 <= x < level.mapWidth and 0 <= y < level.mapHeight and visible[y, x]:
+                names = [obj.name for obj in level.get_objects_at(x, y)]
+
+        names = ', '.join(names)  # join the names, separated by commas
+        return names.capitalize()
+
+
+class Controller:
+    # block on input between turns instead of polling for events every frame
+    TURN_DRIVEN = True
+    PRINT_LOOP_STATS = False
+
+    def __init__(self):
+        self._model = None
+        self.initialize_game()
+
+    def initialize_game(self):
+        self._game_state = {'initialize': True, 'playing': False}
+        self._loop_stats = {'iterations': 0, 'renders': 0, 'waits': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0}
+        self._saver = BackgroundSaver(SAVE_FILE)
+
+        # the model starts the level generator's worker processes, which has to happen before the
+        # view brings up SDL; coming back to the main menu keeps it, and them
+        if self._model is None:
+            self._model = Model()
+        self._view = View()
+
+        self._fov_recompute = True
+
+        self.display_main_menu()
+
+    def display_main_menu(self):
+        menu_selection = self._view.main_menu()
+        print " Menu Selection: " + str(menu_selection)
+        if menu_selection is 'n':
+            self.new_game()
+
+        elif menu_selection is 'c':
+            # load game
+            try:
+                self.load_game()
+            except (IOError, SaveGameError):
+                self._view.msgbox('\n No saved game to load.\n', 24)
+                return
+            self.start_playing()
+
+        elif menu_selection is 'q':
+            # quit
+            self.quit()
+
+    def new_game(self):
+        self._model.create_world()
+        # self._master_object_list = self.generate_object_list()
+        self.start_playing()
+
+    def start_playing(self):
+        self._game_state['initialize'] = False
+        self._game_state['playing'] = True
+        try:
+            self.play_game()
+        finally:
+            # don't cut off a save that is still being written
+            self._saver.wait()
+            self._model.close()
+            if self.PRINT_LOOP_STATS:
+                self.print_loop_stats()
+        self.quit()
+
+    @property
+    def loop_stats(self):
+        return self._loop_stats
+
+    @property
+    def save_stats(self):
+        # how often the game was saved and how long the main thread was blocked doing it
+        return self._saver.stats
+
+    @staticmethod
+    def quit():
+        raise QuitException
+
+    @staticmethod
+    def get_cpu_time():
+        # user + system CPU time used by this process so far
+        user, system = os.times()[:2]
+        return user + system
+
+    @staticmethod
+    def is_busy(player):
+        # true while the game advances by itself, without waiting for input
+        return player.mobComponent.safe_move
+
+    def print_loop_stats(self):
+        stats = self._loop_stats
+        wall_seconds = max(stats['wall_seconds'], 0.001)
+        print " Loop: %d iterations, %d renders, %d waits" % (stats['iterations'], stats['renders'], stats['waits'])
+        print " CPU: %.2fs of %.2fs (%.1f%%)" % (stats['cpu_seconds'], wall_seconds,
+                                                 100.0 * stats['cpu_seconds'] / wall_seconds)
+        save_stats = self._saver.stats
+        print " Saves: %d, main thread blocked %.2fms max, %.2fms total" % (
+            save_stats['saves'], save_stats['max_block_seconds'] * 1000.0, save_stats['total_block_seconds'] * 1000.0)
+        if self._model.current_level is not None:
+            fov_stats = self._model.current_level.fov.stats
+            print " FOV cache: %d hits, %d misses (%.1f%% hit rate), %d entries, %.1fKB" % (
+                fov_stats['hits'], fov_stats['misses'], 100.0 * fov_stats['hit_rate'], fov_stats['entries'],
+                fov_stats['cache_bytes'] / 1024.0)
+        store_stats = self._model.levels.stats
+        print " Levels: %d live, %d packed, %d spilled; %d hits, %d misses, %d evictions, %.2fms max rehydrate" % (
+            store_stats['live'], store_stats['packed'], store_stats['spilled'], store_stats['hits'],
+            store_stats['misses'], store_stats['evictions'], store_stats['max_rehydrate_seconds'] * 1000.0)
+
+    def play_game(self):
+        # print " I'm alive!\n"
+
+        # main game loop
+        player_action = None
+        initialize_safe_move = False
+        # safe_move = False
+        render = True
+
+        mouse = libtcod.Mouse()
+        key = libtcod.Key()
+
+        start_wall, start_cpu = time.time(), self.get_cpu_time()
+        last_autosave = start_wall
+        # whether the game may have changed since the last autosave
+        unsaved = True
+
+        # main loop
+        while not libtcod.console_is_window_closed():
+            self._loop_stats['iterations'] += 1
+
+            current_level = self._model.current_level
+            player = self._model.player
+
+            if render:
+                # render the screen
+                if player.mobComponent.fov_recompute:
+                    current_level.fov.use_algorithm(self._view.fov_algorithm, self._view.fov_backend)
+                    player.mobComponent.recompute_fov()
+                    self._view.fov_redraw(player.mobComponent.fov_mask, current_level, player.x, player.y,
+                                          player.seightRadius)
+
+                self._view.render_all(current_level, player, mouse)
+                self._loop_stats['renders'] += 1
+
+                # level up if needed
+                # check_level_up()
+
+            if self.TURN_DRIVEN and not self.is_busy(player):
+                if unsaved:
+                    # wake up for the pending autosave even if the player walked away
+                    self.wait_for_event(key, mouse, last_autosave + AUTOSAVE_SECONDS)
+                else:
+                    # nothing will change until the player does something, so sleep until they do
+                    libtcod.sys_wait_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse, False)
+                self._loop_stats['waits'] += 1
+            else:
+                libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
+
+            # handle keys and exit game if needed
+            if initialize_safe_move:
+                direction = self.get_movement_keys(key)
+                if direction is not False:
+                    dx, dy = direction
+                    player.mobComponent.safe_move_dx = dx
+                    player.mobComponent.safe_move_dy = dy
+                    player_action = self._model.move_or_attack(player, dx, dy)
+                    if not self._model.is_hostile_mob_in_fov(player):
+                        player.mobComponent.possible_moves = self._model.get_neighbour_mask(player)
+                        player.mobComponent.safe_move = True
+                    initialize_safe_move = False
+            elif player.mobComponent.safe_move == True:
+                player_action = self.safe_move(player)
+            else:
+                player_action = self.handle_keypress(key)
+                if player_action == 'safe_move':
+                    initialize_safe_move = True
+                if player_action == 'exit':
+                    self.save_game()
+                    break
+
+            if player_action == 'didnt-take-turn' or player_action == 'blocked' or player_action == 'cancel-safe-move':
+                player.mobComponent.safe_move = False
+
+            # only re-render once something may have changed
+            render = (not self.TURN_DRIVEN or key.vk != libtcod.KEY_NONE or
+                      player.mobComponent.fov_recompute or self.is_busy(player))
+            if render:
+                unsaved = True
+
+            if unsaved and time.time() - last_autosave >= AUTOSAVE_SECONDS:
+                self.autosave()
+                last_autosave = time.time()
+                unsaved = False
+
+            self._loop_stats['wall_seconds'] = time.time() - start_wall
+            self._loop_stats['cpu_seconds'] = self.get_cpu_time() - start_cpu
+
+            '''
+            #let monsters take their turn
+            if game_state == 'playing' and player_action != 'didnt-take-turn':
+               for object in objects:
+                  if object.ai:
+                     object.ai.take_turn()
+            '''
+
+    @staticmethod
+    def wait_for_event(key, mouse, deadline):
+        # like sys_wait_for_event, but give up at deadline (a time.time() value); polls at least
+        # once, so key is reset when no event came
+        while True:
+            event = libtcod.sys_check_for_event(libtcod.EVENT_KEY_PRESS | libtcod.EVENT_MOUSE, key, mouse)
+            if event or time.time() >= deadline:
+                return event
+            libtcod.sys_sleep_milli(IDLE_POLL_MILLISECONDS)
+
+    def handle_keypress(self, key):
+
+        if key.vk == libtcod.KEY_ENTER and key.lalt:
+            # Alt+Enter: toggle fullscreen
+            libtcod.console_set_fullscreen(not libtcod.console_is_fullscreen())
+
+        elif key.vk == libtcod.KEY_ESCAPE:
+            # self._game_state['playing']
+            return 'exit'  # save and exit game
+
+        player = self._model.player
+
+        if self._game_state['playing']:
+            direction = self.get_movement_keys(key)
+            if direction is not False:
+                dx, dy = direction
+                return self._model.move_or_attack(player, dx, dy)
+            else:
+                # test for other keys
+                key_char = chr(key.c)
+
+                if key_char == 'w':
+                    return 'safe_move'
+
+                if key_char == '>':
+                    # go down the stairs, if the player is on them
+                    return self._model.descend()
+                '''
+                if key_char == 'g':
+                   #pick up an item
+                   for object in objects:  #look for an item in the player's tile
+                      if object.x == player.x and object.y == player.y and object.item:
+                         object.item.pick_up()
+                         break
+
+                if key_char == 'i':
+                   #show the inventory; if an item is selected, use it
+                   selected_item = inventory_menu('Press the key next to an item to use it, or any other to cancel.\n')
+                   if selected_item is not None:
+                      selected_item.use()
+
+                if key_char == 'd':
+                   #show the inventory; if an item is selected, drop it
+                   selected_item = inventory_menu('Press the key next to an item to drop it, or any other to cancel.\n')
+                   if selected_item is not None:
+                      selected_item.drop()
+
+                if key_char == 'c':
+                   #show character information
+                   level_up_xp = LEVEL_UP_BASE + player.level * LEVEL_UP_FACTOR
+                   msgbox('Character Information\n\nLevel: ' + str(player.level) + '\nExperience: ' + str(player.fighter.xp) +
+                         '\nExperience to level up: ' + str(level_up_xp) + '\n\nMaximum HP: ' + str(player.fighter.max_hp) +
+                         '\nAttack: ' + str(player.fighter.power) + '\nDefense: ' + str(player.fighter.defense), CHARACTER_SCREEN_WIDTH)
+
+                if key_char == '<':
+                   #go down stairs, if the player is on them
+                   if stairs.x == player.x and stairs.y == player.y:
+                      next_level()
+                '''
+                return 'didnt-take-turn'
+
+    @staticmethod
+    def get_movement_keys(key):
+
+        # movement keys
+        if key.vk == libtcod.KEY_UP or key.vk == libtcod.KEY_KP8:
+            return UP
+        elif key.vk == libtcod.KEY_DOWN or key.vk == libtcod.KEY_KP2:
+            return DOWN
+        elif key.vk == libtcod.KEY_LEFT or key.vk == libtcod.KEY_KP4:
+            return LEFT
+        elif key.vk == libtcod.KEY_RIGHT or key.vk == libtcod.KEY_KP6:
+            return RIGHT
+        elif key.vk == libtcod.KEY_HOME or key.vk == libtcod.KEY_KP7:
+            return UP_LEFT
+        elif key.vk == libtcod.KEY_PAGEUP or key.vk == libtcod.KEY_KP9:
+            return UP_RIGHT
+        elif key.vk == libtcod.KEY_END or key.vk == libtcod.KEY_KP1:
+            return DOWN_LEFT
+        elif key.vk == libtcod.KEY_PAGEDOWN or key.vk == libtcod.KEY_KP3:
+            return DOWN_RIGHT
+        elif key.vk == libtcod.KEY_KP5 or key.c == '.':
+            return HERE
+        else:
+            return False
+
+    def safe_move(self, mob):
+        # if the path is blocked or hostile mobs are visible:
+        # make a normal move in the direction of travel
+
+        # otherwise:
+        # determine how many possible moves the mob has
+
+        # if the direction of travel is clear, and no hostile mobs are visible,
+        # and the number of possible moves remains the same:
+        # move in the direction of travel
+
+        dx = mob.mobComponent.safe_move_dx
+        dy = mob.mobComponent.safe_move_dy
+
+        x = mob.x + dx
+        y = mob.y + dy
+
+        if self._model.is_blocked(x, y):
+            return 'didnt-take-turn'
+
+        if self._model.is_hostile_mob_in_fov(mob):
+            return 'didnt-take-turn'
+
+        if self._model.is_item_at_location(x, y):
+            self._model.move_or_attack(mob, dx, dy)
+            return 'cancel-safe-move'
+
+        possible_moves = self._model.get_neighbour_mask(mob)
+        if MOVES_CLASS_BY_MASK[possible_moves] == MOVES_INTERSECTION:
+            return 'cancel-safe-move'
+        player_action = self._model.move_or_attack(mob, dx, dy)
+        new_moves = self._model.get_neighbour_mask(mob)
+        if MOVES_CLASS_BY_MASK[new_moves] == MOVES_ELBOW:
+            elbow_moves = MOVES_BY_MASK[new_moves]
+            assert (len(elbow_moves) == 2), ""
+            back_dx = dx * -1
+            back_dy = dy * -1
+            move1, move2 = elbow_moves
+            x1, y1 = move1
+            x2, y2 = move2
+            if x1 == back_dx and y1 == back_dy:
+                mob.mobComponent.safe_move_dx = x2
+                mob.mobComponent.safe_move_dy = y2
+            elif x2 == back_dx and y2 == back_dy:
+                mob.mobComponent.safe_move_dx = x1
+                mob.mobComponent.safe_move_dy = y1
+            mob.mobComponent.possible_moves = new_moves
+            return ''
+        if possible_moves != mob.mobComponent.possible_moves:
+            if MOVES_CLASS_BY_MASK[new_moves] in (MOVES_HALLWAY, MOVES_WALL):
+                mob.mobComponent.possible_moves = new_moves
+            else:
+                return 'cancel-safe-move'
+
+        return player_action
+
+    def autosave(self):
+        # snapshot the game and write it out in the background
+        self._saver.save(self._model)
+
+    def save_game(self):
+        # let any autosave in progress finish, then save and wait for the file to be written; if
+        # that fails the last save that worked is still on disk, so say the game wasn't saved
+        self._saver.wait()
+        self._saver.save(self._model)
+        error = self._saver.wait()
+        if error is not None:
+            self._view.msgbox('\n Could not save the game:\n %s\n' % error, 50)
+
+    def load_game(self):
+        self._model.load(SAVE_FILE)
+
+
+class Model:
+    def __init__(self, world_seed=WORLD_SEED, pregenerate_levels=PREGENERATE_LEVELS):
+        self.initialize(world_seed, pregenerate_levels)
+
+    def initialize(self, world_seed=WORLD_SEED, pregenerate_levels=PREGENERATE_LEVELS):
+        self._worldSeed = world_seed if world_seed is not None else random.getrandbits(32)
+        self._levels = LevelStore(self._worldSeed)
+        self._pregenerateLevels = pregenerate_levels
+        self._pregenerator = LevelPregenerator() if pregenerate_levels > 0 else None
+        if self._pregenerator is not None:
+            # now, before the view brings up SDL, see LevelPregenerator
+            self._pregenerator.start()
+        self._currentLevel = None
+        self._player = None
+
+    @property
+    def current_level(self):
+        return self._currentLevel
+
+    @property
+    def levels(self):
+        return self._levels
+
+    @property
+    def world_seed(self):
+        return self._worldSeed
+
+    @property
+    def pregenerator(self):
+        return self._pregenerator
+
+    @property
+    def player(self):
+        return self._player
+
+    @player.setter
+    def player(self, value):
+        self._player = value
+
+    def create_world(self):
+        level_name = len(self._levels) + 1
+
+        new_level = self.make_new_level(level_name)
+        self._levels.append(new_level)
+        self._currentLevel = new_level
+
+        self._player = self.make_player(new_level.levelEntrance.x, new_level.levelEntrance.y)
+        new_level.stream_around(self._player.x, self._player.y)
+        self._player.mobComponent.initialize_fov(new_level)
+        self.pregenerate_levels()
+
+    def descend(self):
+        # take the player down to the next level, if they are standing on this level's exit
+        level_exit = self._currentLevel.levelExit
+        if self._player.x != level_exit.x or self._player.y != level_exit.y:
+            return 'didnt-take-turn'
+
+        index = self._levels.index(self._currentLevel) + 1
+        if index == len(self._levels):
+            self._levels.append(self.make_new_level(index + 1))
+        self._currentLevel = self._levels[index]
+
+        self._player.x, self._player.y = self._currentLevel.levelEntrance.x, self._currentLevel.levelEntrance.y
+        self._currentLevel.stream_around(self._player.x, self._player.y)
+        self._player.mobComponent.initialize_fov(self._currentLevel)
+        self.pregenerate_levels()
+
+    def pregenerate_levels(self):
+        # start generating the levels below the current one that haven't been made yet; streaming
+        # levels only make their chunks as they are needed, so there is nothing to get ahead on
+        if self._pregenerator is None or STREAMING_LEVELS:
+            return
+        first = self._levels.index(self._currentLevel) + 2
+        for name in range(max(first, len(self._levels) + 1), first + self._pregenerateLevels):
+            self._pregenerator.request(name, get_level_seed(self._worldSeed, name))
+
+    def close(self):
+        if self._pregenerator is not None:
+            self._pregenerator.close()
+        self._levels.close()
+
+    @staticmethod
+    def make_player(x, y):
+        player = GameObject(x, y, '@', 'player', libtcod.yellow, blocks=True)
+        player.playerComponent = PlayerComponent(player, 100, 0, 2, 0, death_function=None)
+
+        # <PLACEHOLDER>
+        player.seightRadius = SEIGHT_RADIUS
+        # </PLACEHOLDER>
+
+        return player
+
+    def save(self, filename):
+        save_model(self, filename)
+
+    def load(self, filename):
+        load_model(self, filename)
+
+    def restore(self, snapshot):
+        # replace the world with one unpacked from a save file
+        if self._pregenerator is not None:
+            # the levels being generated belong to the old world
+            self._pregenerator.cancel()
+        if snapshot['world_seed'] is not None:
+            self._worldSeed = snapshot['world_seed']
+        # only the current level is rebuilt; the rest stay compacted until they are visited
+        self._levels.close()
+        self._levels = LevelStore(self._worldSeed)
+        for i, level in enumerate(snapshot['levels']):
+            if i == snapshot['current_level']:
+                self._levels.append(restore_level(level, self._worldSeed))
+            else:
+                self._levels.append_snapshot(level)
+        self._currentLevel = self._levels[snapshot['current_level']]
+
+        x, y, seight_radius, hp, max_hp, defense, power, xp = snapshot['player']
+        self._player = self.make_player(x, y)
+        self._player.seightRadius = seight_radius
+        combat = self._player.combatComponent
+        combat.hp, combat.base_max_hp, combat.base_defense, combat.base_power, combat.xp = hp, max_hp, defense, power, xp
+
+        self._currentLevel.stream_around(x, y)
+        self._player.mobComponent.initialize_fov(self._currentLevel)
+        self.pregenerate_levels()
+
+    def make_new_level(self, name):
+        # generated from its own seed, so the level can be made again the same from just its name
+        if self._pregenerator is not None:
+            snapshot = self._pregenerator.take(name)
+            if snapshot is not None:
+                return restore_level(snapshot, self._worldSeed)
+
+        if STREAMING_LEVELS:
+            new_level = StreamingLevel(name, seed=get_level_seed(self._worldSeed, name))
+        else:
+            new_level = Level(name, seed=get_level_seed(self._worldSeed, name))
+        new_level.make_map()
+        return new_level
+
+    def move_or_attack(self, mob, dx, dy):
+        # the coordinates the mob is moving to/attacking
+        x = mob.x + dx
+        y = mob.y + dy
+
+        # try to find an attackable object there
+        target = None
+        for obj in self.current_level.get_objects_at(x, y):
+            if hasattr(obj, 'combatComponent'):
+                target = obj
+                break
+
+        # attack if target found, move otherwise
+        if target is not None:
+            mob.combatComponent.attack(target)
+        else:
+            if self.is_blocked(x, y):
+                return 'blocked'
+            mob.mobilityComponent.move(dx, dy)
+            if dx != 0 or dy != 0:
+                mob.mobComponent.fov_recompute = True
+                if mob is self._player:
+                    self.current_level.stream_around(mob.x, mob.y)
+
+    def is_blocked(self, x, y):
+        return self.current_level.is_blocked(x, y)
+
+    def is_item_at_location(self, x, y):
+        return False
+
+    def is_hostile_mob_in_fov(self, mob):
+        for obj in self._currentLevel.get_objects_with(MobComponent):
+            if obj is not mob and mob.mobComponent.is_hostile(obj.mobComponent):
+                if mob.mobComponent.can_see(obj):
+                    return True
+        return False
+
+    def get_num_possible_moves(self, mob):
+        return len(self.get_possible_moves(mob))
+
+    def get_neighbour_mask(self, mob):
+        return self.current_level.get_neighbour_mask(mob.x, mob.y)
+
+    def get_possible_moves(self, mob):
+        return MOVES_BY_MASK[self.get_neighbour_mask(mob)]
+
+    def is_elbow(self, mob):
+        # determine if location is part of an elbow turn
+        ############# ############# ############# #############
+        # ...........# #...........# #...........# #...........#
+        # ..#######..# #..#.#......# #..#######..# #......#.#..#
+        # ..#@.......# #..#.#......# #.......@#..# #......#.#..#
+        # ..#.#####..# #..#.#####..# #..#####.#..# #..#####.#..#
+        # ..#.#......# #..#@.......# #......#.#..# #.......@#..#
+        # ..#.#......# #..#######..# #......#.#..# #..#######..#
+        # ...........# #...........# #...........# #...........#
+        ############# ############# ############# #############
+
+        mask = self.get_neighbour_mask(mob)
+        if MOVES_CLASS_BY_MASK[mask] == MOVES_ELBOW:
+            return MOVES_BY_MASK[mask]
+        return False
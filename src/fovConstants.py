@@ -0,0 +1,8 @@
+# FOV settings, kept apart from defaultConstants so the NumPy FOV backend can be used
+# without loading libtcod
+
+# what computes FOV: the native libtcod map, or the NumPy symmetric shadowcasting in src/shadowcasting.py
+FOV_BACKEND_LIBTCOD = 0
+FOV_BACKEND_NUMPY = 1
+# number of computed FOVs each level keeps, bit packed, for observers returning to a spot
+FOV_CACHE_SIZE = 256
@@ -0,0 +1,180 @@
+from collections import OrderedDict
+
+import numpy
+
+from shadowcasting import compute_fov_symmetric, get_fov_window
+from fovConstants import *
+
+# only the libtcod backend needs the native library; without it FOVs are computed with NumPy
+try:
+    import libtcodpy as libtcod
+    from utilityClasses import create_fov_map, compute_fov, get_fov_mask
+except Exception:
+    libtcod = None
+
+FOV_BACKEND_DEFAULT = FOV_BACKEND_LIBTCOD if libtcod is not None else FOV_BACKEND_NUMPY
+
+
+class FovService(object):
+    """Field of view for all the observers on a level, from one shared map and a cache of recent FOVs"""
+    def __init__(self, level_map, fov_algo=0, cache_size=FOV_CACHE_SIZE, fov_backend=FOV_BACKEND_DEFAULT):
+        self._levelMap = level_map
+        self._fovAlgorithm = fov_algo
+        self._fovBackend = fov_backend
+        self._fovMap = None
+        self._fovMapVersion = None
+        # observer -> (x, y, radius, light_walls, map_version, window, mask) of its last FOV
+        self._observers = {}
+        # cache key -> (window, packed mask), least recently used first
+        self._cache = OrderedDict()
+        self._cacheSize = cache_size
+        self._cacheBytes = 0
+        self._stats = {'computes': 0, 'symmetric_answers': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def fov_map(self):
+        # the shared transparency map, rebuilt the first time any observer needs it after the tiles change
+        if self._fovMapVersion != self._levelMap.version:
+            if self._fovMap is not None:
+                libtcod.map_delete(self._fovMap)
+            self._fovMap = create_fov_map(self._levelMap.height, self._levelMap.width, self._levelMap)
+            self._fovMapVersion = self._levelMap.version
+        return self._fovMap
+
+    @property
+    def algorithm(self):
+        # (backend, libtcod algorithm); the algorithm is ignored by the NumPy backend
+        return (self._fovBackend, self._fovAlgorithm)
+
+    def use_algorithm(self, fov_algo, fov_backend=FOV_BACKEND_DEFAULT):
+        if (fov_backend, fov_algo) != self.algorithm:
+            self._fovBackend = fov_backend
+            self._fovAlgorithm = fov_algo
+            # FOVs computed so far were made with the old algorithm
+            self._observers.clear()
+
+    @property
+    def observer_count(self):
+        return len(self._observers)
+
+    @property
+    def cache_size(self):
+        return self._cacheSize
+    @cache_size.setter
+    def cache_size(self, value):
+        self._cacheSize = value
+        self._trim_cache()
+
+    @property
+    def stats(self):
+        # counters, plus the cache's hit rate, entries and memory in bytes
+        stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / float(lookups) if lookups else 0.0
+        stats['entries'] = len(self._cache)
+        stats['cache_bytes'] = self._cacheBytes
+        return stats
+
+    def nbytes(self):
+        # memory held by the observers' FOV masks and the cache
+        return sum(fov[6].nbytes for fov in self._observers.values()) + self._cacheBytes
+
+    def compute_fov(self, observer, radius, light_walls=False):
+        # the FOV of observer from where it stands now, as a [y, x] mask
+        window, mask = self._get_fov(observer.x, observer.y, radius, light_walls)
+        self._observers[observer] = (observer.x, observer.y, radius, light_walls, self._levelMap.version,
+                                     window, mask)
+        return mask
+
+    def get_fov(self, observer):
+        # the last FOV computed for observer, or None if it has none or it is out of date
+        fov = self._observers.get(observer)
+        if (fov is None or fov[0] != observer.x or fov[1] != observer.y or
+                fov[4] != self._levelMap.version):
+            return None
+        return fov[6]
+
+    def get_fov_window(self, observer):
+        # the rectangle observer's last FOV was read back from, or None
+        if self.get_fov(observer) is None:
+            return None
+        return self._observers[observer][5]
+
+    def is_in_fov(self, observer, x, y):
+        mask = self.get_fov(observer)
+        if mask is None:
+            return False
+        return 0 <= x < self._levelMap.width and 0 <= y < self._levelMap.height and bool(mask[y, x])
+
+    def can_see(self, observer, target, radius, light_walls=False):
+        # whether observer, with the given sight radius, can see target
+        mask = self.get_fov(observer)
+        if mask is not None and self._observers[observer][2] == radius:
+            return bool(mask[target.y, target.x])
+
+        # if target has an up to date FOV that reaches as far as observer, the answer is in it
+        target_mask = self.get_fov(target)
+        if target_mask is not None:
+            target_radius = self._observers[target][2]
+            distance = (target.x - observer.x) ** 2 + (target.y - observer.y) ** 2
+            if target_radius <= 0 or distance <= target_radius ** 2:
+                self._stats['symmetric_answers'] += 1
+                return bool(target_mask[observer.y, observer.x]) and (radius <= 0 or distance <= radius ** 2)
+
+        return bool(self.compute_fov(observer, radius, light_walls)[target.y, target.x])
+
+    def release(self, observer):
+        # forget observer's FOV, e.g. because it died or left the level
+        self._observers.pop(observer, None)
+
+    def invalidate(self):
+        # drop the transparency map, every observer's FOV and the cache
+        if self._fovMap is not None:
+            libtcod.map_delete(self._fovMap)
+        self._fovMap = None
+        self._fovMapVersion = None
+        self._observers.clear()
+        self._cache.clear()
+        self._cacheBytes = 0
+
+    def _get_fov(self, x, y, radius, light_walls):
+        height, width = self._levelMap.height, self._levelMap.width
+        key = (x, y, radius, light_walls, self.algorithm, self._levelMap.version)
+
+        cached = self._cache.pop(key, None)
+        if cached is not None:
+            # move it to the most recently used end
+            self._cache[key] = cached
+            self._stats['hits'] += 1
+            window, bits = cached
+            x1, y1, x2, y2 = window
+            mask = numpy.zeros((height, width), dtype=bool)
+            cells = (y2 - y1) * (x2 - x1)
+            mask[y1:y2, x1:x2] = numpy.unpackbits(bits)[:cells].reshape(y2 - y1, x2 - x1)
+            return window, mask
+
+        self._stats['misses'] += 1
+        self._stats['computes'] += 1
+        window = get_fov_window(x, y, radius, height, width)
+        if self._fovBackend == FOV_BACKEND_NUMPY:
+            # straight from the level map's arrays; no libtcod map is ever built
+            mask = compute_fov_symmetric(~self._levelMap.block_sight, x, y, radius, light_walls)
+        else:
+            compute_fov(self.fov_map, x, y, radius, light_walls, self._fovAlgorithm)
+            mask = get_fov_mask(self.fov_map, height, width, window)
+
+        if self._cacheSize > 0:
+            x1, y1, x2, y2 = window
+            bits = numpy.packbits(mask[y1:y2, x1:x2])
+            self._cache[key] = (window, bits)
+            self._cacheBytes += bits.nbytes
+            self._trim_cache()
+
+        return window, mask
+
+    def _trim_cache(self):
+        # evict least recently used FOVs until the cache fits
+        while len(self._cache) > max(self._cacheSize, 0):
+            key, (window, bits) = self._cache.popitem(last=False)
+            self._cacheBytes -= bits.nbytes
+            self._stats['evictions'] += 1
@@ -0,0 +1,73 @@
+import multiprocessing
+import time
+
+from baseClasses import Level
+from saveGame import snapshot_level, pack_level, unpack_level
+
+
+def generate_packed_level(name, seed):
+    # run in a worker process: generate the level, and send it back in the save file's level format
+    level = Level(name, seed=seed)
+    level.make_map()
+    return pack_level(snapshot_level(level))
+
+
+class LevelPregenerator:
+    """Generates upcoming levels in worker processes while the current one is played"""
+    def __init__(self, processes=1):
+        self._processes = processes
+        self._pool = None
+        # level name -> AsyncResult of its packed level
+        self._pending = {}
+        self._stats = {'requested': 0, 'taken': 0, 'missed': 0, 'waits': 0, 'wait_seconds': 0.0}
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def start(self):
+        # start the worker processes, if they aren't running yet. Call it before libtcod opens the
+        # window: forked workers would inherit SDL's, and on windows they import the main module
+        # again, so the game has to start under "if __name__ == '__main__'"
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self._processes)
+
+    def request(self, name, seed):
+        # start generating a level, unless it is already on its way
+        if name in self._pending:
+            return
+        self.start()
+        self._pending[name] = self._pool.apply_async(generate_packed_level, (name, seed))
+        self._stats['requested'] += 1
+
+    def is_ready(self, name):
+        return name in self._pending and self._pending[name].ready()
+
+    def take(self, name):
+        # the snapshot of a requested level, waiting for it if it isn't finished; None if it was never requested
+        result = self._pending.pop(name, None)
+        if result is None:
+            self._stats['missed'] += 1
+            return None
+
+        if not result.ready():
+            self._stats['waits'] += 1
+            start = time.time()
+            result.wait()
+            self._stats['wait_seconds'] += time.time() - start
+
+        self._stats['taken'] += 1
+        snapshot, offset = unpack_level(result.get())
+        return snapshot
+
+    def cancel(self):
+        # forget every level requested so far, keeping the worker processes for the next requests
+        self._pending.clear()
+
+    def close(self):
+        # stop the worker processes, dropping any level still being generated
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending.clear()
@@ -0,0 +1,183 @@
+import numpy
+
+from defaultConstants import NEIGHBOUR_BITS
+from tileTypes import TILE_TYPES
+
+
+class LevelMap:
+    """The tiles of a level as [y, x] arrays of tile type ids and explored flags"""
+    def __init__(self, width, height, tile_types=TILE_TYPES, fill_type=0):
+        self.width = width
+        self.height = height
+        self.tile_types = tile_types
+
+        shape = (height, width)
+        self.tile_type = numpy.empty(shape, dtype=numpy.uint8)
+        # all tiles start unexplored
+        self.explored = numpy.zeros(shape, dtype=bool)
+        # passable neighbours of every tile, built once the map has been generated
+        self.neighbours = None
+        # bumped whenever a tile changes, so anything derived from the tiles knows to rebuild
+        self.version = 0
+
+        self.fill(fill_type)
+
+    def __getitem__(self, x):
+        # level_map[x][y] is a view of one cell, for code written against the old 2D list of tiles
+        return MapColumn(self, x)
+
+    def __len__(self):
+        return self.width
+
+    @property
+    def blocks(self):
+        return self.tile_types.blocks[self.tile_type]
+
+    @property
+    def block_sight(self):
+        return self.tile_types.block_sight[self.tile_type]
+
+    @property
+    def glyph(self):
+        return self.tile_types.glyphs[self.tile_type]
+
+    def is_blocked(self, x, y):
+        return bool(self.tile_types.blocks[self.tile_type[y, x]])
+
+    def is_sight_blocked(self, x, y):
+        return bool(self.tile_types.block_sight[self.tile_type[y, x]])
+
+    def is_explored(self, x, y):
+        return bool(self.explored[y, x])
+
+    def get_neighbour_mask(self, x, y):
+        # bit mask of the passable cells around (x, y), see NEIGHBOUR_BITS
+        return int(self.neighbours[y, x])
+
+    def fill(self, tile_type):
+        # set every tile of the map to the given type
+        self.tile_type[:] = tile_type
+        self.version += 1
+
+    def set_tiles(self, tile_type):
+        # set the type of every tile from a [y, x] array of tile type ids
+        self.tile_type[:] = tile_type
+        self.version += 1
+        if self.neighbours is not None:
+            self.build_neighbours()
+
+    def fill_rect(self, x1, y1, x2, y2, tile_type):
+        # set every tile from (x1, y1) up to, but not including, (x2, y2) to the given type
+        self.tile_type[y1:y2, x1:x2] = tile_type
+        self.version += 1
+        if self.neighbours is not None:
+            self.build_neighbours()
+
+    def set_tile(self, x, y, tile_type):
+        self.tile_type[y, x] = tile_type
+        self.version += 1
+        if self.neighbours is not None:
+            self._update_neighbours(x, y)
+
+    def build_neighbours(self):
+        # the 8 bit mask of passable neighbours of every tile; cells off the map count as blocked
+        passable = numpy.zeros((self.height + 2, self.width + 2), dtype=numpy.uint8)
+        passable[1:-1, 1:-1] = ~self.blocks
+
+        self.neighbours = numpy.zeros((self.height, self.width), dtype=numpy.uint8)
+        for (dx, dy), bit in NEIGHBOUR_BITS.items():
+            self.neighbours |= passable[1 + dy:self.height + 1 + dy, 1 + dx:self.width + 1 + dx] * numpy.uint8(bit)
+
+    def _update_neighbours(self, x, y):
+        # (x, y) changed, so fix up the bit that points at it in each of its neighbours
+        passable = not self.is_blocked(x, y)
+        for (dx, dy), bit in NEIGHBOUR_BITS.items():
+            nx, ny = x - dx, y - dy
+            if 0 <= nx < self.width and 0 <= ny < self.height:
+                if passable:
+                    self.neighbours[ny, nx] |= bit
+                else:
+                    self.neighbours[ny, nx] &= ~bit & 0xff
+
+    def get_color_arrays(self):
+        # lit and unlit colors of every tile, as [channel, y, x] arrays
+        return (numpy.rollaxis(self.tile_types.colors[self.tile_type], 2).copy(),
+                numpy.rollaxis(self.tile_types.dark_colors[self.tile_type], 2).copy())
+
+    def get_type_name(self, tile_type):
+        return self.tile_types[tile_type].name
+
+    def get_type_char(self, tile_type):
+        return self.tile_types[tile_type].char
+
+    def get_type_color(self, tile_type):
+        return self.tile_types[tile_type].color
+
+    def get_type_dark_color(self, tile_type):
+        return self.tile_types[tile_type].dark_color
+
+    def nbytes(self):
+        # memory held by the per-tile arrays
+        size = self.tile_type.nbytes + self.explored.nbytes
+        if self.neighbours is not None:
+            size += self.neighbours.nbytes
+        return size
+
+
+class MapColumn:
+    """level_map[x], the column of cells at x"""
+    def __init__(self, level_map, x):
+        self._map = level_map
+        self._x = x
+
+    def __getitem__(self, y):
+        return MapCell(self._map, self._x, y)
+
+    def __len__(self):
+        return self._map.height
+
+
+class MapCell(object):
+    """level_map[x][y], a view of one tile backed by the LevelMap arrays"""
+    __slots__ = ('_map', 'x', 'y')
+
+    def __init__(self, level_map, x, y):
+        self._map = level_map
+        self.x = x
+        self.y = y
+
+    @property
+    def tile_type(self):
+        return int(self._map.tile_type[self.y, self.x])
+
+    @property
+    def blocks(self):
+        return self._map.is_blocked(self.x, self.y)
+
+    @property
+    def block_sight(self):
+        return self._map.is_sight_blocked(self.x, self.y)
+
+    @property
+    def explored(self):
+        return bool(self._map.explored[self.y, self.x])
+
+    @explored.setter
+    def explored(self, value):
+        self._map.explored[self.y, self.x] = value
+
+    @property
+    def char(self):
+        return self._map.get_type_char(self.tile_type)
+
+    @property
+    def name(self):
+        return self._map.get_type_name(self.tile_type)
+
+    @property
+    def tile_color(self):
+        return self._map.get_type_color(self.tile_type)
+
+    @property
+    def dark_color(self):
+        return self._map.get_type_dark_color(self.tile_type)
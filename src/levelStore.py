@@ -0,0 +1,199 @@
+import os
+import tempfile
+import time
+from collections import OrderedDict
+
+from defaultConstants import *
+from saveGame import LEVEL_STREAMING, snapshot_level, snapshots_equal, pack_level, unpack_level, restore_level
+
+
+class LevelStore:
+    """Every level of the world by position, with the least recently visited ones compacted to fit a memory budget"""
+    def __init__(self, world_seed, memory_budget=LEVEL_STORE_BUDGET):
+        self._worldSeed = world_seed
+        self._memoryBudget = memory_budget
+        self._count = 0
+        # index -> Level, least recently used first
+        self._live = OrderedDict()
+        # index -> packed level, oldest first
+        self._packed = OrderedDict()
+        # index -> (offset, length) in the spill file of a spilled level, or of a live one that
+        # hasn't changed since it was rehydrated from there
+        self._slots = {}
+        self._spillFile = None
+        # bytes of the spill file held by slots, and by slots since freed
+        self._slotBytes = 0
+        self._deadBytes = 0
+        # index -> (snapshot, packed level or None) of a live level as it was rehydrated; while it
+        # stays the same, evicting it again puts back the packed level, or the slot, it came from
+        self._clean = {}
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'unchanged_evictions': 0, 'spills': 0,
+                       'spill_compactions': 0, 'rehydrations': 0, 'rehydrate_seconds': 0.0,
+                       'max_rehydrate_seconds': 0.0}
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        # the level at index, rehydrating it if it was compacted
+        if not 0 <= index < self._count:
+            raise IndexError('level index out of range')
+
+        level = self._live.pop(index, None)
+        if level is not None:
+            self._stats['hits'] += 1
+        else:
+            self._stats['misses'] += 1
+            level = self._rehydrate(index)
+        self._live[index] = level
+        self._trim()
+        return level
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    @property
+    def memory_budget(self):
+        return self._memoryBudget
+
+    @property
+    def stats(self):
+        # counters, plus how many levels are live, packed and spilled and the bytes they hold
+        stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / float(lookups) if lookups else 0.0
+        stats['live'] = len(self._live)
+        stats['packed'] = len(self._packed)
+        stats['spilled'] = len([index for index in self._slots if index not in self._live])
+        stats['live_bytes'] = sum(level.nbytes() for level in self._live.values())
+        stats['packed_bytes'] = sum(len(data) for data in self._packed.values())
+        stats['spill_bytes'] = self._slotBytes
+        stats['spill_file_bytes'] = os.fstat(self._spillFile.fileno()).st_size if self._spillFile else 0
+        return stats
+
+    def append(self, level):
+        self._live[self._count] = level
+        self._count += 1
+        self._trim()
+
+    def append_snapshot(self, snapshot):
+        # add a level straight in its compacted form, e.g. from a save file
+        self._packed[self._count] = pack_level(snapshot)
+        self._count += 1
+        self._trim()
+
+    def index(self, level):
+        # the position of a live level
+        for index, live_level in self._live.items():
+            if live_level is level:
+                return index
+        raise ValueError('level is not live in this store')
+
+    def snapshot(self, index):
+        # what the save file keeps of the level at index: a snapshot of a live level, or the packed
+        # bytes of a compacted one, which pack_model takes as they are
+        if index in self._live:
+            return snapshot_level(self._live[index])
+        return self._get_packed(index)
+
+    def nbytes(self):
+        # memory held by the live levels, the packed levels that aren't spilled, and what is kept of
+        # the live levels as they were rehydrated
+        return (sum(level.nbytes() for level in self._live.values()) +
+                sum(len(data) for data in self._packed.values()) +
+                sum(_snapshot_nbytes(snapshot) + len(data or b'') for snapshot, data in self._clean.values()))
+
+    def close(self):
+        if self._spillFile is not None:
+            self._spillFile.close()
+            self._spillFile = None
+
+    def _rehydrate(self, index):
+        # a compacted level loses what saving and loading it would
+        start = time.time()
+        data = self._get_packed(index)
+        snapshot = unpack_level(data)[0]
+        level = restore_level(snapshot, self._worldSeed)
+        # a spilled level keeps its slot, and a packed one its bytes, until it changes
+        self._clean[index] = (snapshot, self._packed.pop(index, None))
+
+        seconds = time.time() - start
+        self._stats['rehydrations'] += 1
+        self._stats['rehydrate_seconds'] += seconds
+        self._stats['max_rehydrate_seconds'] = max(self._stats['max_rehydrate_seconds'], seconds)
+        return level
+
+    def _get_packed(self, index):
+        if index in self._packed:
+            return self._packed[index]
+        offset, length = self._slots[index]
+        self._spillFile.seek(offset)
+        return self._spillFile.read(length)
+
+    def _evict(self, index, level):
+        # the packed level, or None if it's back in its slot
+        snapshot = snapshot_level(level)
+        if level.fov is not None:
+            # frees the level's libtcod map
+            level.fov.invalidate()
+        self._stats['evictions'] += 1
+
+        clean_snapshot, data = self._clean.pop(index, (None, None))
+        if clean_snapshot is not None and snapshots_equal(snapshot, clean_snapshot):
+            self._stats['unchanged_evictions'] += 1
+            return data
+        self._free_slot(index)
+        return pack_level(snapshot)
+
+    def _spill(self, index, data):
+        if self._spillFile is None:
+            self._spillFile = tempfile.TemporaryFile()
+        self._spillFile.seek(0, 2)
+        self._slots[index] = (self._spillFile.tell(), len(data))
+        self._spillFile.write(data)
+        self._slotBytes += len(data)
+        self._stats['spills'] += 1
+
+    def _free_slot(self, index):
+        slot = self._slots.pop(index, None)
+        if slot is None:
+            return
+        self._slotBytes -= slot[1]
+        self._deadBytes += slot[1]
+        if self._deadBytes > self._slotBytes:
+            self._compact_spill_file()
+
+    def _compact_spill_file(self):
+        # copy the slots in use to a new spill file, leaving the freed ones behind
+        spill_file = tempfile.TemporaryFile()
+        for index, (offset, length) in sorted(self._slots.items(), key=lambda item: item[1]):
+            self._spillFile.seek(offset)
+            self._slots[index] = (spill_file.tell(), length)
+            spill_file.write(self._spillFile.read(length))
+        self._spillFile.close()
+        self._spillFile = spill_file
+        self._deadBytes = 0
+        self._stats['spill_compactions'] += 1
+
+    def _trim(self):
+        # compact the least recently used live levels, then spill the oldest packed ones, until
+        # the store fits its budget
+        size = self.nbytes()
+        while size > self._memoryBudget and len(self._live) > 1:
+            index, level = self._live.popitem(last=False)
+            data = self._evict(index, level)
+            if data is not None:
+                self._packed[index] = data
+            size = self.nbytes()
+
+        while size > self._memoryBudget and self._packed:
+            index, data = self._packed.popitem(last=False)
+            self._spill(index, data)
+            size -= len(data)
+
+
+def _snapshot_nbytes(snapshot):
+    if snapshot['kind'] == LEVEL_STREAMING:
+        return sum(len(bits) for bits in snapshot['explored_chunks'].values())
+    return snapshot['tile_type'].nbytes + snapshot['explored'].nbytes
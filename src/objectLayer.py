@@ -0,0 +1,105 @@
+import numpy
+
+import libtcodpy as libtcod
+
+from defaultConstants import OBJECT_LAYER_BULK_OBJECTS
+
+
+class ObjectLayer:
+    """The objects shown on the map console, as [y, x] arrays of characters and foreground colors"""
+    def __init__(self, width, height, char=None, fore=None, bulk_objects=OBJECT_LAYER_BULK_OBJECTS):
+        self.width = width
+        self.height = height
+        self.char = char if char is not None else numpy.empty((height, width), dtype=numpy.int32)
+        self.fore = fore if fore is not None else numpy.zeros((3, height, width), dtype=numpy.int32)
+        self.char[:] = ord(' ')
+        # with fewer objects than this, draw and blit go one object at a time; the whole array
+        # passes only pay for themselves past a few dozen objects
+        self.bulk_objects = bulk_objects
+        # (x, y, char, color) on screen of each object shown by the last draw, if it went one at a time
+        self._shown = None
+        # the screen cells the last draw and the last blit put characters in
+        self._drawnCells = []
+        self._blittedCells = []
+        self._drawn = 0
+
+    @property
+    def drawn(self):
+        # number of objects shown by the last draw
+        return self._drawn
+
+    def draw(self, objects, camera, visible, explored):
+        # show the objects that are in FOV, or always visible and on an explored cell; visible and
+        # explored are [y, x] masks of the cells on screen. later objects are drawn over earlier ones
+        if len(objects) < self.bulk_objects:
+            self._draw_each(objects, camera, visible, explored)
+        else:
+            self._draw_bulk(objects, camera, visible, explored)
+
+    def blit(self, con):
+        # push the layer to con, which must be width by height
+        if self._shown is None:
+            libtcod.console_fill_foreground(con, self.fore[0].ravel(), self.fore[1].ravel(), self.fore[2].ravel())
+            libtcod.console_fill_char(con, self.char.ravel())
+        else:
+            # wipe what the last blit put on con, then put the objects back where they are now
+            for x, y in self._blittedCells:
+                libtcod.console_put_char(con, x, y, ' ', libtcod.BKGND_NONE)
+            for x, y, char, color in self._shown:
+                libtcod.console_set_default_foreground(con, color)
+                libtcod.console_put_char(con, x, y, char, libtcod.BKGND_NONE)
+        self._blittedCells = self._drawnCells
+
+    def _draw_each(self, objects, camera, visible, explored):
+        height, width = visible.shape
+        shown = []
+        for obj in objects:
+            x, y = obj.x - camera.x, obj.y - camera.y
+            if 0 <= x < width and 0 <= y < height and (visible[y, x] or (obj.always_visible and explored[y, x])):
+                shown.append((x, y, obj.char, obj.color))
+
+        if self._drawnCells:
+            xs, ys = zip(*self._drawnCells)
+            self.char[ys, xs] = ord(' ')
+        for x, y, char, color in shown:
+            self.char[y, x] = ord(char)
+            self.fore[:, y, x] = (color.r, color.g, color.b)
+        self._shown = shown
+        self._drawnCells = [(x, y) for x, y, char, color in shown]
+        self._drawn = len(shown)
+
+    def _draw_bulk(self, objects, camera, visible, explored):
+        self.char[:] = ord(' ')
+        self._shown = None
+        self._drawnCells = []
+        self._drawn = 0
+
+        # cull by position first, so only the few objects that can be shown are looked at any closer
+        count = len(objects)
+        xs = numpy.fromiter((obj.x for obj in objects), dtype=numpy.int32, count=count) - camera.x
+        ys = numpy.fromiter((obj.y for obj in objects), dtype=numpy.int32, count=count) - camera.y
+
+        # the screen window stops short of the console where the map is smaller than it
+        height, width = visible.shape
+        index = numpy.flatnonzero((xs >= 0) & (xs < width) & (ys >= 0) & (ys < height))
+        xs, ys = xs[index], ys[index]
+
+        in_fov = visible[ys, xs]
+        remembered = ~in_fov & explored[ys, xs]
+        remembered[remembered] = [objects[i].always_visible for i in index[remembered]]
+        keep = in_fov | remembered
+        index, xs, ys = index[keep], xs[keep], ys[keep]
+        self._drawn = len(index)
+        if not len(index):
+            return
+
+        # where objects share a cell only the last one is drawn; unique on the reversed cells finds it
+        cells, last = numpy.unique((ys * width + xs)[::-1], return_index=True)
+        last = len(index) - 1 - last
+        index, xs, ys = index[last], xs[last], ys[last]
+
+        shown = [objects[i] for i in index]
+        self.char[ys, xs] = [ord(obj.char) for obj in shown]
+        self.fore[:, ys, xs] = numpy.array([(obj.color.r, obj.color.g, obj.color.b) for obj in shown],
+                                           dtype=numpy.int32).T
+        self._drawnCells = list(zip(xs.tolist(), ys.tolist()))
@@ -0,0 +1,95 @@
+import numpy
+
+# Both classes work on the wall rectangles of rooms (Level.Room.Rect), whose x1, y1, x2, y2
+# are all inclusive as far as Rect.intersect is concerned: rooms that only touch still collide.
+
+
+class RoomIndex:
+    """The placed rooms of a level, bucketed by the grid cells their wall rectangle covers"""
+    def __init__(self, bucket_size):
+        self._bucketSize = bucket_size
+        # (bucket x, bucket y) -> rooms whose wall rectangle overlaps that bucket
+        self._buckets = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def add(self, room):
+        for key in self._get_buckets(room.wall_rect):
+            self._buckets.setdefault(key, []).append(room)
+        self._count += 1
+
+    def intersects(self, room):
+        # whether room collides with any room added so far
+        for key in self._get_buckets(room.wall_rect):
+            for other in self._buckets.get(key, ()):
+                if room.intersect(other):
+                    return True
+        return False
+
+    def _get_buckets(self, rect):
+        size = self._bucketSize
+        return [(bx, by)
+                for bx in range(rect.x1 // size, rect.x2 // size + 1)
+                for by in range(rect.y1 // size, rect.y2 // size + 1)]
+
+
+class FreeSpace:
+    """The spots of a map where a room of a given size still fits"""
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+        # wall rectangles reach one cell past each edge of the map, so pad by one all round
+        self._taken = numpy.zeros((height + 2, width + 2), dtype=bool)
+        # (w, h) -> (free spots array, number of free spots in each row)
+        self._free = {}
+
+    def add(self, room):
+        rect = room.wall_rect
+        self._taken[rect.y1 + 1:rect.y2 + 2, rect.x1 + 1:rect.x2 + 2] = True
+
+        for (w, h), (spots, row_counts) in self._free.items():
+            # a w by h room at (x, y) has walls over padded columns x to x + w + 2, rows likewise
+            rows = slice(max(rect.y1 - h - 1, 0), rect.y2 + 2)
+            window = spots[rows, max(rect.x1 - w - 1, 0):rect.x2 + 2]
+            row_counts[rows] -= window.sum(1)
+            window[:] = False
+
+    def pick_position(self, w, h, random_int):
+        # the top left floor cell of a random spot where a w by h room fits, or None if there is none
+        # random_int(a, b) gives a random integer from a to b, both included
+        spots, row_counts = self._get_free(w, h)
+        totals = row_counts.cumsum()
+        if len(totals) == 0 or totals[-1] == 0:
+            return None
+
+        # the i-th free spot, counting along the rows
+        i = random_int(0, int(totals[-1]) - 1)
+        y = int(numpy.searchsorted(totals, i, side='right'))
+        before = int(totals[y - 1]) if y > 0 else 0
+        x = int(numpy.flatnonzero(spots[y])[i - before])
+        return x, y
+
+    def _get_free(self, w, h):
+        free = self._free.get((w, h))
+        if free is None:
+            free = self._free[(w, h)] = self._find_free(w, h)
+        return free
+
+    def _find_free(self, w, h):
+        # the same bounds Level._build_map picks random positions from
+        max_x, max_y = self._width - w - 1, self._height - h - 1
+        if max_x < 0 or max_y < 0:
+            return numpy.zeros((0, 0), dtype=bool), numpy.zeros(0, dtype=int)
+
+        # summed area table of the taken cells, so any rectangle is counted in four lookups
+        sums = numpy.zeros((self._height + 3, self._width + 3), dtype=numpy.int32)
+        sums[1:, 1:] = self._taken.cumsum(0).cumsum(1)
+
+        # the room at (x, y) has walls from x - 1 to x + w + 1, which is x to x + w + 2 padded
+        rows, cols = max_y + 1, max_x + 1
+        taken = (sums[h + 3:h + 3 + rows, w + 3:w + 3 + cols] - sums[:rows, w + 3:w + 3 + cols] -
+                 sums[h + 3:h + 3 + rows, :cols] + sums[:rows, :cols])
+        spots = taken == 0
+        return spots, spots.sum(1)
@@ -0,0 +1,375 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy
+
+import libtcodpy as libtcod
+
+from baseClasses import GameObject, Level
+from streamingLevel import StreamingLevel
+from utilityClasses import get_level_seed
+
+# Save file layout (little endian):
+#
+#   header   magic, format version, number of levels, index of the current level
+#   world    the world seed levels are generated from (since version 2)
+#   player   x, y, sight radius and combat stats
+#   levels   for each level: name, kind (since version 3), the map, then the entity table
+#
+# The map of a level held whole is its width, height, then the zlib compressed tile type ids
+# (one byte per cell) followed by the explored flags (one bit per cell). A streaming level's
+# chunks are generated again from its seed, so its map is just its size in chunks, the chunk
+# size, then the zlib compressed explored flags of each chunk that has any and the tiles
+# changed since the chunks were generated.
+#
+# An entity is its kind, position, char, color, flags and name. Entrances and exits are
+# rebuilt with their components from the kind.
+SAVE_MAGIC = b'DUNH'
+SAVE_VERSION = 3
+
+LEVEL_TILES = 0
+LEVEL_STREAMING = 1
+
+ENTITY_OBJECT = 0
+ENTITY_ENTRANCE = 1
+ENTITY_EXIT = 2
+
+FLAG_BLOCKS = 1
+FLAG_ALWAYS_VISIBLE = 2
+
+_HEADER = struct.Struct('<4sHHH')
+_WORLD = struct.Struct('<I')
+_PLAYER = struct.Struct('<hhhiiiii')
+_KIND = struct.Struct('<B')
+_LEVEL = struct.Struct('<HHI')
+_STREAMING = struct.Struct('<HHHI')
+_CHUNK = struct.Struct('<hhI')
+_CHANGE = struct.Struct('<iiB')
+_ENTITY = struct.Struct('<BhhBBBBB')
+_COUNT = struct.Struct('<I')
+_STRING = struct.Struct('<H')
+
+
+class SaveGameError(Exception):
+    """raised when a save file can't be read"""
+    pass
+
+
+def snapshot_level(level):
+    # copy out everything a level is saved from, so it can be packed later without touching the level
+    entities = []
+    for obj in level.objects:
+        if hasattr(obj, 'entranceComponent'):
+            kind = ENTITY_ENTRANCE
+        elif hasattr(obj, 'exitComponent'):
+            kind = ENTITY_EXIT
+        else:
+            kind = ENTITY_OBJECT
+        flags = (FLAG_BLOCKS if obj.blocks else 0) | (FLAG_ALWAYS_VISIBLE if obj.always_visible else 0)
+        entities.append((kind, obj.x, obj.y, obj.char, tuple(obj.color), flags, obj.name))
+
+    snapshot = {'name': str(level.name), 'entities': entities}
+    level_map = level.map
+    if level.STREAMING:
+        snapshot.update(kind=LEVEL_STREAMING, width_chunks=level_map.width_chunks,
+                        height_chunks=level_map.height_chunks, chunk_size=level_map.chunk_size,
+                        explored_chunks=level_map.get_explored_chunks(), changes=dict(level_map.changes))
+    else:
+        snapshot.update(kind=LEVEL_TILES, tile_type=level_map.tile_type.copy(), explored=level_map.explored.copy())
+    return snapshot
+
+
+def snapshots_equal(snapshot, other):
+    # whether two level snapshots hold the same level, and so pack to the same bytes
+    if set(snapshot) != set(other):
+        return False
+    for key, value in snapshot.items():
+        if isinstance(value, numpy.ndarray):
+            if not numpy.array_equal(value, other[key]):
+                return False
+        elif value != other[key]:
+            return False
+    return True
+
+
+def snapshot_model(model):
+    player = model.player
+    combat = player.combatComponent
+    # compacted levels come out of the level store already packed
+    levels = model.levels
+    return {'levels': [levels.snapshot(i) for i in range(len(levels))],
+            'world_seed': model.world_seed,
+            'current_level': model.levels.index(model.current_level),
+            'player': (player.x, player.y, player.seightRadius,
+                       combat.hp, combat.base_max_hp, combat.base_defense, combat.base_power, combat.xp)}
+
+
+def pack_level(snapshot):
+    parts = [_pack_string(snapshot['name']), _KIND.pack(snapshot['kind'])]
+    if snapshot['kind'] == LEVEL_STREAMING:
+        parts.extend(_pack_chunks(snapshot))
+    else:
+        parts.extend(_pack_tiles(snapshot))
+
+    parts.append(_COUNT.pack(len(snapshot['entities'])))
+    for kind, x, y, char, color, flags, name in snapshot['entities']:
+        r, g, b = color
+        parts.append(_ENTITY.pack(kind, x, y, ord(char) if char else 0, r, g, b, flags))
+        parts.append(_pack_string(name))
+
+    return b''.join(parts)
+
+
+def unpack_level(data, offset=0, version=SAVE_VERSION):
+    name, offset = _unpack_string(data, offset)
+    # levels were always held whole before version 3
+    level_kind = LEVEL_TILES
+    if version >= 3:
+        level_kind, = _KIND.unpack_from(data, offset)
+        offset += _KIND.size
+
+    if level_kind == LEVEL_STREAMING:
+        snapshot, offset = _unpack_chunks(data, offset)
+    elif level_kind == LEVEL_TILES:
+        snapshot, offset = _unpack_tiles(data, offset)
+    else:
+        raise ValueError('unknown level kind %d' % level_kind)
+
+    count, = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    entities = []
+    for i in range(count):
+        kind, x, y, char, r, g, b, flags = _ENTITY.unpack_from(data, offset)
+        offset += _ENTITY.size
+        entity_name, offset = _unpack_string(data, offset)
+        entities.append((kind, x, y, chr(char) if char else None, (r, g, b), flags, entity_name))
+
+    snapshot.update(name=name, kind=level_kind, entities=entities)
+    return snapshot, offset
+
+
+def _pack_tiles(snapshot):
+    height, width = snapshot['tile_type'].shape
+    tiles = snapshot['tile_type'].astype(numpy.uint8).tobytes()
+    explored = numpy.packbits(snapshot['explored'].ravel()).tobytes()
+    data = zlib.compress(tiles + explored)
+    return [_LEVEL.pack(width, height, len(data)), data]
+
+
+def _unpack_tiles(data, offset):
+    width, height, size = _LEVEL.unpack_from(data, offset)
+    offset += _LEVEL.size
+
+    cells = width * height
+    raw = zlib.decompress(data[offset:offset + size])
+    offset += size
+    tile_type = numpy.frombuffer(raw, dtype=numpy.uint8, count=cells).reshape(height, width).copy()
+    explored = numpy.unpackbits(numpy.frombuffer(raw, dtype=numpy.uint8, offset=cells))[:cells]
+    explored = explored.reshape(height, width).astype(bool)
+    return {'tile_type': tile_type, 'explored': explored}, offset
+
+
+def _pack_chunks(snapshot):
+    explored_chunks, changes = snapshot['explored_chunks'], snapshot['changes']
+    raw = [_COUNT.pack(len(explored_chunks))]
+    for (cx, cy), bits in sorted(explored_chunks.items()):
+        raw.append(_CHUNK.pack(cx, cy, len(bits)))
+        raw.append(bits)
+    raw.append(_COUNT.pack(len(changes)))
+    for (x, y), tile_type in sorted(changes.items()):
+        raw.append(_CHANGE.pack(x, y, tile_type))
+
+    data = zlib.compress(b''.join(raw))
+    return [_STREAMING.pack(snapshot['width_chunks'], snapshot['height_chunks'], snapshot['chunk_size'], len(data)),
+            data]
+
+
+def _unpack_chunks(data, offset):
+    width_chunks, height_chunks, chunk_size, size = _STREAMING.unpack_from(data, offset)
+    offset += _STREAMING.size
+    raw = zlib.decompress(data[offset:offset + size])
+    offset += size
+
+    position = 0
+    count, = _COUNT.unpack_from(raw, position)
+    position += _COUNT.size
+    explored_chunks = {}
+    for i in range(count):
+        cx, cy, length = _CHUNK.unpack_from(raw, position)
+        position += _CHUNK.size
+        explored_chunks[(cx, cy)] = raw[position:position + length]
+        position += length
+
+    count, = _COUNT.unpack_from(raw, position)
+    position += _COUNT.size
+    changes = {}
+    for i in range(count):
+        x, y, tile_type = _CHANGE.unpack_from(raw, position)
+        position += _CHANGE.size
+        changes[(x, y)] = tile_type
+
+    return {'width_chunks': width_chunks, 'height_chunks': height_chunks, 'chunk_size': chunk_size,
+            'explored_chunks': explored_chunks, 'changes': changes}, offset
+
+
+def pack_model(snapshot):
+    parts = [_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, len(snapshot['levels']), snapshot['current_level']),
+             _WORLD.pack(snapshot['world_seed']),
+             _PLAYER.pack(*snapshot['player'])]
+    parts.extend(level if isinstance(level, bytes) else pack_level(level) for level in snapshot['levels'])
+    return b''.join(parts)
+
+
+def unpack_model(data):
+    try:
+        magic, version, level_count, current_level = _HEADER.unpack_from(data, 0)
+        if magic != SAVE_MAGIC:
+            raise SaveGameError('not a save file')
+        if not 1 <= version <= SAVE_VERSION:
+            raise SaveGameError('unsupported save file version %d' % version)
+
+        offset = _HEADER.size
+        # version 1 saves have no world seed; new levels in them get a new one
+        world_seed = None
+        if version >= 2:
+            world_seed, = _WORLD.unpack_from(data, offset)
+            offset += _WORLD.size
+        player = _PLAYER.unpack_from(data, offset)
+        offset += _PLAYER.size
+
+        levels = []
+        for i in range(level_count):
+            level, offset = unpack_level(data, offset, version)
+            levels.append(level)
+    except (struct.error, zlib.error, ValueError) as e:
+        raise SaveGameError('corrupt save file: %s' % e)
+
+    return {'levels': levels, 'world_seed': world_seed, 'current_level': current_level, 'player': player}
+
+
+def restore_level(snapshot, world_seed=None):
+    # build a Level from a snapshot instead of generating it
+    name = snapshot['name']
+    name = int(name) if name.isdigit() else name
+    seed = get_level_seed(world_seed, name) if world_seed is not None else None
+    if snapshot['kind'] == LEVEL_STREAMING:
+        level = StreamingLevel(name, seed=seed, width_chunks=snapshot['width_chunks'],
+                               height_chunks=snapshot['height_chunks'], chunk_size=snapshot['chunk_size'])
+        level.load_chunks(snapshot['explored_chunks'], snapshot['changes'])
+    else:
+        level = Level(name, seed=seed)
+        level.load_map(snapshot['tile_type'], snapshot['explored'])
+
+    for kind, x, y, char, color, flags, entity_name in snapshot['entities']:
+        if kind == ENTITY_ENTRANCE:
+            level.add_object(level.create_level_entrance(x, y))
+        elif kind == ENTITY_EXIT:
+            level.add_object(level.create_level_exit(x, y))
+        else:
+            level.add_object(GameObject(x, y, char, entity_name, libtcod.Color(*color),
+                                        blocks=bool(flags & FLAG_BLOCKS),
+                                        always_visible=bool(flags & FLAG_ALWAYS_VISIBLE)))
+
+    return level
+
+
+def save_model(model, filename):
+    write_file_atomic(filename, pack_model(snapshot_model(model)))
+
+
+def load_model(model, filename):
+    with open(filename, 'rb') as f:
+        snapshot = unpack_model(f.read())
+    model.restore(snapshot)
+
+
+def write_file_atomic(filename, data):
+    # write to a temporary file next to the target and rename it over the target once it is
+    # safely on disk, so a crash mid-save never leaves a half written save behind
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if hasattr(os, 'replace'):
+        os.replace(temp_filename, filename)
+    else:
+        # python 2 can't rename over an existing file on windows
+        if os.name == 'nt' and os.path.exists(filename):
+            os.remove(filename)
+        os.rename(temp_filename, filename)
+
+
+class BackgroundSaver:
+    """Saves the game on a worker thread, so the game loop only waits for the snapshot"""
+    def __init__(self, filename):
+        self.filename = filename
+        self._thread = None
+        # what stopped the last save from being written, if anything
+        self._error = None
+        self._stats = {'saves': 0, 'skipped': 0, 'errors': 0,
+                       'last_block_seconds': 0.0, 'max_block_seconds': 0.0, 'total_block_seconds': 0.0,
+                       'last_write_seconds': 0.0}
+
+    @property
+    def stats(self):
+        return self._stats
+
+    @property
+    def busy(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def save(self, model):
+        # start saving model in the background; returns False if the previous save is still being written
+        if self.busy:
+            self._stats['skipped'] += 1
+            return False
+
+        # only copying the model out happens here; packing and writing it happen on the worker
+        start = time.time()
+        snapshot = snapshot_model(model)
+        blocked = time.time() - start
+
+        self._stats['saves'] += 1
+        self._stats['last_block_seconds'] = blocked
+        self._stats['max_block_seconds'] = max(self._stats['max_block_seconds'], blocked)
+        self._stats['total_block_seconds'] += blocked
+
+        self._error = None
+        self._thread = threading.Thread(target=self._write, args=(snapshot,))
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def wait(self):
+        # block until the save being written, if any, is done; returns the exception that stopped
+        # the last save from being written, or None if it is on disk
+        if self._thread is not None:
+            self._thread.join()
+        return self._error
+
+    def _write(self, snapshot):
+        start = time.time()
+        try:
+            write_file_atomic(self.filename, pack_model(snapshot))
+        except Exception as e:
+            # packing can fail too, e.g. a struct.error for a stat out of range; the thread has
+            # no one to raise to, so keep it for wait()
+            self._error = e
+            self._stats['errors'] += 1
+        self._stats['last_write_seconds'] = time.time() - start
+
+
+def _pack_string(value):
+    value = value.encode('utf-8') if isinstance(value, type(u'')) else value
+    return _STRING.pack(len(value)) + value
+
+
+def _unpack_string(data, offset):
+    length, = _STRING.unpack_from(data, offset)
+    offset += _STRING.size
+    return data[offset:offset + length], offset + length
@@ -0,0 +1,99 @@
+import numpy
+
+# Symmetric shadowcasting, after Albert Ford's description of the algorithm:
+#
+# Each of the four quadrants around the observer is scanned row by row moving away from it.
+# A row is the run of cells between two slopes; walls in it are always seen, floors only when
+# they sit between the slopes (which is what makes the result symmetric), and every run of
+# floors casts a narrower row behind it. Slopes are kept as exact integer fractions, and each
+# row is handled as a NumPy slice rather than cell by cell.
+#
+# Only NumPy is needed, so this works without the native libtcod library.
+#
+# The reference for the result is libtcod's FOV_RESTRICTIVE: on floor cells this never sees
+# anything FOV_RESTRICTIVE doesn't, and only misses floors the symmetry rule hides behind
+# corners and diagonal gaps, a few cells per FOV (see fov_backends in benchmarks.py).
+
+# quadrant -> (flip rows, transpose): how to view the map so the quadrant's rows run along axis 0
+_QUADRANTS = ((True, False),    # north: rows go up
+              (False, False),   # south: rows go down
+              (False, True),    # east: rows go right
+              (True, True))     # west: rows go left
+
+
+def compute_fov_symmetric(transparent, x, y, radius=0, light_walls=True):
+    """The cells visible from (x, y) as a boolean [y, x] array.
+
+    transparent is a boolean [y, x] array of the cells that don't block sight.
+    A radius of 0 or less means unlimited, as with libtcod.map_compute_fov;
+    otherwise only cells with dx * dx + dy * dy <= radius * radius are seen.
+    Without light_walls, only transparent cells are marked as visible."""
+    height, width = transparent.shape
+    max_depth = radius if radius > 0 else max(width, height)
+
+    # pad the map with walls so no row ever has to be clipped against its edges
+    pad = max_depth + 1
+    padded = numpy.zeros((height + 2 * pad, width + 2 * pad), dtype=bool)
+    padded[pad:pad + height, pad:pad + width] = transparent
+    seen = numpy.zeros(padded.shape, dtype=bool)
+    ox, oy = x + pad, y + pad
+    seen[oy, ox] = True
+
+    for flip, transpose in _QUADRANTS:
+        cells, visible = padded, seen
+        row, col = oy, ox
+        if transpose:
+            cells, visible = cells.T, visible.T
+            row, col = ox, oy
+        if flip:
+            cells, visible = cells[row::-1], visible[row::-1]
+        else:
+            cells, visible = cells[row:], visible[row:]
+        _scan_quadrant(cells, visible, col, max_depth)
+
+    fov = seen[pad:pad + height, pad:pad + width].copy()
+    if radius > 0:
+        dy, dx = numpy.ogrid[-y:height - y, -x:width - x]
+        fov &= dx * dx + dy * dy <= radius * radius
+    if not light_walls:
+        fov &= transparent
+    fov[y, x] = True
+    return fov
+
+
+def get_fov_window(x, y, radius, height, width):
+    """The (x1, y1, x2, y2) rectangle, end exclusive, that can hold the FOV of an observer at x, y."""
+    if radius <= 0:
+        return (0, 0, width, height)
+    return (max(x - radius, 0), max(y - radius, 0), min(x + radius + 1, width), min(y + radius + 1, height))
+
+
+def _scan_quadrant(cells, visible, center, max_depth):
+    # cells[depth, center + col] is the quadrant's cell at that depth and column
+    # rows are (depth, start slope, end slope), with slopes as (numerator, denominator) fractions
+    rows = [(1, (-1, 1), (1, 1))]
+    while rows:
+        depth, (start_num, start_den), (end_num, end_den) = rows.pop()
+
+        # first and last columns of the row, rounding the slopes to the nearest cell
+        min_col = (2 * depth * start_num + start_den) // (2 * start_den)
+        max_col = -((-2 * depth * end_num + end_den) // (2 * end_den))
+        if min_col > max_col:
+            continue
+
+        cols = numpy.arange(min_col, max_col + 1)
+        floor = cells[depth, center + min_col:center + max_col + 1]
+
+        # walls are always seen; floors only if they lie between the row's slopes
+        symmetric = (cols * start_den >= depth * start_num) & (cols * end_den <= depth * end_num)
+        visible[depth, center + min_col:center + max_col + 1] |= ~floor | symmetric
+
+        if depth >= max_depth:
+            continue
+
+        # every run of floor cells casts a row behind it, bounded by the walls either side
+        edges = numpy.diff(numpy.concatenate(([0], floor.astype(numpy.int8), [0])))
+        for first, last in zip(numpy.flatnonzero(edges == 1), numpy.flatnonzero(edges == -1)):
+            start = (start_num, start_den) if first == 0 else (2 * int(cols[first]) - 1, 2 * depth)
+            end = (end_num, end_den) if last == len(cols) else (2 * int(cols[last]) - 1, 2 * depth)
+            rows.append((depth + 1, start, end))
@@ -0,0 +1,122 @@
+import numpy
+
+from baseClasses import Level
+from chunkedMap import ChunkedMap
+from components.basic_components import LevelExitComponent
+from fovService import FovService
+from shadowcasting import compute_fov_symmetric
+from utilityClasses import *
+from defaultConstants import *
+
+
+class FovWindow(object):
+    """A FOV mask covering only the window around its observer, indexed [y, x] in map coordinates"""
+    def __init__(self, x1, y1, mask):
+        self.x1 = x1
+        self.y1 = y1
+        self.mask = mask
+
+    def __getitem__(self, index):
+        y, x = index
+        y -= self.y1
+        x -= self.x1
+        height, width = self.mask.shape
+        return 0 <= y < height and 0 <= x < width and bool(self.mask[y, x])
+
+    @property
+    def nbytes(self):
+        return self.mask.nbytes
+
+    def get_window(self, x1, y1, x2, y2):
+        # the FOV from (x1, y1) up to, but not including, (x2, y2), as a [y, x] array
+        window = numpy.zeros((y2 - y1, x2 - x1), dtype=bool)
+        height, width = self.mask.shape
+        ax1, ay1 = max(x1, self.x1), max(y1, self.y1)
+        ax2, ay2 = min(x2, self.x1 + width), min(y2, self.y1 + height)
+        if ax1 < ax2 and ay1 < ay2:
+            window[ay1 - y1:ay2 - y1, ax1 - x1:ax2 - x1] = \
+                self.mask[ay1 - self.y1:ay2 - self.y1, ax1 - self.x1:ax2 - self.x1]
+        return window
+
+
+class StreamingFovService(FovService):
+    """FOV on a chunked map, computed on just the tiles within sight of each observer"""
+    def _get_fov(self, x, y, radius, light_walls):
+        # nothing the size of the map is made, and FOVs aren't cached since computing one only
+        # touches the window; an unlimited sight radius is cut down to a chunk
+        if radius <= 0:
+            radius = self._levelMap.chunk_size
+        window = (x - radius, y - radius, x + radius + 1, y + radius + 1)
+        tiles = self._levelMap.get_tiles(*window)
+        transparent = ~self._levelMap.tile_types.block_sight[tiles]
+        self._stats['misses'] += 1
+        self._stats['computes'] += 1
+
+        if self._fovBackend == FOV_BACKEND_NUMPY:
+            mask = compute_fov_symmetric(transparent, radius, radius, radius, light_walls)
+        else:
+            fov_map = libtcod.map_new(2 * radius + 1, 2 * radius + 1)
+            libtcod.map_set_properties_array(fov_map, transparent, ~self._levelMap.tile_types.blocks[tiles])
+            compute_fov(fov_map, radius, radius, radius, light_walls, self._fovAlgorithm)
+            mask = libtcod.map_get_fov_array(fov_map)
+            libtcod.map_delete(fov_map)
+
+        return window, FovWindow(window[0], window[1], mask)
+
+
+class StreamingLevel(Level):
+    """A level the size of a whole station, with its map held a few chunks at a time"""
+    STREAMING = True
+
+    def __init__(self, name, seed=None, width_chunks=STATION_WIDTH_CHUNKS, height_chunks=STATION_HEIGHT_CHUNKS,
+                 chunk_size=CHUNK_SIZE):
+        Level.__init__(self, name, seed=seed)
+        self._widthChunks = width_chunks
+        self._heightChunks = height_chunks
+        self._chunkSize = chunk_size
+        self.mapWidth = width_chunks * chunk_size
+        self.mapHeight = height_chunks * chunk_size
+
+    def make_map(self):
+        if self._seed is not None:
+            self._rng = create_random_stream(self._seed)
+        try:
+            self._create_chunked_map()
+            self._make_level_entrance()
+            self._make_level_exit()
+        finally:
+            if self._rng:
+                delete_random_stream(self._rng)
+                self._rng = 0
+
+    def load_chunks(self, explored_chunks, changes):
+        # rebuild the map from what was saved of it instead of generating it
+        self._create_chunked_map()
+        self._map.load(explored_chunks, changes)
+
+    def stream_around(self, x, y):
+        self._map.stream_around(x, y)
+
+    def nbytes(self):
+        return self._map.nbytes() + self._fov.nbytes()
+
+    def _create_chunked_map(self):
+        self._map = ChunkedMap(self._seed if self._seed is not None else 0, self._widthChunks, self._heightChunks,
+                               self._chunkSize)
+        self._fov = StreamingFovService(self._map)
+
+    def _get_exit_space(self):
+        # the entrance goes in the middle chunk, the exit in any chunk
+        cx, cy = self._widthChunks // 2, self._heightChunks // 2
+        if self.get_objects_with(LevelExitComponent):
+            cx = get_random_int(0, self._widthChunks - 1, self._rng)
+            cy = get_random_int(0, self._heightChunks - 1, self._rng)
+
+        exit_spaces = set((obj.x, obj.y) for obj in self.get_objects_with(LevelExitComponent))
+        tiles = self._map.get_chunk(cx, cy)[0]
+        ys, xs = numpy.nonzero(~self._map.tile_types.blocks[tiles])
+        while True:
+            i = get_random_int(0, len(xs) - 1, self._rng)
+            space = (cx * self._chunkSize + int(xs[i]), cy * self._chunkSize + int(ys[i]))
+            if space not in exit_spaces:
+                return space
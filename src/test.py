@@ -1,6 +1,6 @@
-def out1():
-   print 'hello'
-
-f = 'out'
-f += '1'
-f()
+def out1():
+   print 'hello'
+
+f = 'out'
+f += '1'
+f()
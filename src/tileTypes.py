@@ -0,0 +1,91 @@
+import numpy
+
+from defaultConstants import *
+
+
+class TileType(object):
+    """The glyph, colors and flags shared by every cell of one kind, on every level"""
+    __slots__ = ('id', 'name', 'char', 'color', 'dark_color', 'blocks', 'block_sight')
+
+    def __init__(self, type_id, name, char, color, blocks, block_sight=None):
+        # by default, if a tile is blocked, it also blocks sight
+        if block_sight is None:
+            block_sight = blocks
+        self.id = type_id
+        self.name = name
+        self.char = char
+        self.color = color
+        self.dark_color = color * 0.5
+        self.blocks = blocks
+        self.block_sight = block_sight
+
+
+class TileTypeRegistry:
+    """Tile types by id, with lookup tables that turn whole arrays of ids into glyphs, flags or colors"""
+    def __init__(self):
+        self._types = []
+        self._tables = None
+
+    def register(self, type_id, name, char, color, blocks, block_sight=None):
+        if type_id < len(self._types) and self._types[type_id] is not None:
+            raise ValueError('tile type %d is already registered as %s' % (type_id, self._types[type_id].name))
+        if type_id > 255:
+            raise ValueError('tile type ids have to fit in a byte')
+
+        self._types.extend([None] * (type_id + 1 - len(self._types)))
+        self._types[type_id] = TileType(type_id, name, char, color, blocks, block_sight)
+        self._tables = None
+        return self._types[type_id]
+
+    def __getitem__(self, type_id):
+        return self._types[type_id]
+
+    def __len__(self):
+        return len(self._types)
+
+    def __iter__(self):
+        return (tile_type for tile_type in self._types if tile_type is not None)
+
+    @property
+    def glyphs(self):
+        return self._get_tables()['glyphs']
+
+    @property
+    def blocks(self):
+        return self._get_tables()['blocks']
+
+    @property
+    def block_sight(self):
+        return self._get_tables()['block_sight']
+
+    @property
+    def colors(self):
+        # (number of types, 3) int32 array of the lit color of each type
+        return self._get_tables()['colors']
+
+    @property
+    def dark_colors(self):
+        return self._get_tables()['dark_colors']
+
+    def _get_tables(self):
+        # rebuilt the first time they are needed after a type is registered
+        if self._tables is None:
+            types = self._types
+            self._tables = {
+                'glyphs': numpy.array([ord(t.char) if t and t.char else 0 for t in types], dtype=numpy.int32),
+                'blocks': numpy.array([bool(t and t.blocks) for t in types], dtype=bool),
+                'block_sight': numpy.array([bool(t and t.block_sight) for t in types], dtype=bool),
+                'colors': numpy.array([tuple(t.color) if t else (0, 0, 0) for t in types],
+                                      dtype=numpy.int32).reshape(-1, 3),
+                'dark_colors': numpy.array([tuple(t.dark_color) if t else (0, 0, 0) for t in types],
+                                           dtype=numpy.int32).reshape(-1, 3),
+            }
+        return self._tables
+
+
+# the tile types every level is built from; register new kinds of tile here
+TILE_TYPES = TileTypeRegistry()
+TILE_TYPES.register(TILE_WALL, 'Wall', None, COLOR_LIGHT_WALL, True)
+TILE_TYPES.register(TILE_FLOOR, 'Floor', None, COLOR_LIGHT_GROUND, False)
+TILE_TYPES.register(TILE_ENTRANCE, 'Entrance', ENTRANCE_CHAR, COLOR_LIGHT_GROUND, False)
+TILE_TYPES.register(TILE_EXIT, 'Exit', EXIT_CHAR, COLOR_LIGHT_GROUND, False)
@@ -1,74 +1,100 @@
-import libtcodpy as libtcod
-import math
-
-from defaultConstants import *
-
-
-class QuitException(Exception):
-    def __init__(self):
-        pass
-
-
-def get_random_int(min, max, stream=0):
-    return libtcod.random_get_int(stream, min, max)
-
-def is_window_closed():
-    return libtcod.console_is_window_closed()
-
-def create_fov_map(mapHeight, mapWidth, levelMap):
-    #create the FOV map, according to the level map
-    fov_map = libtcod.map_new(mapWidth, mapHeight)
-    for y in range(mapHeight):
-        for x in range(mapWidth):
-            libtcod.map_set_properties(fov_map, x, y, not levelMap[x][y].block_sight, not levelMap[x][y].blocks)
-
-    return fov_map
-
-def compute_fov(fov_map, x, y, seightRadius, fov_light_walls, fov_algo = 0):
-    libtcod.map_compute_fov(fov_map, x, y, seightRadius, fov_light_walls, fov_algo)
-
-def make_alphabetical_index(options):
-    indexed = []
-    index = ord('a')
-    for option in options:
-        index_letter = chr(index)
-        entry = (index, option)
-        indexed.append(entry)
-        index += 1
-
-    return indexed
-
-def get_equipped_in_slot(slot, inventory):  #returns the equipment in a slot, or None if it's empty
-    for obj in inventory:
-        if obj.equipment and obj.equipment.slot == slot and obj.equipment.is_equipped:
-            return obj.equipment
-    return None
-
-def random_choice_index(chances):  #choose one option from list of chances, returning its index
-    #the dice will land on some number between 1 and the sum of the chances
-    dice = libtcod.random_get_int(0, 1, sum(chances))
-
-    #go through all chances, keeping the sum so far
-    running_sum = 0
-    choice = 0
-    for w in chances:
-        running_sum += w
-
-        #see if the dice landed in the part that corresponds to this choice
-        if dice <= running_sum:
-            return choice
-        choice += 1
-
-def random_choice(chances_dict):
-    #choose one option from dictionary of chances, returning its key
-    chances = chances_dict.values()
-    strings = chances_dict.keys()
-
-    return strings[random_choice_index(chances)]
-
-def from_danger_level(table, danger_level):
-    #returns a value that depends on danger level. the table specifies what value occurs after each level, default is 0.
-    for (value, level) in reversed(table):
-        if danger_level >= level:
-            return value
-    return 0
+import libtcodpy as libtcod
+import math
+import zlib
+
+import numpy
+
+from shadowcasting import get_fov_window
+from defaultConstants import *
+
+
+class QuitException(Exception):
+    def __init__(self):
+        pass
+
+
+def get_random_int(min, max, stream=0):
+    return libtcod.random_get_int(stream, min, max)
+
+def create_random_stream(seed):
+    #a new libtcod random stream, independent of the default stream 0
+    return libtcod.random_new_from_seed(seed)
+
+def delete_random_stream(stream):
+    libtcod.random_delete(stream)
+
+def get_level_seed(world_seed, level_name):
+    #the seed a level is generated from; the same world seed and level name always give the same level
+    return zlib.crc32(('%s/%s' % (world_seed, level_name)).encode('utf-8')) & 0xffffffff
+
+def is_window_closed():
+    return libtcod.console_is_window_closed()
+
+def create_fov_map(mapHeight, mapWidth, levelMap):
+    #create the FOV map, according to the level map, setting every cell in one call
+    fov_map = libtcod.map_new(mapWidth, mapHeight)
+    libtcod.map_set_properties_array(fov_map, ~levelMap.block_sight, ~levelMap.blocks)
+
+    return fov_map
+
+def compute_fov(fov_map, x, y, seightRadius, fov_light_walls, fov_algo = 0):
+    libtcod.map_compute_fov(fov_map, x, y, seightRadius, fov_light_walls, fov_algo)
+
+def get_fov_mask(fov_map, mapHeight, mapWidth, window=None):
+    #read the FOV map back in one call, as a boolean array indexed [y, x]
+    #if a window is given, only the cells inside it are kept and the rest are left not in FOV
+    fov = libtcod.map_get_fov_array(fov_map)
+    if window is None:
+        return fov
+    x1, y1, x2, y2 = window
+
+    mask = numpy.zeros((mapHeight, mapWidth), dtype=bool)
+    mask[y1:y2, x1:x2] = fov[y1:y2, x1:x2]
+
+    return mask
+
+def make_alphabetical_index(options):
+    indexed = []
+    index = ord('a')
+    for option in options:
+        index_letter = chr(index)
+        entry = (index, option)
+        indexed.append(entry)
+        index += 1
+
+    return indexed
+
+def get_equipped_in_slot(slot, inventory):  #returns the equipment in a slot, or None if it's empty
+    for obj in inventory:
+        if obj.equipment and obj.equipment.slot == slot and obj.equipment.is_equipped:
+            return obj.equipment
+    return None
+
+def random_choice_index(chances):  #choose one option from list of chances, returning its index
+    #the dice will land on some number between 1 and the sum of the chances
+    dice = libtcod.random_get_int(0, 1, sum(chances))
+
+    #go through all chances, keeping the sum so far
+    running_sum = 0
+    choice = 0
+    for w in chances:
+        running_sum += w
+
+        #see if the dice landed in the part that corresponds to this choice
+        if dice <= running_sum:
+            return choice
+        choice += 1
+
+def random_choice(chances_dict):
+    #choose one option from dictionary of chances, returning its key
+    chances = chances_dict.values()
+    strings = chances_dict.keys()
+
+    return strings[random_choice_index(chances)]
+
+def from_danger_level(table, danger_level):
+    #returns a value that depends on danger level. the table specifies what value occurs after each level, default is 0.
+    for (value, level) in reversed(table):
+        if danger_level >= level:
+            return value
+    return 0